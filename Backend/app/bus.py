@@ -0,0 +1,191 @@
+"""
+Pub/sub message bus for fan-out across uvicorn workers.
+
+Each worker holds only its own WebSocket connections, so anything that must
+reach a user (notifications) or every worker (cache invalidations) is
+published on the bus and delivered by every subscribed worker to its local
+state.
+
+Backends:
+- memory:   in-process only, for single-worker runs
+- database: a bus_messages table that each worker tails by id (LISTEN-style
+            polling); works with SQLite and PostgreSQL and needs no broker
+
+Select with NOTIFICATION_BUS=memory|database. By default the database bus is
+used when WEB_CONCURRENCY > 1.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from typing import Optional, List, Dict, Callable, Awaitable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, insert, delete, func
+
+from .database import engine
+from .models import BusMessage
+
+Handler = Callable[[dict], Awaitable[None]]
+
+# Identifies this worker's own messages (e.g. to skip re-applying a local invalidation)
+WORKER_ID = uuid.uuid4().hex
+
+
+class MessageBus(ABC):
+    """Base bus: channel subscriptions and local dispatch; backends implement publish()"""
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def subscribe(self, channel: str, handler: Handler):
+        """Register a coroutine to receive every message published on channel"""
+        self._handlers[channel].append(handler)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+
+    @abstractmethod
+    async def publish(self, channel: str, data: dict):
+        """Deliver data to every subscriber of channel, on every worker the backend reaches"""
+
+    def publish_from_thread(self, channel: str, data: dict):
+        """Publish from sync (threadpool) code; a no-op until the bus is started"""
+        loop = self._loop
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.publish(channel, data), loop)
+
+    async def _dispatch(self, channel: str, data: dict):
+        for handler in self._handlers.get(channel, ()):
+            try:
+                await handler(data)
+            except Exception as e:
+                print(f"⚠️  Bus handler error on '{channel}': {e}")
+
+
+class InMemoryBus(MessageBus):
+    """Delivers directly to this process's subscribers"""
+
+    async def publish(self, channel: str, data: dict):
+        await self._dispatch(channel, data)
+
+
+class DatabaseBus(MessageBus):
+    """
+    Shared-table bus: publishers append rows, every worker tails new ids.
+
+    Rows are only a transport; they are pruned after `retention` seconds
+    (always keeping the newest, so ids only ever grow).
+    Concurrent PostgreSQL transactions can commit ids out of order, so each
+    poll re-reads a small window below the highest id seen and skips ids
+    already delivered.
+    """
+
+    REORDER_WINDOW = 50
+
+    def __init__(self, poll_interval: float = 0.2, retention: float = 60.0, batch_size: int = 500):
+        super().__init__()
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.batch_size = batch_size
+        self._start_id = 0
+        self._last_id = 0
+        self._delivered = set()
+        self._delivered_order = deque()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await super().start()
+        # Only deliver messages published after this worker came up
+        self._start_id = self._last_id = await run_in_threadpool(self._max_id)
+        self._task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await super().stop()
+
+    async def publish(self, channel: str, data: dict):
+        await run_in_threadpool(self._insert, channel, json.dumps(data, default=str))
+
+    def _max_id(self) -> int:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(BusMessage.id))).scalar() or 0
+
+    def _insert(self, channel: str, payload: str):
+        with engine.begin() as conn:
+            conn.execute(insert(BusMessage).values(channel=channel, payload=payload, created_ts=time.time()))
+
+    def _fetch(self, after_id: int):
+        with engine.connect() as conn:
+            return conn.execute(
+                select(BusMessage.id, BusMessage.channel, BusMessage.payload)
+                .where(BusMessage.id > after_id)
+                .order_by(BusMessage.id)
+                .limit(self.batch_size)
+            ).all()
+
+    def _remember(self, message_id: int):
+        self._delivered.add(message_id)
+        self._delivered_order.append(message_id)
+        if len(self._delivered_order) > self.REORDER_WINDOW * 4:
+            self._delivered.discard(self._delivered_order.popleft())
+
+    def _prune(self):
+        with engine.begin() as conn:
+            conn.execute(delete(BusMessage).where(
+                BusMessage.created_ts < time.time() - self.retention,
+                # Keep the newest row: a table created before AUTOINCREMENT would otherwise restart ids when emptied
+                BusMessage.id < select(func.max(BusMessage.id)).scalar_subquery()
+            ))
+
+    async def _poll_loop(self):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                rows = await run_in_threadpool(self._fetch, self._last_id - self.REORDER_WINDOW)
+                fresh = 0
+                for row in rows:
+                    if row.id in self._delivered or row.id <= self._start_id:
+                        continue
+                    fresh += 1
+                    self._remember(row.id)
+                    self._last_id = max(self._last_id, row.id)
+                    await self._dispatch(row.channel, json.loads(row.payload))
+
+                if time.monotonic() - last_prune >= self.retention:
+                    last_prune = time.monotonic()
+                    await run_in_threadpool(self._prune)
+
+                # Drain backlogs without sleeping
+                if len(rows) == self.batch_size and fresh:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Message bus poll error: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+
+def create_bus() -> MessageBus:
+    """Build the bus selected by NOTIFICATION_BUS (see module docstring)"""
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    backend = os.getenv("NOTIFICATION_BUS", "database" if workers > 1 else "memory").lower()
+    if backend == "database":
+        return DatabaseBus(poll_interval=float(os.getenv("NOTIFICATION_BUS_POLL_INTERVAL", "0.2")))
+    if backend == "memory":
+        return InMemoryBus()
+    raise ValueError(f"Unknown NOTIFICATION_BUS backend: {backend}")
@@ -0,0 +1,81 @@
+"""
+Per-user cart summary cache.
+
+GET /api/cart/summary prices the whole cart (offers, savings, points, stock
+warnings). The result is kept per user until that user's cart changes, the
+pricing rules or catalogue version move on, or ttl_seconds passes (which
+bounds staleness from time-windowed offers and other shoppers' orders
+taking stock; checkout re-checks stock regardless).
+
+A summary is stored under the user's cart_version. Every write job that
+changes a user's cart lines calls bump_cart_version() in its own
+transaction, and the users row is read by authentication on every request,
+so a change made on any worker is seen by the next lookup on every worker
+without an invalidation message or an extra query. A summary computed
+while the cart changed is stored under the older version and never served
+after the change.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Hashable
+
+from sqlalchemy import update
+from sqlalchemy.engine import Connection
+
+from .models import User
+
+
+def bump_cart_version(conn: Connection, user_id: int):
+    """Mark the user's cart as changed; call in the write job that changes it"""
+    conn.execute(
+        update(User).where(User.id == user_id)
+        # Not a profile change: keep updated_at's onupdate from firing
+        .values(cart_version=User.cart_version + 1, updated_at=User.updated_at)
+    )
+
+
+class CartSummaryCache:
+    """LRU of computed cart summaries keyed by user id"""
+
+    def __init__(self, ttl_seconds: float = 10.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # user_id -> (stored_at, version, summary)
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, version: Hashable) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                stored_at, entry_version, summary = entry
+                if entry_version == version and time.monotonic() - stored_at < self.ttl_seconds:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return summary
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, user_id: int, version: Hashable, summary: Dict):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic(), version, summary)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None
+        }
+
+
+# Process-wide cache
+cart_summary_cache = CartSummaryCache()
@@ -0,0 +1,307 @@
+"""
+Bulk catalogue import.
+
+Rows are streamed from CSV, JSON Lines or a JSON array and validated in
+batches as they arrive. A product is identified by its natural key
+(category, name, size), compared case-insensitively, so re-importing a file
+updates products in place instead of duplicating them. If a file repeats a
+key, the last row wins.
+
+Nothing is written while the file is read. apply() then runs in the caller's
+transaction: one SELECT resolves every key, changed products are updated
+with one executemany UPDATE per set of changed columns, new products are
+inserted with one executemany INSERT (a row for a new product must have a
+price, or it is reported as invalid), and with replace=True products of the
+imported categories that are missing from the file are deactivated (not
+deleted, since orders reference them). Shoppers see either the old
+catalogue or the new one, never an empty or half-loaded shop.
+"""
+import csv
+import json
+import time
+from typing import Optional, List, Dict, Iterable, TextIO, Tuple, Callable
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert, update, bindparam
+from sqlalchemy.engine import Connection, Row
+
+from .models import Category, Product
+from .schemas import ProductImportRow
+
+IMPORT_FORMATS = ("csv", "jsonl", "json")
+
+# Product columns an import may set
+PRODUCT_FIELDS = (
+    "category_id", "name", "description", "price", "original_price", "stock",
+    "image_path", "size", "color", "finish", "is_featured", "is_active"
+)
+# Product columns a patch may not set to null
+REQUIRED_PRODUCT_FIELDS = ("name", "price", "stock", "is_featured", "is_active")
+
+NaturalKey = Tuple[int, str, str]
+
+
+def natural_key(category_id: int, name: str, size: Optional[str]) -> NaturalKey:
+    return category_id, name.strip().casefold(), (size or "").strip().casefold()
+
+
+def import_format(filename: Optional[str] = None, content_type: Optional[str] = None) -> Optional[str]:
+    """Guess the import format from a file name or Content-Type"""
+    name = (filename or "").lower()
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if name.endswith(".csv") or content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "jsonl"
+    if name.endswith(".json") or content_type == "application/json":
+        return "json"
+    return None
+
+
+def load_categories(conn: Connection) -> Dict[str, int]:
+    """Category lookup by id, slug and name (lowercased)"""
+    lookup = {}
+    for category_id, slug, name in conn.execute(select(Category.id, Category.slug, Category.name)):
+        lookup[str(category_id)] = category_id
+        lookup[slug.lower()] = category_id
+        lookup[name.lower()] = category_id
+    return lookup
+
+
+def update_grouped(conn: Connection, groups: Dict[Tuple[str, ...], List[Dict]]):
+    """One executemany UPDATE per set of changed columns; params are b_id plus b_<column>"""
+    for fields, params in groups.items():
+        conn.execute(
+            update(Product)
+            .where(Product.id == bindparam("b_id"))
+            .values({field: bindparam(f"b_{field}") for field in fields}),
+            params
+        )
+
+
+def update_products(conn: Connection, criteria: List, patch_for: Callable[[Row], Dict]) -> Dict:
+    """
+    Patch every product matching criteria in the connection's transaction.
+    patch_for(row) gives the new column values for a product; only values
+    that differ are written. Returns the matched ids and a compact diff.
+    """
+    columns = [Product.__table__.c[field] for field in PRODUCT_FIELDS]
+    rows = conn.execute(select(Product.id, *columns).where(*criteria).order_by(Product.id)).all()
+
+    groups: Dict[Tuple[str, ...], List[Dict]] = {}
+    diff = []
+    for row in rows:
+        changed = {field: value for field, value in patch_for(row).items() if getattr(row, field) != value}
+        if not changed:
+            continue
+        params = {f"b_{field}": value for field, value in changed.items()}
+        params["b_id"] = row.id
+        groups.setdefault(tuple(sorted(changed)), []).append(params)
+        diff.append({
+            "id": row.id,
+            "name": row.name,
+            "size": row.size,
+            "changes": {field: [getattr(row, field), value] for field, value in changed.items()}
+        })
+    update_grouped(conn, groups)
+
+    return {
+        "matched_ids": [row.id for row in rows],
+        "updated": len(diff),
+        "statements": len(groups),
+        "changes": diff
+    }
+
+
+class CatalogVersion:
+    """
+    Catalogue generation counter. Product writes bump it (on every worker,
+    via the message bus) and in-memory caches built from product rows
+    compare against it to know when to rebuild.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def bump(self):
+        self.value += 1
+
+
+# Process-wide catalogue version
+catalog_version = CatalogVersion()
+
+
+class CatalogImport:
+    """Validated rows of one import, keyed by natural key"""
+
+    def __init__(self, categories: Dict[str, int], batch_size: int = 500, max_errors: int = 100):
+        self.categories = categories
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        # natural key -> (all column values, columns present in the input, input row number)
+        self.rows: Dict[NaturalKey, Tuple[Dict, frozenset, int]] = {}
+        self.errors: List[Dict] = []
+        self.invalid = 0
+        self.rows_read = 0
+        self.duplicates = 0
+        self._batch: List[Tuple[int, Dict]] = []
+        self.started = time.perf_counter()
+
+    def add_error(self, line: int, message: str):
+        self.invalid += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": line, "error": message})
+
+    def add(self, raw):
+        self.rows_read += 1
+        if not isinstance(raw, dict):
+            self.add_error(self.rows_read, "Row must be an object")
+            return
+        self._batch.append((self.rows_read, raw))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Validate the pending batch"""
+        for line, raw in self._batch:
+            # CSV gives strings for everything and "" for empty cells
+            cleaned = {}
+            for field, value in raw.items():
+                if field is None:
+                    continue
+                if isinstance(value, str):
+                    value = value.strip()
+                    if value == "":
+                        continue
+                cleaned[field.strip()] = value
+            try:
+                row = ProductImportRow(**cleaned)
+            except ValidationError as e:
+                error = e.errors()[0]
+                field = ".".join(str(part) for part in error["loc"])
+                self.add_error(line, f"{field}: {error['msg']}" if field else error["msg"])
+                continue
+
+            reference = str(row.category_id) if row.category_id is not None else (row.category or "").lower()
+            category_id = self.categories.get(reference)
+            if category_id is None:
+                self.add_error(line, f"Unknown category: {reference or '(missing)'}")
+                continue
+
+            present = frozenset(field for field in row.dict(exclude_unset=True) if field in PRODUCT_FIELDS)
+            if "price" in present and row.price is None:
+                self.add_error(line, "price: cannot be null")
+                continue
+
+            values = row.dict(exclude={"category"})
+            values["category_id"] = category_id
+            values["name"] = row.name.strip()
+            key = natural_key(category_id, row.name, row.size)
+            if key in self.rows:
+                self.duplicates += 1
+            self.rows[key] = (values, present | {"category_id", "name"}, line)
+        self._batch = []
+
+    def read(self, stream: TextIO, fmt: str):
+        """Stream rows from a text file in the given format"""
+        if fmt == "csv":
+            try:
+                for raw in csv.DictReader(stream):
+                    self.add(raw)
+            except csv.Error as e:
+                raise ValueError(str(e))
+        elif fmt == "jsonl":
+            for text in stream:
+                if not text.strip():
+                    continue
+                try:
+                    raw = json.loads(text)
+                except ValueError as e:
+                    self.rows_read += 1
+                    self.add_error(self.rows_read, f"Invalid JSON: {e}")
+                    continue
+                self.add(raw)
+        elif fmt == "json":
+            data = json.load(stream)
+            for raw in data.get("products", []) if isinstance(data, dict) else data:
+                self.add(raw)
+        else:
+            raise ValueError(f"Unsupported import format: {fmt}")
+        self.flush()
+
+    def extend(self, rows: Iterable[Dict]):
+        for raw in rows:
+            self.add(raw)
+        self.flush()
+
+    def apply(self, conn: Connection, replace: bool = False) -> Dict:
+        """
+        Upsert the validated rows in the connection's transaction. Rows for new
+        products without a price are dropped and counted as invalid, so callers
+        that abort on invalid rows must check again afterwards.
+        """
+        category_ids = {key[0] for key in self.rows}
+        existing = {}
+        active_ids = set()
+        if category_ids:
+            columns = [Product.__table__.c[field] for field in PRODUCT_FIELDS]
+            for row in conn.execute(
+                select(Product.id, *columns).where(Product.category_id.in_(category_ids)).order_by(Product.id)
+            ):
+                existing.setdefault(natural_key(row.category_id, row.name, row.size), row)
+                if row.is_active:
+                    active_ids.add(row.id)
+
+        inserts = []
+        updates: Dict[Tuple[str, ...], List[Dict]] = {}
+        matched = set()
+        unchanged = 0
+        for key, (values, present, line) in list(self.rows.items()):
+            current = existing.get(key)
+            if current is None:
+                if values["price"] is None:
+                    # Only known now: an update may leave the price out, a new product may not
+                    self.add_error(line, "price: required for a new product")
+                    del self.rows[key]
+                    continue
+                inserts.append(values)
+                continue
+            matched.add(current.id)
+            changed = tuple(sorted(field for field in present if getattr(current, field) != values[field]))
+            if not changed:
+                unchanged += 1
+                continue
+            params = {f"b_{field}": values[field] for field in changed}
+            params["b_id"] = current.id
+            updates.setdefault(changed, []).append(params)
+
+        update_grouped(conn, updates)
+        if inserts:
+            conn.execute(insert(Product), inserts)
+
+        deactivated = 0
+        if replace:
+            missing = [{"b_id": product_id} for product_id in active_ids - matched]
+            if missing:
+                conn.execute(update(Product).where(Product.id == bindparam("b_id")).values(is_active=False), missing)
+            deactivated = len(missing)
+
+        return {
+            "inserted": len(inserts),
+            "updated": sum(len(params) for params in updates.values()),
+            "unchanged": unchanged,
+            "deactivated": deactivated
+        }
+
+    def summary(self, applied: Optional[Dict] = None) -> Dict:
+        seconds = time.perf_counter() - self.started
+        return {
+            "rows": self.rows_read,
+            "valid": len(self.rows),
+            "invalid": self.invalid,
+            "duplicates": self.duplicates,
+            **(applied or {}),
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(self.rows_read / seconds, 1) if seconds else None
+        }
@@ -0,0 +1,259 @@
+"""
+WebSocket connection management for real-time notifications.
+
+Sends never block the caller: each socket gets a bounded queue drained by
+its own writer task, and a message is serialized once no matter how many
+sockets receive it. When a slow client's queue is full the oldest pending
+message is dropped (newer notifications supersede older ones), and a client
+that cannot accept a single frame within send_timeout is disconnected.
+
+Liveness is server-driven: a reaper task sends a heartbeat frame every
+heartbeat_interval and closes sockets that haven't sent anything (a "ping"
+or any other frame) within idle_timeout, which clears half-open mobile
+connections. Connections are capped per user and per worker.
+"""
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Optional, Dict
+
+from fastapi import WebSocket, status
+
+
+class ClientConnection:
+    """One accepted socket with its outbound queue and writer task"""
+
+    __slots__ = ("websocket", "user_id", "queue", "writer", "dropped", "connected_at", "last_seen")
+
+    def __init__(self, websocket: WebSocket, user_id: int, queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at
+
+    def enqueue(self, text: str) -> bool:
+        """Queue a serialized frame; returns False if an older frame was dropped to fit it"""
+        try:
+            self.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            # Coalesce: keep the newest frames for slow consumers
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.queue.put_nowait(text)
+            self.dropped += 1
+            return False
+
+
+class ConnectionManager:
+    """Manages WebSocket connections for real-time notifications"""
+
+    def __init__(
+        self,
+        queue_size: int = 32,
+        send_timeout: float = 10.0,
+        heartbeat_interval: float = 25.0,
+        idle_timeout: float = 75.0,
+        max_connections_per_user: int = 5,
+        max_connections: int = 20000
+    ):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.max_connections_per_user = max_connections_per_user
+        self.max_connections = max_connections
+        self.active_connections: Dict[int, Dict[WebSocket, ClientConnection]] = defaultdict(dict)
+        self.connection_count = 0
+
+        # Counters for stats()
+        self.total_connected = 0
+        self.total_rejected = 0
+        self.total_reaped = 0
+        self.total_dropped_frames = 0
+        self.sent_frames = 0
+        self.send_time_total = 0.0
+        self.send_time_max = 0.0
+
+    @classmethod
+    def from_env(cls) -> "ConnectionManager":
+        """Build a manager using WS_* environment overrides"""
+        return cls(
+            queue_size=int(os.getenv("WS_SEND_QUEUE_SIZE", "32")),
+            send_timeout=float(os.getenv("WS_SEND_TIMEOUT", "10")),
+            heartbeat_interval=float(os.getenv("WS_HEARTBEAT_INTERVAL", "25")),
+            idle_timeout=float(os.getenv("WS_IDLE_TIMEOUT", "75")),
+            max_connections_per_user=int(os.getenv("WS_MAX_CONNECTIONS_PER_USER", "5")),
+            max_connections=int(os.getenv("WS_MAX_CONNECTIONS", "20000"))
+        )
+
+    async def connect(self, websocket: WebSocket, user_id: int) -> bool:
+        """Connect a new WebSocket client; returns False if the worker is full"""
+        if self.connection_count >= self.max_connections:
+            self.total_rejected += 1
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            return False
+
+        await websocket.accept()
+
+        # Over the per-user cap, the oldest socket is most likely a stale one
+        user_connections = self.active_connections.get(user_id, {})
+        while len(user_connections) >= self.max_connections_per_user:
+            oldest = min(user_connections.values(), key=lambda c: c.connected_at)
+            await self._close(oldest, status.WS_1008_POLICY_VIOLATION)
+
+        self.register(websocket, user_id)
+        print(f"✅ User {user_id} connected. Active connections: {len(self.active_connections[user_id])}")
+        return True
+
+    def register(self, websocket: WebSocket, user_id: int) -> ClientConnection:
+        """Track an accepted socket and start its writer task"""
+        connection = ClientConnection(websocket, user_id, self.queue_size)
+        connection.writer = asyncio.create_task(self._writer(connection))
+        self.active_connections[user_id][websocket] = connection
+        self.connection_count += 1
+        self.total_connected += 1
+        return connection
+
+    def touch(self, websocket: WebSocket, user_id: int):
+        """Record that the client sent something (keeps it from being reaped)"""
+        connection = self.active_connections.get(user_id, {}).get(websocket)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
+    def disconnect(self, websocket: WebSocket, user_id: int):
+        """Disconnect a WebSocket client (safe to call more than once)"""
+        connections = self.active_connections.get(user_id)
+        if not connections or websocket not in connections:
+            return
+        connection = connections.pop(websocket)
+        if not connections:
+            del self.active_connections[user_id]
+        self.connection_count -= 1
+        self.total_dropped_frames += connection.dropped
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        print(f"❌ User {user_id} disconnected. Remaining connections: {len(self.active_connections.get(user_id, {}))}")
+
+    def send_text(self, websocket: WebSocket, user_id: int, text: str):
+        """Queue a raw text frame for one socket (e.g. a pong)"""
+        connection = self.active_connections.get(user_id, {}).get(websocket)
+        if connection is not None:
+            connection.enqueue(text)
+
+    async def send_personal_message(self, message: dict, user_id: int):
+        """Send a message to a specific user"""
+        connections = self.active_connections.get(user_id)
+        if not connections:
+            return
+        text = json.dumps(message, default=str)
+        for connection in list(connections.values()):
+            connection.enqueue(text)
+
+    async def broadcast(self, message: dict, exclude_user: Optional[int] = None):
+        """Broadcast a message to all connected users"""
+        text = json.dumps(message, default=str)
+        for user_id, connections in list(self.active_connections.items()):
+            if exclude_user and user_id == exclude_user:
+                continue
+            for connection in list(connections.values()):
+                connection.enqueue(text)
+
+    async def _writer(self, connection: ClientConnection):
+        """Drain one socket's queue; a stalled or broken socket only affects itself"""
+        websocket = connection.websocket
+        try:
+            while True:
+                text = await connection.queue.get()
+                started = time.perf_counter()
+                await asyncio.wait_for(websocket.send_text(text), timeout=self.send_timeout)
+                elapsed = time.perf_counter() - started
+                self.sent_frames += 1
+                self.send_time_total += elapsed
+                if elapsed > self.send_time_max:
+                    self.send_time_max = elapsed
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            print(f"Dropping slow consumer for user {connection.user_id}")
+        except Exception as e:
+            print(f"Error sending message to user {connection.user_id}: {e}")
+
+        self.disconnect(websocket, connection.user_id)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    async def _close(self, connection: ClientConnection, code: int = status.WS_1000_NORMAL_CLOSURE):
+        self.disconnect(connection.websocket, connection.user_id)
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def reap_idle(self) -> int:
+        """Close sockets idle past idle_timeout and heartbeat the rest; returns sockets reaped"""
+        now = time.monotonic()
+        heartbeat = json.dumps({"type": "heartbeat", "timestamp": time.time()})
+        idle = []
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections.values()):
+                if now - connection.last_seen > self.idle_timeout:
+                    idle.append(connection)
+                else:
+                    connection.enqueue(heartbeat)
+        for connection in idle:
+            await self._close(connection, status.WS_1001_GOING_AWAY)
+        self.total_reaped += len(idle)
+        return len(idle)
+
+    async def run_heartbeat(self):
+        """Background task: heartbeat and reap every heartbeat_interval until cancelled"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                reaped = await self.reap_idle()
+                if reaped:
+                    print(f"Reaped {reaped} idle WebSocket connections")
+            except Exception as e:
+                print(f"⚠️  WebSocket heartbeat error: {e}")
+
+    def stats(self) -> Dict:
+        """Live gauges and counters for this worker"""
+        queue_depths = [
+            connection.queue.qsize()
+            for connections in self.active_connections.values()
+            for connection in connections.values()
+        ]
+        return {
+            "pid": os.getpid(),
+            "connections": self.connection_count,
+            "users": len(self.active_connections),
+            "queue_depth_total": sum(queue_depths),
+            "queue_depth_max": max(queue_depths, default=0),
+            "send_latency_avg_ms": round(self.send_time_total / self.sent_frames * 1000, 3) if self.sent_frames else 0.0,
+            "send_latency_max_ms": round(self.send_time_max * 1000, 3),
+            "frames_sent": self.sent_frames,
+            "frames_dropped": self.total_dropped_frames + sum(
+                connection.dropped
+                for connections in self.active_connections.values()
+                for connection in connections.values()
+            ),
+            "connected_total": self.total_connected,
+            "rejected_total": self.total_rejected,
+            "reaped_total": self.total_reaped,
+            "limits": {
+                "max_connections": self.max_connections,
+                "max_connections_per_user": self.max_connections_per_user,
+                "idle_timeout": self.idle_timeout,
+                "heartbeat_interval": self.heartbeat_interval
+            }
+        }
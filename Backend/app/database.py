@@ -1,7 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool, StaticPool
 import os
+import time
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,21 +22,218 @@ DATABASE_URL = os.getenv(
 # SQLite needs check_same_thread=False
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-# Add pool_pre_ping=True to handle DB connection drops (common with cloud DBs like Neon)
-# Increased pool_size and max_overflow for higher concurrency
-# Added pool_timeout to prevent requests from hanging indefinitely if pool is exhausted
+
+def is_sqlite_memory(url: str) -> bool:
+    return ":memory:" in url or "mode=memory" in url or url.split("://", 1)[1] in ("", "/")
+
+
+# SQLite production mode (default for file databases, SQLITE_MODE=default to opt out):
+# WAL so readers never block on the writer, tuned pragmas on every connection,
+# and writes funneled through the per-worker group-commit queue in app/writer.py
+SQLITE_PRODUCTION = (
+    DATABASE_URL.startswith("sqlite")
+    and not is_sqlite_memory(DATABASE_URL)
+    and os.getenv("SQLITE_MODE", "production").lower() == "production"
+)
+
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    # NORMAL is durable in WAL mode except for the last commits on power loss
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    # Negative = KiB, so 64 MiB of page cache per connection
+    "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),
+    "mmap_size": os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    # Wait for the other workers' writers instead of failing with "database is locked"
+    "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT", "5000"),
+    "temp_store": "MEMORY"
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """connect event: tune a fresh SQLite connection"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+class PoolMetrics:
+    """Counters fed by pool events and timed checkouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.invalidations = 0
+        self.soft_invalidations = 0
+        self.overflow_peak = 0
+
+    def record_checkout(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkouts += 1
+            self.checkout_wait_total += waited
+            if waited > self.checkout_wait_max:
+                self.checkout_wait_max = waited
+
+    def attach(self, engine):
+        """Listen to pool events on a sync engine (use async_engine.sync_engine for async)"""
+        def on_connect(dbapi_connection, connection_record):
+            self.connects += 1
+
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                overflow = pool.overflow()
+                if overflow > self.overflow_peak:
+                    self.overflow_peak = overflow
+
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            self.invalidations += 1
+
+        def on_soft_invalidate(dbapi_connection, connection_record, exception):
+            self.soft_invalidations += 1
+
+        event.listen(engine, "connect", on_connect)
+        event.listen(engine, "checkout", on_checkout)
+        event.listen(engine, "invalidate", on_invalidate)
+        event.listen(engine, "soft_invalidate", on_soft_invalidate)
+
+    def stats(self, pool) -> dict:
+        attempts = self.checkouts + self.checkout_timeouts
+        stats = {
+            "pool_class": type(pool).__name__,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.checkout_timeouts,
+            "checkout_wait_avg_ms": round(self.checkout_wait_total / attempts * 1000, 3) if attempts else 0.0,
+            "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+            "invalidations": self.invalidations,
+            "soft_invalidations": self.soft_invalidations,
+            "overflow_peak": self.overflow_peak
+        }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow()
+            })
+        return stats
+
+
+def timed_pool_class(base, metrics: PoolMetrics):
+    """Subclass a pool so connect() records how long callers waited for a connection"""
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = base.connect(self)
+        except exc.TimeoutError:
+            metrics.record_checkout(time.perf_counter() - started, timed_out=True)
+            raise
+        metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+    # Defined on the class so engine.dispose() (which recreates the pool) keeps it
+    return type(f"Timed{base.__name__}", (base,), {"connect": connect, "metrics": metrics})
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, "1" if default else "0").lower() in ("1", "true", "yes", "on")
+
+
+def pool_settings(url: str, metrics: PoolMetrics, is_async: bool = False) -> dict:
+    """
+    Engine pool arguments for a database URL, overridable with DB_* env vars.
+
+    SQLite connections are local file handles, so a QueuePool only adds
+    locking: in-memory databases share one StaticPool connection and file
+    databases open a fresh connection per checkout (NullPool) unless
+    DB_SQLITE_POOL=queue|static|null says otherwise. In SQLite production
+    mode file databases keep a QueuePool so each connection's page cache
+    and mmap survive between requests.
+
+    Server databases get a QueuePool without per-checkout pings. Liveness comes
+    from pool_recycle (kept below the server/proxy idle timeout) and LIFO
+    checkout, which leaves surplus connections idle long enough to be
+    recycled; a connection that still drops is invalidated on the disconnect
+    error. Set DB_POOL_PRE_PING=1 to restore pessimistic pings.
+    """
+    if url.startswith("sqlite"):
+        default = "static" if is_sqlite_memory(url) else "queue" if SQLITE_PRODUCTION else "null"
+        choice = os.getenv("DB_SQLITE_POOL", default).lower()
+        if choice == "static":
+            return {"poolclass": timed_pool_class(StaticPool, metrics)}
+        if choice == "null":
+            return {"poolclass": timed_pool_class(NullPool, metrics)}
+        if choice != "queue":
+            raise ValueError(f"Unknown DB_SQLITE_POOL: {choice}")
+
+    return {
+        "poolclass": timed_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        # Wait up to 30 seconds for a connection instead of hanging indefinitely
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        # Neon and similar proxies drop idle connections after ~5 minutes
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "300")),
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING"),
+        "pool_use_lifo": True
+    }
+
+
+pool_metrics = PoolMetrics()
 engine = create_engine(
-    DATABASE_URL, 
+    DATABASE_URL,
     connect_args=connect_args,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    # Adjusted pool size for 4 workers (4 * 10 = 40 connections total, likely safe for Neon/Postgres cloud tiers)
-    pool_size=10,
-    max_overflow=5,
-    pool_timeout=30  # Wait up to 30 seconds for a connection
+    **pool_settings(DATABASE_URL, pool_metrics)
 )
+pool_metrics.attach(engine)
+if SQLITE_PRODUCTION:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the hot read paths (cart, products, categories, orders, auth).
+# Same database, async driver: sqlite -> aiosqlite, postgresql -> asyncpg
+def get_async_database_url(url: str) -> str:
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql+psycopg2:"):
+        return url.replace("postgresql+psycopg2:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgres:"):
+        return url.replace("postgres:", "postgresql+asyncpg:", 1)
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", get_async_database_url(DATABASE_URL))
+
+async_pool_metrics = PoolMetrics()
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    **pool_settings(ASYNC_DATABASE_URL, async_pool_metrics, is_async=True)
+)
+async_pool_metrics.attach(async_engine.sync_engine)
+if SQLITE_PRODUCTION:
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+# expire_on_commit=False: responses are serialized after commit, and async sessions can't lazy-load
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def get_pool_stats() -> dict:
+    """Pool gauges and counters for both engines in this worker"""
+    return {
+        "pid": os.getpid(),
+        "sync": pool_metrics.stats(engine.pool),
+        "async": async_pool_metrics.stats(async_engine.sync_engine.pool)
+    }
+
+
 Base = declarative_base()
 
 # Dependency to get DB session
@@ -42,3 +243,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async DB session (for async def endpoints)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
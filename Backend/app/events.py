@@ -0,0 +1,161 @@
+"""
+Transactional outbox for domain events.
+
+Endpoints call enqueue_event() inside their own transaction, so an event
+exists if and only if the change it describes was committed. A background
+dispatcher on every worker claims undelivered events in batches, turns them
+into notifications and hands each batch to a publish callback (the message
+bus), then marks them dispatched. Claims expire after `visibility_timeout`,
+so events claimed by a worker that died are picked up again.
+"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import List, Dict, Callable, Awaitable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, delete, or_, and_
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import OutboxEvent
+
+ORDER_CREATED = "order_created"
+ORDER_STATUS_CHANGED = "order_status_changed"
+POINTS_CHANGED = "points_changed"
+
+PublishCallback = Callable[[List[Dict]], Awaitable[None]]
+
+
+def enqueue_event(db: Session, event_type: str, user_id: int, data: dict):
+    """Record an event in the caller's transaction (does not commit)"""
+    db.add(OutboxEvent(
+        event_type=event_type,
+        user_id=user_id,
+        payload=json.dumps(data, default=str),
+        created_ts=time.time()
+    ))
+
+
+def event_notification(event_type: str, event_id: int, data: dict) -> Dict:
+    """Build the WebSocket notification for an outbox event"""
+    notification = {
+        "id": f"{event_type}_{event_id}",
+        "type": "order",
+        "title": "Notification",
+        "message": "",
+        "timestamp": datetime.now().isoformat(),
+        "data": {"event": event_type, **data}
+    }
+    if event_type == ORDER_CREATED:
+        notification["title"] = "Order placed"
+        notification["message"] = f"Your order {data.get('order_number')} has been placed"
+    elif event_type == ORDER_STATUS_CHANGED:
+        notification["title"] = f"Order {data.get('status')}"
+        notification["message"] = f"Your order {data.get('order_number')} is now {data.get('status')}"
+    elif event_type == POINTS_CHANGED:
+        delta = data.get("delta", 0)
+        notification["type"] = "reward"
+        notification["title"] = "Points earned" if delta > 0 else "Points reversed"
+        notification["message"] = f"{abs(delta)} points {'added to' if delta > 0 else 'removed from'} your balance"
+    return notification
+
+
+class OutboxDispatcher:
+    """Claims and delivers outbox events in batches"""
+
+    def __init__(
+        self,
+        poll_interval: float = 0.25,
+        batch_size: int = 200,
+        visibility_timeout: float = 30.0,
+        retention: float = 86400.0
+    ):
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.retention = retention
+
+    def claim_batch(self, db: Session) -> List[OutboxEvent]:
+        """Atomically claim up to batch_size undelivered events for this worker"""
+        now = time.time()
+        claimable = and_(
+            OutboxEvent.dispatched_ts.is_(None),
+            or_(OutboxEvent.claimed_ts.is_(None), OutboxEvent.claimed_ts < now - self.visibility_timeout)
+        )
+        candidates = select(OutboxEvent.id).where(claimable).order_by(OutboxEvent.id).limit(self.batch_size)
+        token = uuid.uuid4().hex
+        # Re-check claimable on the outer UPDATE so a concurrent claimer can't take the same rows
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(candidates.scalar_subquery()), claimable)
+            .values(claim_token=token, claimed_ts=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return db.query(OutboxEvent).filter(OutboxEvent.claim_token == token).order_by(OutboxEvent.id).all()
+
+    def mark_dispatched(self, db: Session, event_ids: List[int]):
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(event_ids))
+            .values(dispatched_ts=time.time())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    def prune(self, db: Session):
+        """Delete delivered events older than the retention period"""
+        db.execute(delete(OutboxEvent).where(OutboxEvent.dispatched_ts < time.time() - self.retention))
+        db.commit()
+
+    def _claim(self) -> List[Dict]:
+        db = SessionLocal()
+        try:
+            events = self.claim_batch(db)
+            return [
+                {
+                    "id": event.id,
+                    "user_id": event.user_id,
+                    "message": event_notification(event.event_type, event.id, json.loads(event.payload))
+                }
+                for event in events
+            ]
+        finally:
+            db.close()
+
+    def _with_session(self, fn, *args):
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+    async def run(self, publish: PublishCallback):
+        """Poll for events until cancelled; a failed publish leaves the claim to expire and retry"""
+        last_prune = time.monotonic()
+        while True:
+            batch: List[Dict] = []
+            try:
+                batch = await run_in_threadpool(self._claim)
+                if batch:
+                    await publish(batch)
+                    await run_in_threadpool(self._with_session, self.mark_dispatched, [item["id"] for item in batch])
+
+                if time.monotonic() - last_prune >= 3600:
+                    last_prune = time.monotonic()
+                    await run_in_threadpool(self._with_session, self.prune)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Outbox dispatch error: {e}")
+
+            # Keep draining while there is a backlog
+            if len(batch) < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+
+# Process-wide dispatcher
+outbox_dispatcher = OutboxDispatcher()
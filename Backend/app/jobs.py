@@ -0,0 +1,327 @@
+"""
+Durable background job queue.
+
+Endpoints call enqueue_job() inside their own transaction, so follow-up
+work exists if and only if the change that needs it was committed, and the
+response doesn't wait for it. Worker coroutines started from the lifespan
+claim due jobs from the background_jobs table (SQLite or PostgreSQL) and
+run each handler in the threadpool with its own session. A handler's writes
+and the job's "done" mark commit together, so a job's effects are applied
+at most once even though claims can be retried.
+
+A failed job is retried with exponential backoff until max_attempts, then
+left as "failed" for an admin to inspect and retry. Claims expire after
+visibility_timeout, so jobs held by a worker that died are picked up again.
+"""
+import asyncio
+import json
+import os
+import time
+import traceback
+import uuid
+from collections import deque
+from typing import Optional, List, Dict, Callable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, delete, func, or_, and_
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import BackgroundJob, Order, OrderItem, Product
+from .points import sync_order_points
+from .purchases import record_order
+from .recommendations import build_relations
+
+JOB_ORDER_CREATED = "order_created"
+JOB_ORDER_STATUS_CHANGED = "order_status_changed"
+JOB_RELATED_PRODUCTS = "related_products_rebuild"
+
+JobHandler = Callable[[Session, Dict], None]
+JobListener = Callable[[Dict], None]
+
+
+def enqueue_job(db: Session, kind: str, payload: dict, delay: float = 0.0, max_attempts: int = 5):
+    """Record a job in the caller's transaction (does not commit)"""
+    now = time.time()
+    db.add(BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload, default=str),
+        status="pending",
+        attempts=0,
+        max_attempts=max_attempts,
+        created_ts=now,
+        run_after_ts=now + delay
+    ))
+
+
+class JobQueue:
+    """Claims and runs background jobs; see module docstring"""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        poll_interval: float = 0.5,
+        batch_size: int = 10,
+        visibility_timeout: float = 60.0,
+        retry_base: float = 2.0,
+        retention: float = 86400.0
+    ):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.retry_base = retry_base
+        self.retention = retention
+        self.handlers: Dict[str, JobHandler] = {}
+        self.listeners: Dict[str, List[JobListener]] = {}
+        self.processed = 0
+        self.retried = 0
+        self.failed = 0
+        # Seconds between a job becoming due and a worker starting it
+        self._lags: deque = deque(maxlen=1000)
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            workers=int(os.getenv("JOB_WORKERS", "2")),
+            visibility_timeout=float(os.getenv("JOB_VISIBILITY_TIMEOUT", "60"))
+        )
+
+    def handler(self, kind: str):
+        """Decorator registering the handler for a job kind"""
+        def register(fn: JobHandler) -> JobHandler:
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def on_complete(self, kind: str, listener: JobListener):
+        """Call listener(payload) after each job of this kind commits"""
+        self.listeners.setdefault(kind, []).append(listener)
+
+    def claim_batch(self, db: Session) -> List[Dict]:
+        """Atomically claim up to batch_size due jobs for one worker"""
+        now = time.time()
+        claimable = and_(
+            BackgroundJob.status == "pending",
+            BackgroundJob.run_after_ts <= now,
+            or_(BackgroundJob.claimed_ts.is_(None), BackgroundJob.claimed_ts < now - self.visibility_timeout)
+        )
+        candidates = select(BackgroundJob.id).where(claimable).order_by(BackgroundJob.run_after_ts).limit(self.batch_size)
+        token = uuid.uuid4().hex
+        # Re-check claimable on the outer UPDATE so a concurrent claimer can't take the same rows
+        db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id.in_(candidates.scalar_subquery()), claimable)
+            .values(claim_token=token, claimed_ts=now, attempts=BackgroundJob.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        rows = db.execute(
+            select(
+                BackgroundJob.id, BackgroundJob.kind, BackgroundJob.payload, BackgroundJob.attempts,
+                BackgroundJob.max_attempts, BackgroundJob.run_after_ts
+            )
+            .where(BackgroundJob.claim_token == token)
+            .order_by(BackgroundJob.run_after_ts)
+        ).all()
+        return [dict(row._mapping, token=token) for row in rows]
+
+    def execute(self, job: Dict) -> bool:
+        """Run one claimed job; returns True if it completed"""
+        mine = and_(BackgroundJob.id == job["id"], BackgroundJob.claim_token == job["token"])
+        db = SessionLocal()
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise LookupError(f"No handler for job kind '{job['kind']}'")
+            handler(db, json.loads(job["payload"]))
+            done = db.execute(
+                update(BackgroundJob).where(mine)
+                .values(status="done", finished_ts=time.time(), last_error=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not done:
+                # Our claim expired and another worker owns the job now; let it apply the effects
+                db.rollback()
+                return False
+            db.commit()
+            self.processed += 1
+            for listener in self.listeners.get(job["kind"], []):
+                try:
+                    listener(json.loads(job["payload"]))
+                except Exception as e:
+                    print(f"⚠️  Job {job['id']} ({job['kind']}) listener error: {e}")
+            return True
+        except Exception as e:
+            db.rollback()
+            error = "".join(traceback.format_exception_only(type(e), e)).strip()
+            final = job["attempts"] >= job["max_attempts"]
+            db.execute(
+                update(BackgroundJob).where(mine)
+                .values(
+                    status="failed" if final else "pending",
+                    claim_token=None,
+                    claimed_ts=None,
+                    run_after_ts=time.time() + self.retry_base ** job["attempts"],
+                    finished_ts=time.time() if final else None,
+                    last_error=error
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            if final:
+                self.failed += 1
+                print(f"❌ Job {job['id']} ({job['kind']}) failed after {job['attempts']} attempts: {error}")
+            else:
+                self.retried += 1
+            return False
+        finally:
+            db.close()
+
+    def retry(self, db: Session, job_id: int) -> bool:
+        """Requeue a failed job with a fresh attempt budget"""
+        return db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == "failed")
+            .values(status="pending", attempts=0, run_after_ts=time.time(), claim_token=None,
+                    claimed_ts=None, finished_ts=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount > 0
+
+    def prune(self, db: Session):
+        """Delete completed jobs older than the retention period (failed ones are kept)"""
+        db.execute(delete(BackgroundJob).where(
+            BackgroundJob.status == "done",
+            BackgroundJob.finished_ts < time.time() - self.retention
+        ))
+        db.commit()
+
+    def _claim(self) -> List[Dict]:
+        db = SessionLocal()
+        try:
+            return self.claim_batch(db)
+        finally:
+            db.close()
+
+    async def _worker(self):
+        while True:
+            batch: List[Dict] = []
+            try:
+                batch = await run_in_threadpool(self._claim)
+                for job in batch:
+                    self._lags.append(max(0.0, time.time() - job["run_after_ts"]))
+                    await run_in_threadpool(self.execute, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Job worker error: {e}")
+
+            # Keep draining while there is a backlog
+            if len(batch) < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    def _prune(self):
+        db = SessionLocal()
+        try:
+            self.prune(db)
+        finally:
+            db.close()
+
+    async def _pruner(self):
+        while True:
+            await asyncio.sleep(3600)
+            try:
+                await run_in_threadpool(self._prune)
+            except Exception as e:
+                print(f"⚠️  Job prune error: {e}")
+
+    async def run(self):
+        """Background task: run the worker coroutines until cancelled"""
+        tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(self._pruner()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def lag_at(self, p: float) -> Optional[float]:
+        """Percentile of recent due-to-start lags on this worker"""
+        lags = sorted(self._lags)
+        return round(lags[min(len(lags) - 1, int(len(lags) * p))], 3) if lags else None
+
+    def stats(self, db: Session) -> Dict:
+        """Queue depth and lag from the table, throughput from this worker"""
+        now = time.time()
+        counts = dict(db.execute(
+            select(BackgroundJob.status, func.count()).group_by(BackgroundJob.status)
+        ).all())
+        oldest_due = db.execute(
+            select(func.min(BackgroundJob.run_after_ts))
+            .where(BackgroundJob.status == "pending", BackgroundJob.run_after_ts <= now)
+        ).scalar()
+        return {
+            "pending": counts.get("pending", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            # How far behind the queue is right now
+            "lag_seconds": round(now - oldest_due, 3) if oldest_due else 0.0,
+            "worker": {
+                "workers": self.workers,
+                "processed": self.processed,
+                "retried": self.retried,
+                "failed": self.failed,
+                "lag_p50_seconds": self.lag_at(0.50),
+                "lag_p95_seconds": self.lag_at(0.95)
+            }
+        }
+
+
+# Process-wide queue
+job_queue = JobQueue.from_env()
+
+
+def lock_order(db: Session, order_id: int) -> Optional[Order]:
+    # Serialize follow-up work per order (points are posted as a difference)
+    return db.query(Order).filter(Order.id == order_id).with_for_update().first()
+
+
+@job_queue.handler(JOB_ORDER_CREATED)
+def handle_order_created(db: Session, payload: Dict):
+    """Product sales counters, the user's purchase index and the order's points award"""
+    order = lock_order(db, payload["order_id"])
+    if order is None:
+        return
+    quantities = db.execute(
+        select(OrderItem.product_id, func.sum(OrderItem.quantity))
+        .where(OrderItem.order_id == order.id, OrderItem.product_id.isnot(None))
+        .group_by(OrderItem.product_id)
+        .order_by(OrderItem.product_id)
+    ).all()
+    for product_id, quantity in quantities:
+        db.execute(
+            update(Product).where(Product.id == product_id)
+            .values(sales_count=func.coalesce(Product.sales_count, 0) + quantity)
+            .execution_options(synchronize_session=False)
+        )
+    record_order(db, order)
+    sync_order_points(db, order)
+
+
+@job_queue.handler(JOB_ORDER_STATUS_CHANGED)
+def handle_order_status_changed(db: Session, payload: Dict):
+    """Reverse points on cancellation, re-award if an order is reinstated; same for the purchase index"""
+    order = lock_order(db, payload["order_id"])
+    if order is None:
+        return
+    # Older payloads carry no previous status; rebuilding the index is safe either way
+    if "cancelled" in (order.status, payload.get("previous_status", "cancelled")):
+        record_order(db, order)
+    sync_order_points(db, order)
+
+
+@job_queue.handler(JOB_RELATED_PRODUCTS)
+def handle_related_products(db: Session, payload: Dict):
+    """Rebuild the "frequently bought together" table from order history"""
+    stats = build_relations(db, **payload)
+    print(f"🔗 Related products rebuilt: {stats['relations']} relations from {stats['orders']} orders in {stats['seconds']}s")
@@ -1,29 +1,57 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Header, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.concurrency import run_in_threadpool
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, insert, update, delete, func, case, tuple_, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import Optional, List, Dict, AsyncGenerator
+import io
+import os
 import time
 import json
+import base64
+import tempfile
+import asyncio
 from collections import defaultdict
 from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 
-from .database import engine, get_db, Base
-from .models import User, Category, Product, CartItem, Order, OrderItem, AdminOffer
+from .database import engine, async_engine, get_db, get_async_db, get_pool_stats, Base
+from .catalog import (
+    CatalogImport, import_format, load_categories, update_products, catalog_version, IMPORT_FORMATS,
+    REQUIRED_PRODUCT_FIELDS
+)
+from .models import User, Category, Product, CartItem, Order, OrderItem, AdminOffer, BackgroundJob, UserPurchase
 from .schemas import (
     UserRegister, UserLogin, Token, UserResponse,
     UserProfileUpdate, LocationUpdate, AdminUserUpdate, ShopDetailsUpdate,
     CategoryCreate, CategoryUpdate, CategoryResponse,
-    ProductCreate, ProductUpdate, ProductResponse,
-    CartItemCreate, CartItemUpdate, CartItemResponse,
+    ProductCreate, ProductUpdate, ProductResponse, ProductBulkUpdate, RelatedProductResponse,
+    CartItemCreate, CartItemUpdate, CartItemResponse, CartBatch, CartBatchOperation, FrequentItemResponse,
     OrderCreate, OrderCreateDirect, OrderResponse,
-    AdminOfferCreate, AdminOfferResponse, AdminCreate, AdminChangePassword
+    AdminOfferCreate, AdminOfferResponse, AdminCreate, AdminChangePassword,
+    PointsHistoryResponse
 )
 from .auth import (
     get_password_hash, verify_password, create_access_token, decode_token
 )
+from .points import (
+    calculate_points_from_size, get_points_history, reconcile_balances
+)
+from .pricing import pricing_engine, apply_discount_percent
+from .offers import offer_schedule
+from .bus import create_bus, WORKER_ID
+from .carts import cart_summary_cache, bump_cart_version
+from .rankings import product_rankings, POPULAR, FEATURED
+from .connections import ConnectionManager
+from .writer import write_queue
+from .replicas import replica_router, get_read_db, get_async_read_db, token_user_id, write_marker, LAST_WRITE_HEADER
+from .events import enqueue_event, outbox_dispatcher, ORDER_CREATED, ORDER_STATUS_CHANGED
+from .jobs import enqueue_job, job_queue, JOB_ORDER_CREATED, JOB_ORDER_STATUS_CHANGED, JOB_RELATED_PRODUCTS
+from .recommendations import related_products
+from .metrics import metrics, Metric, MetricsMiddleware, instrument_engine
+from .profiler import query_profiler, QueryProfilerMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
@@ -50,10 +78,43 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     except Exception as e:
         print(f"Server Startup Warning: {e}")
     
+    # 3. SQLite production mode: start this worker's group-commit writer
+    write_queue.start()
+    
+    # 4. Join the cross-worker message bus so notifications reach sockets on every worker
+    try:
+        await notification_bus.start()
+    except Exception as e:
+        print(f"⚠️  Message bus failed to start: {e}")
+    
+    # 5. Background tasks: offer start/end pushes, outbox event delivery, heartbeats, job workers,
+    #    popular/featured list refreshes, metrics snapshots for /metrics
+    background_tasks = [
+        asyncio.create_task(offer_schedule.run(push_offer_transitions)),
+        asyncio.create_task(outbox_dispatcher.run(publish_outbox_batch)),
+        asyncio.create_task(manager.run_heartbeat()),
+        asyncio.create_task(job_queue.run()),
+        asyncio.create_task(product_rankings.run()),
+        asyncio.create_task(metrics.run()),
+    ]
+    if replica_router.enabled:
+        background_tasks.append(asyncio.create_task(replica_router.run()))
+    
     yield
     
     # Shutdown
     print("Shutting down...")
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await notification_bus.stop()
+    await run_in_threadpool(write_queue.stop)
+    await replica_router.dispose()
+    await async_engine.dispose()
 
 # API Documentation Metadata
 tags_metadata = [
@@ -126,7 +187,7 @@ Get your token by calling `/api/auth/login` or `/api/auth/register`.
 
 ### Rate Limiting
 
-API requests are limited to **100 requests per minute per IP address**.
+API requests are limited to **100 requests per minute per IP address** (`RATE_LIMIT_PER_MINUTE`).
 
 ### Response Codes
 
@@ -161,6 +222,8 @@ API requests are limited to **100 requests per minute per IP address**.
 
 # Rate limiting storage
 rate_limit_storage = defaultdict(list)
+# Requests per minute per IP; 0 turns the limit off (local load tests, see scripts/load_test.py)
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "100"))
 
 # Security middleware for rate limiting
 @app.middleware("http")
@@ -172,7 +235,12 @@ async def rate_limit_middleware(request: Request, call_next):
     if request.url.path in ["/", "/health"]:
         return await call_next(request)
     
-    # Rate limit: 100 requests per minute per IP
+    if not RATE_LIMIT_PER_MINUTE:
+        response = await call_next(request)
+        add_security_headers(response)
+        return response
+    
+    # Rate limit: RATE_LIMIT_PER_MINUTE (default 100) requests per minute per IP
     current_time = datetime.now()
     minute_ago = current_time - timedelta(minutes=1)
     
@@ -183,7 +251,7 @@ async def rate_limit_middleware(request: Request, call_next):
     ]
     
     # Check rate limit
-    if len(rate_limit_storage[client_ip]) >= 100:
+    if len(rate_limit_storage[client_ip]) >= RATE_LIMIT_PER_MINUTE:
         return JSONResponse(
             status_code=429,
             content={"detail": "Too many requests. Please try again later."}
@@ -193,12 +261,27 @@ async def rate_limit_middleware(request: Request, call_next):
     rate_limit_storage[client_ip].append(current_time)
     
     response = await call_next(request)
-    
-    # Add security headers
+    add_security_headers(response)
+    return response
+
+def add_security_headers(response):
     response.headers["X-Content-Type-Options"] = "nosniff"
     response.headers["X-Frame-Options"] = "DENY"
     response.headers["X-XSS-Protection"] = "1; mode=block"
     response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+
+# Read-your-writes: after a user's successful write, their reads avoid replicas that haven't caught up
+@app.middleware("http")
+async def replica_stickiness_middleware(request: Request, call_next):
+    response = await call_next(request)
+    
+    if replica_router.enabled and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        user_id = token_user_id(request.headers.get("authorization"))
+        if user_id is not None:
+            written_at = time.time()
+            replica_router.mark_write(user_id, written_at)
+            # Other workers learn about it from the client, which echoes this header on its next requests
+            response.headers[LAST_WRITE_HEADER] = write_marker(user_id, written_at)
     
     return response
 
@@ -214,6 +297,7 @@ app.add_middleware(
         "Accept",
         "Origin",
         "X-Requested-With",
+        "X-Last-Write",
         "Access-Control-Request-Method",
         "Access-Control-Request-Headers",
     ],
@@ -221,11 +305,20 @@ app.add_middleware(
     max_age=86400,  # Cache preflight for 24 hours
 )
 
-# Dependency to get current user from JWT token
-async def get_current_user(
-    authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
-):
+# Debug-only (SQL_PROFILE=1) per-request query profiles and Server-Timing (see app/profiler.py)
+app.add_middleware(QueryProfilerMiddleware)
+# Outermost, so latency covers every middleware (see app/metrics.py)
+app.add_middleware(MetricsMiddleware)
+for name, sync_engine in [("primary", engine), ("primary", async_engine.sync_engine)] + [
+    (kind, replica_engine)
+    for replica in replica_router.replicas
+    for kind, replica_engine in (("replica", replica.engine), ("replica", replica.async_engine.sync_engine))
+]:
+    instrument_engine(sync_engine, name)
+    query_profiler.instrument(sync_engine)
+
+def get_token_email(authorization: Optional[str]) -> str:
+    """Extract the user email from a "Bearer <token>" header, or raise 401"""
     if not authorization:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -255,6 +348,16 @@ async def get_current_user(
             detail="Invalid token payload"
         )
     
+    return email
+
+# Dependency to get current user from JWT token
+# Plain def so the user lookup runs in the threadpool instead of blocking the event loop
+def get_current_user(
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    email = get_token_email(authorization)
+    
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise HTTPException(
@@ -264,6 +367,38 @@ async def get_current_user(
     
     return user
 
+# Async variant for async def endpoints; the user belongs to the request's AsyncSession
+async def get_current_user_async(
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    email = get_token_email(authorization)
+    
+    user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    
+    return user
+
+ORDER_STATUSES = ["pending", "confirmed", "processing", "shipped", "delivered", "cancelled"]
+
+def order_items_eager():
+    """
+    Loader option for serializing orders: items, then just the image path of
+    their products, each as one batched SELECT ... IN, so the query count
+    doesn't grow with the number of orders
+    """
+    return selectinload(Order.order_items).selectinload(OrderItem.product).load_only(Product.image_path)
+
+async def load_order(db: AsyncSession, order_id: int) -> Order:
+    """Read back an order written by a write job, ready for OrderResponse"""
+    return (await db.execute(
+        select(Order).options(order_items_eager()).where(Order.id == order_id)
+    )).scalar_one()
+
 @app.get(
     "/",
     tags=["Root"],
@@ -351,7 +486,7 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
     db.refresh(new_user)
     
     # Create access token
-    access_token = create_access_token(data={"sub": new_user.email})
+    access_token = create_access_token(data={"sub": new_user.email, "user_id": new_user.id})
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -362,7 +497,7 @@ def register(user_data: UserRegister, db: Session = Depends(get_db)):
     summary="User Login",
     description="Authenticate user and receive JWT token"
 )
-def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
     """
     Authenticate user with email and password.
     
@@ -388,7 +523,7 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
     - 401: Invalid credentials
     - 422: Validation error
     """
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = (await db.execute(select(User).where(User.email == credentials.email))).scalar_one_or_none()
     
     if not user or not verify_password(credentials.password, user.hashed_password):
         raise HTTPException(
@@ -397,7 +532,7 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
         )
     
     # Create access token
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data={"sub": user.email, "user_id": user.id})
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -407,7 +542,7 @@ def login(credentials: UserLogin, db: Session = Depends(get_db)):
     summary="Validate Token",
     description="Check if the current JWT token is valid and return user info"
 )
-def validate_token(current_user: User = Depends(get_current_user)):
+async def validate_token(current_user: User = Depends(get_current_user_async)):
     """
     Validate JWT token and return user information.
     
@@ -529,6 +664,34 @@ def update_shop_details(
     
     return current_user
 
+@app.get("/api/user/frequent-items", response_model=List[FrequentItemResponse])
+async def get_frequent_items(
+    limit: int = 20,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """Products the user orders most often (by number of orders, then most recent), with their size and last quantity"""
+    rows = (await db.execute(
+        select(UserPurchase, Product)
+        .join(Product, Product.id == UserPurchase.product_id)
+        .options(joinedload(Product.category))
+        .where(UserPurchase.user_id == current_user.id, Product.is_active == True)
+        .order_by(UserPurchase.order_count.desc(), UserPurchase.last_ordered_at.desc())
+        .limit(max(1, min(limit, 100)))
+    )).all()
+    return [
+        {
+            "product_id": purchase.product_id,
+            "size": purchase.size or None,
+            "order_count": purchase.order_count,
+            "total_quantity": purchase.total_quantity,
+            "last_quantity": purchase.last_quantity,
+            "last_ordered_at": purchase.last_ordered_at,
+            "product": apply_discount_percent(product)
+        }
+        for purchase, product in rows
+    ]
+
 @app.put("/api/user/location", response_model=UserResponse)
 def update_location(
     location_data: LocationUpdate,
@@ -562,7 +725,7 @@ def update_location(
 )
 def get_user_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get comprehensive shopping statistics for the authenticated user.
@@ -651,6 +814,32 @@ def get_user_stats(
         "reward_points": current_user.points or 0  # User's loyalty points
     }
 
+@app.get(
+    "/api/user/points/history",
+    response_model=PointsHistoryResponse,
+    tags=["User Profile"],
+    summary="Get Points History",
+    description="Retrieve the user's loyalty points ledger, newest first"
+)
+def get_user_points_history(
+    before_id: Optional[int] = None,
+    limit: int = 50,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Get the authenticated user's points transactions.
+    
+    **Authentication Required:** Yes
+    
+    **Pagination:**
+    - Pass `next_before_id` from the previous page as `before_id` to get the next page
+    - `next_before_id` is null on the last page
+    """
+    limit = max(1, min(limit, 200))
+    history = get_points_history(db, current_user.id, before_id=before_id, limit=limit)
+    return {"balance": current_user.points or 0, **history}
+
 # ==================== DASHBOARD DATA ENDPOINTS ====================
 
 @app.get("/api/rewards")
@@ -663,33 +852,6 @@ def get_rewards(current_user: User = Depends(get_current_user)):
         "points": 0
     }
 
-@app.get("/api/offers")
-def get_offers(current_user: User = Depends(get_current_user)):
-    """Get available offers"""
-    # TODO: Implement actual offers from database
-    return {
-        "offers": [
-            {
-                "id": 1,
-                "title": "Premium Emulsion Paint",
-                "description": "High quality interior paint",
-                "price": 450,
-                "originalPrice": 600,
-                "discount": 25,
-                "image": "https://via.placeholder.com/200"
-            },
-            {
-                "id": 2,
-                "title": "Exterior Weather Shield",
-                "description": "Weather resistant exterior coating",
-                "price": 550,
-                "originalPrice": 750,
-                "discount": 27,
-                "image": "https://via.placeholder.com/200"
-            }
-        ]
-    }
-
 # ==================== ADMIN ENDPOINTS ====================
 
 # Dependency to verify admin access
@@ -779,6 +941,38 @@ def delete_user(
     db.commit()
     return {"message": f"User {user.email} deleted successfully"}
 
+@app.get("/api/admin/users/{user_id}/points/history", response_model=PointsHistoryResponse)
+def get_user_points_history_admin(
+    user_id: int,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_read_db)
+):
+    """Get a user's points ledger (admin only)"""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    limit = max(1, min(limit, 200))
+    history = get_points_history(db, user.id, before_id=before_id, limit=limit)
+    return {"balance": user.points or 0, **history}
+
+@app.post("/api/admin/points/reconcile")
+def reconcile_points(
+    fix: bool = False,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Verify cached user point balances against the ledger (admin only)"""
+    report = reconcile_balances(db, fix=fix)
+    if fix:
+        db.commit()
+    return report
+
 @app.post("/api/admin/create-admin", response_model=UserResponse, tags=["Admin - User Management"])
 def create_admin_user(
     admin_data: AdminCreate,
@@ -855,7 +1049,7 @@ def change_admin_password(
 )
 def get_admin_stats(
     admin_user: User = Depends(get_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get comprehensive statistics for the admin dashboard.
@@ -956,18 +1150,28 @@ def get_admin_stats(
 # =========================
 
 @app.get("/api/categories", response_model=List[CategoryResponse])
-def get_categories(
-    db: Session = Depends(get_db)
+async def get_categories(
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get all active categories"""
-    categories = db.query(Category).filter(Category.is_active == True).order_by(Category.display_order).all()
-    
-    # Add product count to each category
-    for category in categories:
-        category.product_count = db.query(Product).filter(
-            Product.category_id == category.id,
-            Product.is_active == True
-        ).count()
+    # Active product counts for every category in the same statement
+    product_counts = (
+        select(Product.category_id, func.count(Product.id).label("product_count"))
+        .where(Product.is_active == True)
+        .group_by(Product.category_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(Category, func.coalesce(product_counts.c.product_count, 0))
+        .outerjoin(product_counts, product_counts.c.category_id == Category.id)
+        .where(Category.is_active == True)
+        .order_by(Category.display_order)
+    )).all()
+    
+    categories = []
+    for category, product_count in rows:
+        category.product_count = product_count
+        categories.append(category)
     
     return categories
 
@@ -1065,14 +1269,14 @@ def delete_category(
     summary="Get Products",
     description="Retrieve products with optional filtering, searching, and sorting"
 )
-def get_products(
+async def get_products(
     category_id: Optional[int] = None,
     search: Optional[str] = None,
     sort_by: Optional[str] = "newest",
     is_featured: Optional[bool] = None,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Retrieve a list of products with advanced filtering and sorting options.
@@ -1109,21 +1313,31 @@ def get_products(
     - Sales count
     - Featured status
     """
-    query = db.query(Product).options(
+    # Popular and featured listings come straight from the precomputed lists
+    ranked = None
+    if not search and skip + limit <= product_rankings.top_n:
+        if sort_by == "popular" and is_featured is None:
+            ranked = POPULAR
+        elif sort_by == "newest" and is_featured:
+            ranked = FEATURED
+    if ranked:
+        return (await ranked_products(db, ranked, category_id or None))[skip:skip + limit]
+    
+    query = select(Product).options(
         joinedload(Product.category)
-    ).filter(Product.is_active == True)
+    ).where(Product.is_active == True)
     
     if category_id:
-        query = query.filter(Product.category_id == category_id)
+        query = query.where(Product.category_id == category_id)
     
     if search:
-        query = query.filter(
+        query = query.where(
             (Product.name.ilike(f"%{search}%")) | 
             (Product.description.ilike(f"%{search}%"))
         )
     
     if is_featured is not None:
-        query = query.filter(Product.is_featured == is_featured)
+        query = query.where(Product.is_featured == is_featured)
     
     # Sorting
     if sort_by == "price_low":
@@ -1135,38 +1349,86 @@ def get_products(
     else:  # newest
         query = query.order_by(Product.created_at.desc())
     
-    products = query.offset(skip).limit(limit).all()
+    products = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
     
     # Calculate discount percent
     for product in products:
-        if product.original_price and product.original_price > product.price:
-            product.discount_percent = int(((product.original_price - product.price) / product.original_price) * 100)
-        else:
-            product.discount_percent = 0
+        apply_discount_percent(product)
     
     return products
 
+async def ranked_products(db: AsyncSession, name: str, category_id: Optional[int]) -> List[Dict]:
+    """A precomputed top-N list, built on first use if the background refresh hasn't run yet"""
+    if product_rankings.is_loaded:
+        product_rankings.hits += 1
+    else:
+        await db.run_sync(product_rankings.ensure_loaded)
+    return product_rankings.top(name, category_id)
+
+@app.get("/api/products/popular", response_model=List[ProductResponse], tags=["Products"], summary="Popular Products")
+async def get_popular_products(
+    category_id: Optional[int] = None,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Best sellers (by sales count, then views), overall or within a category.
+    Served from a list rebuilt in the background, so counts can lag recent
+    orders by a few seconds. `limit` is capped at RANKINGS_TOP_N (default 50).
+    """
+    return (await ranked_products(db, POPULAR, category_id))[:max(limit, 0)]
+
+@app.get("/api/products/featured", response_model=List[ProductResponse], tags=["Products"], summary="Featured Products")
+async def get_featured_products(
+    category_id: Optional[int] = None,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Featured products, newest first, overall or within a category. Served
+    from the same precomputed lists as /api/products/popular.
+    """
+    return (await ranked_products(db, FEATURED, category_id))[:max(limit, 0)]
+
 @app.get("/api/products/{product_id}", response_model=ProductResponse)
-def get_product(
+async def get_product(
     product_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get single product details"""
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = (await db.execute(
+        select(Product).options(joinedload(Product.category)).where(Product.id == product_id)
+    )).scalar_one_or_none()
     if not product or not product.is_active:
         raise HTTPException(status_code=404, detail="Product not found")
     
-    # Increment view count
+    # Increment view count in SQL so concurrent views don't overwrite each other;
+    # the response doesn't wait for it
+    write_queue.defer(lambda conn: conn.execute(
+        update(Product).where(Product.id == product_id).values(views=Product.views + 1)
+    ))
     product.views += 1
-    db.commit()
     
-    # Calculate discount
-    if product.original_price and product.original_price > product.price:
-        product.discount_percent = int(((product.original_price - product.price) / product.original_price) * 100)
-    else:
-        product.discount_percent = 0
-    
-    return product
+    return apply_discount_percent(product)
+
+@app.get(
+    "/api/products/{product_id}/related",
+    response_model=List[RelatedProductResponse],
+    tags=["Products"],
+    summary="Frequently Bought Together"
+)
+async def get_related_products(
+    product_id: int,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Products most often ordered together with this one, best first, with
+    the number of orders that contained both. Served from an index rebuilt
+    offline from order history; empty if the product has no history yet.
+    """
+    await db.run_sync(related_products.ensure_fresh)
+    return related_products.get(product_id, limit=max(limit, 0))
 
 @app.post("/api/admin/products", response_model=ProductResponse)
 def create_product(
@@ -1187,6 +1449,7 @@ def create_product(
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    invalidate_catalog_caches()
     db_product.discount_percent = 0
     return db_product
 
@@ -1234,6 +1497,7 @@ def update_product(
     
     db.commit()
     db.refresh(db_product)
+    invalidate_catalog_caches()
     
     if db_product.original_price and db_product.original_price > db_product.price:
         db_product.discount_percent = int(((db_product.original_price - db_product.price) / db_product.original_price) * 100)
@@ -1263,38 +1527,230 @@ def delete_product(
     
     db.delete(db_product)
     db.commit()
+    invalidate_catalog_caches()
     return {"message": "Product deleted successfully"}
 
+def invalidate_catalog_caches():
+    """Bump the catalogue version after a product write, on every worker"""
+    catalog_version.bump()
+    product_rankings.mark_stale()
+    notification_bus.publish_from_thread("catalog", {"event": "invalidate", "origin": WORKER_ID})
+
+@app.post("/api/admin/products/import")
+async def import_products(
+    request: Request,
+    format: Optional[str] = None,
+    replace: bool = False,
+    dry_run: bool = False,
+    skip_invalid: bool = False,
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Admin: Bulk upsert products from a CSV, JSON Lines or JSON array body.
+    
+    Products are matched by category + name + size. With `replace=true`,
+    products of the imported categories that are missing from the file are
+    deactivated. The whole import is applied in one transaction; any invalid
+    row aborts it unless `skip_invalid=true`. `dry_run=true` reports what
+    would change without writing.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    fmt = format or import_format(content_type=request.headers.get("content-type"))
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format, use one of: {', '.join(IMPORT_FORMATS)}")
+    
+    # Spool the upload (to disk past 8 MB) so parsing never holds the event loop
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    
+    def parse() -> CatalogImport:
+        with engine.connect() as conn:
+            catalog_import = CatalogImport(load_categories(conn))
+        with io.TextIOWrapper(spool, encoding="utf-8-sig", newline="") as stream:
+            catalog_import.read(stream, fmt)
+        return catalog_import
+    
+    try:
+        catalog_import = await run_in_threadpool(parse)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse {fmt} body: {e}")
+    
+    def reject_invalid():
+        if catalog_import.invalid and not skip_invalid:
+            raise HTTPException(status_code=400, detail={
+                "message": f"{catalog_import.invalid} invalid rows, nothing imported",
+                **catalog_import.summary()
+            })
+    
+    def apply(conn) -> Dict:
+        applied = catalog_import.apply(conn, replace=replace)
+        # apply() also rejects new products without a price; raising rolls its writes back
+        reject_invalid()
+        return applied
+    
+    reject_invalid()
+    if dry_run:
+        def preview():
+            with engine.connect() as conn:
+                applied = apply(conn)
+                conn.rollback()
+            return applied
+        applied = await run_in_threadpool(preview)
+    else:
+        applied = await write_queue.run(apply)
+    
+    summary = catalog_import.summary(applied)
+    summary["dry_run"] = dry_run
+    if not dry_run:
+        invalidate_catalog_caches()
+        print(f"📦 Catalogue import: {applied['inserted']} inserted, {applied['updated']} updated, "
+              f"{applied['deactivated']} deactivated ({summary['rows_per_sec']} rows/sec)")
+    return summary
+
+def required_nulls(values: dict) -> List[str]:
+    """Fields of a product patch explicitly set to null that the products table requires"""
+    return [field for field in REQUIRED_PRODUCT_FIELDS if field in values and values[field] is None]
+
+@app.post("/api/admin/products/bulk-update")
+async def bulk_update_products(
+    bulk: ProductBulkUpdate,
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Admin: Update many products in one transaction.
+    
+    Send either `updates` (a list of `{id, ...fields}`) or a `filter` with a
+    `patch` and/or `price_change_percent` applied to every matching product
+    (a patch that sets `price` can't be combined with a percent change).
+    Only values that actually change are written, with one UPDATE per set of
+    changed fields. Returns a per-product diff of old and new values.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if bulk.updates:
+        if bulk.filter or bulk.patch or bulk.price_change_percent is not None:
+            raise HTTPException(status_code=400, detail="Send either updates or a filter with a patch, not both")
+        patches = {}
+        for index, item in enumerate(bulk.updates):
+            values = item.dict(exclude_unset=True, exclude={"id"})
+            null_fields = required_nulls(values)
+            if null_fields:
+                raise HTTPException(status_code=400, detail={
+                    "message": f"Row {index} (product {item.id}): {', '.join(null_fields)} cannot be null",
+                    "row": index,
+                    "id": item.id,
+                    "fields": null_fields
+                })
+            patches.setdefault(item.id, {}).update(values)
+        criteria = [Product.id.in_(patches)]
+        patch_for = lambda row: patches[row.id]
+    else:
+        product_filter = bulk.filter.dict(exclude_none=True) if bulk.filter else {}
+        if not product_filter:
+            raise HTTPException(status_code=400, detail="A filter is required to update products in bulk")
+        patch = bulk.patch.dict(exclude_unset=True) if bulk.patch else {}
+        null_fields = required_nulls(patch)
+        if null_fields:
+            raise HTTPException(status_code=400, detail={
+                "message": f"Patch: {', '.join(null_fields)} cannot be null",
+                "fields": null_fields
+            })
+        percent = bulk.price_change_percent
+        if not patch and percent is None:
+            raise HTTPException(status_code=400, detail="Nothing to update: send a patch or price_change_percent")
+        if "price" in patch and percent is not None:
+            raise HTTPException(status_code=400, detail="Send either patch.price or price_change_percent, not both")
+        
+        criteria = []
+        if "ids" in product_filter:
+            criteria.append(Product.id.in_(product_filter["ids"]))
+        if "category_id" in product_filter:
+            criteria.append(Product.category_id == product_filter["category_id"])
+        if "name_contains" in product_filter:
+            criteria.append(Product.name.ilike(f"%{product_filter['name_contains']}%"))
+        if "size" in product_filter:
+            criteria.append(func.lower(Product.size) == product_filter["size"].lower())
+        if "is_active" in product_filter:
+            criteria.append(Product.is_active == product_filter["is_active"])
+        if "is_featured" in product_filter:
+            criteria.append(Product.is_featured == product_filter["is_featured"])
+        
+        def patch_for(row):
+            values = dict(patch)
+            if percent is not None:
+                values["price"] = round(row.price * (1 + percent / 100), 2)
+            return values
+    
+    def job(conn):
+        result = update_products(conn, criteria, patch_for)
+        if bulk.updates:
+            missing = sorted(set(patches) - set(result["matched_ids"]))
+            if missing:
+                raise LookupError(missing)
+        return result
+    
+    try:
+        if bulk.dry_run:
+            def preview():
+                with engine.connect() as conn:
+                    result = job(conn)
+                    conn.rollback()
+                return result
+            result = await run_in_threadpool(preview)
+        else:
+            result = await write_queue.run(job)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail={"message": "Products not found", "ids": e.args[0]})
+    
+    if result["updated"] and not bulk.dry_run:
+        invalidate_catalog_caches()
+        print(f"🏷️  Bulk product update: {result['updated']} products in {result['statements']} statements")
+    
+    return {
+        "matched": len(result.pop("matched_ids")),
+        **result,
+        "dry_run": bulk.dry_run
+    }
+
 # =========================
 # SHOPPING CART
 # =========================
 
 @app.get("/api/cart", response_model=List[CartItemResponse])
-def get_cart(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_cart(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's shopping cart"""
-    cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
+    return await load_cart(db, current_user.id)
+
+async def load_cart(db: AsyncSession, user_id: int) -> List[Dict]:
+    """Cart lines with their products, for CartItemResponse"""
+    # One statement for items, products and categories
+    cart_items = (await db.execute(
+        select(CartItem)
+        .options(joinedload(CartItem.product).joinedload(Product.category))
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+    )).scalars().all()
     
     response = []
     for item in cart_items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = item.product
         if product and product.is_active:
             cart_item_data = {
                 "id": item.id,
                 "product_id": item.product_id,
                 "quantity": item.quantity,
                 "selected_size": item.selected_size,
-                "product": product,
+                "product": apply_discount_percent(product),
                 "subtotal": product.price * item.quantity
             }
-            # Add discount to product
-            if product.original_price and product.original_price > product.price:
-                product.discount_percent = int(((product.original_price - product.price) / product.original_price) * 100)
-            else:
-                product.discount_percent = 0
-            
             response.append(cart_item_data)
     
     return response
@@ -1400,10 +1856,10 @@ def delete_product_admin(
     description="Add a product to the user's shopping cart",
     status_code=status.HTTP_201_CREATED
 )
-def add_to_cart(
+async def add_to_cart(
     cart_item: CartItemCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Add a product to the shopping cart.
@@ -1433,10 +1889,12 @@ def add_to_cart(
     - 401: Not authenticated
     """
     # Check if product exists and is active
-    product = db.query(Product).filter(
-        Product.id == cart_item.product_id,
-        Product.is_active == True
-    ).first()
+    product = (await db.execute(
+        select(Product).options(joinedload(Product.category)).where(
+            Product.id == cart_item.product_id,
+            Product.is_active == True
+        )
+    )).scalar_one_or_none()
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -1444,114 +1902,331 @@ def add_to_cart(
     if product.stock < cart_item.quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
     
-    # Check if item already in cart
-    existing_item = db.query(CartItem).filter(
-        CartItem.user_id == current_user.id,
-        CartItem.product_id == cart_item.product_id
-    ).first()
-    
-    if existing_item:
-        existing_item.quantity += cart_item.quantity
-        if cart_item.selected_size:
-            existing_item.selected_size = cart_item.selected_size
-        if product.stock < existing_item.quantity:
+    user_id = current_user.id
+    
+    def upsert_cart_line(conn):
+        # Merge with an existing line for the same product, re-checking stock inside the write
+        existing = conn.execute(
+            select(CartItem.id, CartItem.quantity, CartItem.selected_size).where(
+                CartItem.user_id == user_id,
+                CartItem.product_id == cart_item.product_id
+            )
+        ).first()
+        stock = conn.execute(select(Product.stock).where(Product.id == cart_item.product_id)).scalar()
+        quantity = cart_item.quantity + (existing.quantity if existing else 0)
+        if stock is None or stock < quantity:
             raise HTTPException(status_code=400, detail="Insufficient stock")
-        db.commit()
-        db.refresh(existing_item)
-        cart_response = existing_item
-    else:
-        db_cart_item = CartItem(
-            user_id=current_user.id,
+        selected_size = cart_item.selected_size or (existing.selected_size if existing else None)
+        
+        bump_cart_version(conn, user_id)
+        if existing:
+            conn.execute(
+                update(CartItem).where(CartItem.id == existing.id)
+                .values(quantity=quantity, selected_size=selected_size)
+            )
+            return existing.id, quantity, selected_size
+        
+        result = conn.execute(insert(CartItem).values(
+            user_id=user_id,
             product_id=cart_item.product_id,
-            quantity=cart_item.quantity,
-            selected_size=cart_item.selected_size
-        )
-        db.add(db_cart_item)
-        db.commit()
-        db.refresh(db_cart_item)
-        cart_response = db_cart_item
+            quantity=quantity,
+            selected_size=selected_size
+        ))
+        return result.inserted_primary_key[0], quantity, selected_size
     
-    # Prepare response
-    if product.original_price and product.original_price > product.price:
-        product.discount_percent = int(((product.original_price - product.price) / product.original_price) * 100)
-    else:
-        product.discount_percent = 0
+    cart_item_id, quantity, selected_size = await write_queue.run(upsert_cart_line)
     
     return {
-        "id": cart_response.id,
-        "product_id": cart_response.product_id,
-        "quantity": cart_response.quantity,
-        "selected_size": cart_response.selected_size,
-        "product": product,
-        "subtotal": product.price * cart_response.quantity
+        "id": cart_item_id,
+        "product_id": cart_item.product_id,
+        "quantity": quantity,
+        "selected_size": selected_size,
+        "product": apply_discount_percent(product),
+        "subtotal": product.price * quantity
     }
 
 @app.put("/api/cart/{cart_item_id}", response_model=CartItemResponse)
-def update_cart_item(
+async def update_cart_item(
     cart_item_id: int,
     cart_update: CartItemUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update cart item quantity"""
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == cart_item_id,
-        CartItem.user_id == current_user.id
-    ).first()
+    cart_item = (await db.execute(
+        select(CartItem)
+        .options(joinedload(CartItem.product).joinedload(Product.category))
+        .where(
+            CartItem.id == cart_item_id,
+            CartItem.user_id == current_user.id
+        )
+    )).scalar_one_or_none()
     
     if not cart_item:
         raise HTTPException(status_code=404, detail="Cart item not found")
     
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
+    product = cart_item.product
     if product.stock < cart_update.quantity:
         raise HTTPException(status_code=400, detail="Insufficient stock")
     
-    cart_item.quantity = cart_update.quantity
-    db.commit()
-    db.refresh(cart_item)
+    def set_quantity(conn):
+        conn.execute(update(CartItem).where(CartItem.id == cart_item_id).values(quantity=cart_update.quantity))
+        bump_cart_version(conn, current_user.id)
     
-    if product.original_price and product.original_price > product.price:
-        product.discount_percent = int(((product.original_price - product.price) / product.original_price) * 100)
-    else:
-        product.discount_percent = 0
+    await write_queue.run(set_quantity)
     
     return {
         "id": cart_item.id,
         "product_id": cart_item.product_id,
-        "quantity": cart_item.quantity,
-        "product": product,
-        "subtotal": product.price * cart_item.quantity
+        "quantity": cart_update.quantity,
+        "selected_size": cart_item.selected_size,
+        "product": apply_discount_percent(product),
+        "subtotal": product.price * cart_update.quantity
     }
 
 @app.delete("/api/cart/{cart_item_id}")
-def remove_from_cart(
+async def remove_from_cart(
     cart_item_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Remove item from cart"""
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == cart_item_id,
-        CartItem.user_id == current_user.id
-    ).first()
+    user_id = current_user.id
     
-    if not cart_item:
+    def remove_line(conn) -> int:
+        deleted = conn.execute(
+            delete(CartItem).where(
+                CartItem.id == cart_item_id,
+                CartItem.user_id == user_id
+            )
+        ).rowcount
+        if deleted:
+            bump_cart_version(conn, user_id)
+        return deleted
+    
+    deleted = await write_queue.run(remove_line)
+    
+    if deleted == 0:
         raise HTTPException(status_code=404, detail="Cart item not found")
     
-    db.delete(cart_item)
-    db.commit()
     return {"message": "Item removed from cart"}
 
 @app.delete("/api/cart")
-def clear_cart(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def clear_cart(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Clear entire cart"""
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
-    db.commit()
+    user_id = current_user.id
+    
+    def clear_lines(conn):
+        conn.execute(delete(CartItem).where(CartItem.user_id == user_id))
+        bump_cart_version(conn, user_id)
+    
+    await write_queue.run(clear_lines)
     return {"message": "Cart cleared"}
 
+@app.get("/api/cart/summary", tags=["Shopping Cart"])
+async def get_cart_summary(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Priced cart for the cart and checkout screens: per-line offer prices,
+    totals, savings, points the order would earn and stock warnings, priced
+    exactly as order creation will price it. Cached per user until the cart,
+    offers or catalogue change.
+    """
+    user_id = current_user.id
+    # Recompile offer rules first so a stale rule set can't serve a cached summary
+    await db.run_sync(pricing_engine.ensure_fresh)
+    # cart_version comes with the user row authentication already read; any worker's cart write bumps it
+    version = (pricing_engine.version, catalog_version.value, current_user.cart_version)
+    summary = cart_summary_cache.get(user_id, version)
+    if summary is None:
+        summary = await compute_cart_summary(db, user_id)
+        cart_summary_cache.put(user_id, version, summary)
+    
+    return {**summary, "points_balance": current_user.points or 0}
+
+async def compute_cart_summary(db: AsyncSession, user_id: int) -> Dict:
+    # One statement for cart lines and their products
+    rows = (await db.execute(
+        select(CartItem.id, CartItem.quantity, CartItem.selected_size, Product)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+    )).all()
+    
+    lines, warnings = [], []
+    for cart_item_id, quantity, selected_size, product in rows:
+        if not product.is_active:
+            warnings.append({
+                "cart_item_id": cart_item_id, "product_id": product.id, "product_name": product.name,
+                "type": "unavailable", "requested": quantity, "available": 0
+            })
+            continue
+        if product.stock < quantity:
+            warnings.append({
+                "cart_item_id": cart_item_id, "product_id": product.id, "product_name": product.name,
+                "type": "out_of_stock" if product.stock <= 0 else "insufficient_stock",
+                "requested": quantity, "available": max(product.stock, 0)
+            })
+        lines.append((cart_item_id, product, quantity, selected_size or product.size))
+    
+    pricing = await db.run_sync(lambda session: pricing_engine.price_lines(
+        session, [(product, quantity, size) for _, product, quantity, size in lines]
+    ))
+    
+    items = []
+    points_preview = 0
+    offer_savings = 0.0
+    for (cart_item_id, product, _, _), line in zip(lines, pricing["lines"]):
+        line_points = calculate_points_from_size(line["size"]) * line["quantity"] if line["size"] else 0
+        points_preview += line_points
+        offer_savings += (product.price - line["unit_price"]) * line["quantity"]
+        items.append({
+            **line,
+            "cart_item_id": cart_item_id,
+            "image_path": product.image_path,
+            "stock": product.stock,
+            "points": line_points
+        })
+    
+    original_amount = pricing["original_amount"]
+    return {
+        "items": items,
+        "item_count": len(items),
+        "total_quantity": sum(item["quantity"] for item in items),
+        "original_amount": original_amount,
+        "total_amount": pricing["total_amount"],
+        "discount_amount": pricing["discount_amount"],
+        "offer_savings": round(offer_savings, 2),
+        "savings_percent": round(pricing["discount_amount"] / original_amount * 100, 1) if original_amount else 0,
+        "points_preview": points_preview,
+        "warnings": warnings,
+        "can_checkout": bool(items) and not warnings
+    }
+
+def apply_cart_operations(conn, user_id: int, operations: List[CartBatchOperation]):
+    """
+    Write job: apply cart operations in order with one read of the cart and
+    products and one stock pass over the final quantities. Raises a 400 with
+    every error, before writing anything, if any operation fails.
+    """
+    lines = conn.execute(
+        select(CartItem.id, CartItem.product_id, CartItem.quantity, CartItem.selected_size)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+    ).all()
+    line_products = {line.id: line.product_id for line in lines}
+    # product_id -> [cart_item_id (None if new), quantity (0 if removed), selected_size]
+    cart = {}
+    for line in lines:
+        cart.setdefault(line.product_id, [line.id, line.quantity, line.selected_size])
+    
+    product_ids = {op.product_id for op in operations if op.product_id is not None}
+    product_ids.update(line_products[op.cart_item_id] for op in operations if op.cart_item_id in line_products)
+    products = {
+        row.id: row for row in conn.execute(
+            select(Product.id, Product.stock, Product.is_active).where(Product.id.in_(product_ids))
+        )
+    }
+    
+    errors = []
+    touched = set()
+    for index, op in enumerate(operations):
+        if op.op == "add":
+            product = products.get(op.product_id)
+            if product is None or not product.is_active:
+                errors.append({"index": index, "product_id": op.product_id, "error": "Product not found"})
+                continue
+            if op.quantity < 1:
+                errors.append({"index": index, "error": "Quantity must be at least 1"})
+                continue
+            line = cart.setdefault(op.product_id, [None, 0, None])
+            line[1] += op.quantity
+            line[2] = op.selected_size or line[2]
+            touched.add(op.product_id)
+            continue
+        
+        if op.cart_item_id is not None:
+            product_id = line_products.get(op.cart_item_id)
+        else:
+            product_id = op.product_id
+        line = cart.get(product_id)
+        if line is None or line[1] == 0:
+            errors.append({"index": index, "error": "Cart item not found"})
+            continue
+        if op.op == "remove":
+            line[1] = 0
+        else:
+            line[1] = op.quantity
+            line[2] = op.selected_size or line[2]
+        touched.add(product_id)
+    
+    # One stock pass over the final quantities
+    for product_id in touched:
+        quantity = cart[product_id][1]
+        product = products.get(product_id)
+        if quantity and (product is None or not product.is_active or product.stock < quantity):
+            errors.append({
+                "product_id": product_id,
+                "error": "Insufficient stock",
+                "available": product.stock if product and product.is_active else 0
+            })
+    
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "Cart not updated", "errors": errors})
+    
+    deletes, updates, inserts = [], [], []
+    for product_id in touched:
+        cart_item_id, quantity, selected_size = cart[product_id]
+        if not quantity:
+            if cart_item_id is not None:
+                deletes.append(cart_item_id)
+        elif cart_item_id is None:
+            inserts.append({
+                "user_id": user_id, "product_id": product_id,
+                "quantity": quantity, "selected_size": selected_size
+            })
+        else:
+            updates.append({"b_id": cart_item_id, "b_quantity": quantity, "b_selected_size": selected_size})
+    
+    if deletes:
+        conn.execute(delete(CartItem).where(CartItem.id.in_(deletes)))
+    if updates:
+        conn.execute(
+            update(CartItem).where(CartItem.id == bindparam("b_id"))
+            .values(quantity=bindparam("b_quantity"), selected_size=bindparam("b_selected_size")),
+            updates
+        )
+    if inserts:
+        conn.execute(insert(CartItem), inserts)
+    if deletes or updates or inserts:
+        bump_cart_version(conn, user_id)
+
+@app.post("/api/cart/batch", response_model=List[CartItemResponse], tags=["Shopping Cart"])
+async def batch_update_cart(
+    batch: CartBatch,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Apply several cart operations at once and return the whole cart.
+    
+    Operations run in order in one transaction: `add` (product_id, quantity,
+    merged into an existing line), `update` (set quantity, 0 removes) and
+    `remove`; update/remove target a line by cart_item_id or product_id.
+    Stock is checked once against the final quantities. If any operation
+    fails nothing is changed and the 400 response lists the errors.
+    """
+    user_id = current_user.id
+    operations = batch.operations
+    
+    await write_queue.run(lambda conn: apply_cart_operations(conn, user_id, operations))
+    return await load_cart(db, user_id)
+
 # =========================
 # ORDER MANAGEMENT
 # =========================
@@ -1564,10 +2239,10 @@ def clear_cart(
     description="Create a new order from shopping cart items",
     status_code=status.HTTP_201_CREATED
 )
-def create_order(
+async def create_order(
     order_data: OrderCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Create a new order from the user's shopping cart.
@@ -1616,94 +2291,77 @@ def create_order(
     - 400: Cart empty or product unavailable
     - 401: Not authenticated
     """
-    # Get cart items
-    cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
-    
-    if not cart_items:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-    
-    # Calculate total, original amount, and discount
-    total_amount = 0
-    original_amount = 0
-    discount_amount = 0
-    order_items_data = []
-    total_points = 0
-    
-    # Helper function to calculate points from size
-    def calculate_points_from_size(size_str):
-        """Calculate points: 1L=1pt, 4L=4pts, 10L=10pts, 20L=20pts"""
-        if not size_str:
-            return 0
-        try:
-            liters = int(size_str.replace('L', '').strip())
-            return liters
-        except:
-            return 0
-    
-    # Track locked products to avoid refetching and ensure atomicity
-    locked_products = {}
-
+    user_id = current_user.id
+    order_id = await write_queue.run(lambda conn: place_cart_order(conn, user_id, order_data))
+    return await load_order(db, order_id)
+
+def place_cart_order(conn, user_id: int, order_data: OrderCreate) -> int:
+    """Write job: turn the user's cart into an order, take stock and clear the cart; returns the order id"""
+    # An ORM session inside the writer's transaction; commit() only ends its savepoint
+    db = Session(bind=conn)
     try:
+        # Get cart items
+        cart_items = db.query(CartItem).filter(CartItem.user_id == user_id).all()
+        
+        if not cart_items:
+            raise HTTPException(status_code=400, detail="Cart is empty")
+        
+        order_items_data = []
+        total_points = 0
+        
+        # Lock all cart products in one statement (ordered by id to avoid deadlocks)
+        # with_for_update() ensures that other transactions cannot modify stock 
+        # until this transaction commits or rolls back
+        product_ids = sorted({item.product_id for item in cart_items})
+        locked_products = {
+            product.id: product
+            for product in db.query(Product).filter(Product.id.in_(product_ids)).order_by(Product.id).with_for_update().all()
+        }
+        
+        requested_quantities = defaultdict(int)
         for cart_item in cart_items:
-            # Lock the product row for update to prevent race conditions
-            # with_for_update() ensures that other transactions cannot modify stock 
-            # until this transaction commits or rolls back
-            product = db.query(Product).filter(Product.id == cart_item.product_id).with_for_update().first()
-            
+            requested_quantities[cart_item.product_id] += cart_item.quantity
+        
+        for product_id, quantity in requested_quantities.items():
+            product = locked_products.get(product_id)
             if not product or not product.is_active:
-                raise HTTPException(status_code=400, detail=f"Product {cart_item.product_id} not available")
-            
-            if product.stock < cart_item.quantity:
+                raise HTTPException(status_code=400, detail=f"Product {product_id} not available")
+            if product.stock < quantity:
                 raise HTTPException(status_code=400, detail=f"Insufficient stock for {product.name}")
-            
-            locked_products[cart_item.product_id] = product
-            
-            # Calculate original price (before discount)
-            item_original_price = product.original_price if product.original_price else product.price
-            
-            # Calculate discounted price
-            discount_percent = 0
-            if product.original_price and product.original_price > product.price:
-                discount_percent = int(((product.original_price - product.price) / product.original_price) * 100)
-            
-            discounted_price = product.price
-            
-            # Calculate totals
-            item_total = discounted_price * cart_item.quantity
-            item_original_total = item_original_price * cart_item.quantity
-            item_discount = item_original_total - item_total
-            
-            total_amount += item_total
-            original_amount += item_original_total
-            discount_amount += item_discount
-            
-            # Calculate points for this item - use selected_size if available, else product.size
-            size_to_use = cart_item.selected_size if cart_item.selected_size else product.size
-            if size_to_use:
-                points_per_item = calculate_points_from_size(size_to_use)
-                total_points += points_per_item * cart_item.quantity
+        
+        # Price every line against the active offers in a single pass
+        # use selected_size if available, else product.size
+        pricing = pricing_engine.price_lines(db, [
+            (locked_products[item.product_id], item.quantity, item.selected_size or locked_products[item.product_id].size)
+            for item in cart_items
+        ])
+        
+        for line in pricing["lines"]:
+            # Calculate points for this item
+            if line["size"]:
+                total_points += calculate_points_from_size(line["size"]) * line["quantity"]
             
             order_items_data.append({
-                "product_id": product.id,
-                "product_name": product.name,
-                "quantity": cart_item.quantity,
-                "price_at_purchase": 0.0,
-                "original_price": 0.0,
-                "discount_percent": 0,
-                "size_ordered": size_to_use
+                "product_id": line["product_id"],
+                "product_name": line["product_name"],
+                "quantity": line["quantity"],
+                "price_at_purchase": line["unit_price"],
+                "original_price": line["unit_original_price"],
+                "discount_percent": line["discount_percent"],
+                "size_ordered": line["size"]
             })
         
         # Create order
         from datetime import datetime
         now = datetime.now()
-        order_number = f"ORD{now.strftime('%Y%m%d%H%M%S%f')}{current_user.id}"
+        order_number = f"ORD{now.strftime('%Y%m%d%H%M%S%f')}{user_id}"
         
         db_order = Order(
-            user_id=current_user.id,
+            user_id=user_id,
             order_number=order_number,
-            total_amount=0.0,
-            original_amount=0.0,
-            discount_amount=0.0,
+            total_amount=pricing["total_amount"],
+            original_amount=pricing["original_amount"],
+            discount_amount=pricing["discount_amount"],
             status="pending",
             delivery_address=order_data.delivery_address,
             delivery_city=order_data.delivery_city,
@@ -1727,27 +2385,31 @@ def create_order(
             )
             db.add(order_item)
             
-            # Update product stock and sales count safely using locked instance
+            # Stock is taken here, in the order's transaction, so it can't be oversold;
+            # sales counters follow in the background job
             product = locked_products.get(item_data["product_id"])
             if product:
                 product.stock -= item_data["quantity"]
-                product.sales_count += item_data["quantity"]
         
-        # Award points to user
-        if total_points > 0:
-            current_user.points = (current_user.points or 0) + total_points
+        enqueue_event(db, ORDER_CREATED, user_id, {
+            "order_id": db_order.id,
+            "order_number": db_order.order_number,
+            "status": db_order.status,
+            "total_amount": db_order.total_amount
+        })
+        
+        # Sales counters and the points award run after commit (app/jobs.py)
+        enqueue_job(db, JOB_ORDER_CREATED, {"order_id": db_order.id})
         
         # Clear cart
-        db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
+        db.query(CartItem).filter(CartItem.user_id == user_id).delete()
+        bump_cart_version(conn, user_id)
         
+        order_id = db_order.id
         db.commit()
-        db.refresh(db_order)
-        
-        return db_order
-
-    except Exception as e:
-        db.rollback()
-        raise e
+        return order_id
+    finally:
+        db.close()
 
 @app.post(
     "/api/orders/direct",
@@ -1757,131 +2419,303 @@ def create_order(
     description="Create a new order with items directly (without cart)",
     status_code=status.HTTP_201_CREATED
 )
-def create_order_direct(
+async def create_order_direct(
     order_data: OrderCreateDirect,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create order directly with provided items (for hardcoded products or direct checkout)"""
-    from datetime import datetime
-    
     if not order_data.items or len(order_data.items) == 0:
         raise HTTPException(status_code=400, detail="No items provided")
     
-    # Calculate points based on sizes ordered
-    def calculate_points_from_size(size_str):
-        """Calculate points: 1L=1pt, 4L=4pts, 10L=10pts, 20L=20pts"""
-        if not size_str:
-            return 0
-        # Extract number from size string (e.g., '4L' -> 4)
-        try:
-            liters = int(size_str.replace('L', '').strip())
-            return liters
-        except:
-            return 0
-    
-    # Calculate total points for this order
-    total_points = 0
-    for item in order_data.items:
-        if item.size_ordered:
-            points_per_item = calculate_points_from_size(item.size_ordered)
-            total_points += points_per_item * item.quantity
-    
-    # Generate order number
-    now = datetime.now()
-    order_number = f"ORD{now.strftime('%Y%m%d%H%M%S%f')}{current_user.id}"
-    
-    # Create order
-    db_order = Order(
-        user_id=current_user.id,
-        order_number=order_number,
-        total_amount=0.0,
-        original_amount=0.0,
-        discount_amount=0.0,
-        status="pending",
-        delivery_address=order_data.delivery_address,
-        delivery_city=order_data.delivery_city,
-        delivery_state=order_data.delivery_state,
-        delivery_pincode=order_data.delivery_pincode,
-        delivery_phone=order_data.delivery_phone,
-        order_date=now.strftime('%d-%m-%Y'),
-        order_time=now.strftime('%I:%M %p'),
-        order_day=now.strftime('%A'),
-        points_earned=total_points
-    )
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    
-    # Create order items
-    for item in order_data.items:
-        order_item = OrderItem(
-            order_id=db_order.id,
-            product_id=item.product_id if item.product_id else None,
-            product_name=item.product_name,
-            quantity=item.quantity,
-            price_at_purchase=0.0,
-            original_price=0.0,
-            discount_percent=0,
-            size_ordered=item.size_ordered
+    user_id = current_user.id
+    order_id = await write_queue.run(lambda conn: place_direct_order(conn, user_id, order_data))
+    return await load_order(db, order_id)
+
+def place_direct_order(conn, user_id: int, order_data: OrderCreateDirect) -> int:
+    """Write job: create an order from explicit items; returns the order id"""
+    db = Session(bind=conn)
+    try:
+        from datetime import datetime
+        
+        # Calculate total points for this order
+        total_points = 0
+        for item in order_data.items:
+            if item.size_ordered:
+                points_per_item = calculate_points_from_size(item.size_ordered)
+                total_points += points_per_item * item.quantity
+        
+        # Price catalogue items against active offers (one lookup for all items);
+        # hardcoded products without a catalogue row keep the client-supplied price
+        product_ids = {item.product_id for item in order_data.items if item.product_id}
+        products = {
+            product.id: product
+            for product in db.query(Product).filter(Product.id.in_(product_ids)).all()
+        } if product_ids else {}
+        
+        pricing_engine.ensure_fresh(db)
+        now = datetime.now()
+        
+        item_prices = []
+        for item in order_data.items:
+            product = products.get(item.product_id)
+            if product:
+                line = pricing_engine.price_line(product, item.quantity, item.size_ordered, now)
+                item_prices.append((line["unit_price"], line["unit_original_price"], line["discount_percent"]))
+            else:
+                item_prices.append((item.price, item.price, 0))
+        
+        total_amount = round(sum(price * item.quantity for (price, _, _), item in zip(item_prices, order_data.items)), 2)
+        original_amount = round(sum(original * item.quantity for (_, original, _), item in zip(item_prices, order_data.items)), 2)
+        
+        # Generate order number
+        order_number = f"ORD{now.strftime('%Y%m%d%H%M%S%f')}{user_id}"
+        
+        # Create order
+        db_order = Order(
+            user_id=user_id,
+            order_number=order_number,
+            total_amount=total_amount,
+            original_amount=original_amount,
+            discount_amount=round(original_amount - total_amount, 2),
+            status="pending",
+            delivery_address=order_data.delivery_address,
+            delivery_city=order_data.delivery_city,
+            delivery_state=order_data.delivery_state,
+            delivery_pincode=order_data.delivery_pincode,
+            delivery_phone=order_data.delivery_phone,
+            order_date=now.strftime('%d-%m-%Y'),
+            order_time=now.strftime('%I:%M %p'),
+            order_day=now.strftime('%A'),
+            points_earned=total_points
         )
-        db.add(order_item)
-    
-    # Award points to user
-    if total_points > 0:
-        current_user.points = (current_user.points or 0) + total_points
-    
-    db.commit()
-    db.refresh(db_order)
-    
-    return db_order
+        db.add(db_order)
+        db.flush()
+        
+        # Create order items
+        for item, (price, original_price, discount_percent) in zip(order_data.items, item_prices):
+            order_item = OrderItem(
+                order_id=db_order.id,
+                product_id=item.product_id if item.product_id else None,
+                product_name=item.product_name,
+                quantity=item.quantity,
+                price_at_purchase=price,
+                original_price=original_price,
+                discount_percent=discount_percent,
+                size_ordered=item.size_ordered
+            )
+            db.add(order_item)
+        
+        enqueue_event(db, ORDER_CREATED, user_id, {
+            "order_id": db_order.id,
+            "order_number": db_order.order_number,
+            "status": db_order.status,
+            "total_amount": db_order.total_amount
+        })
+        
+        # Sales counters and the points award run after commit (app/jobs.py)
+        enqueue_job(db, JOB_ORDER_CREATED, {"order_id": db_order.id})
+        
+        order_id = db_order.id
+        db.commit()
+        return order_id
+    finally:
+        db.close()
 
 @app.get("/api/orders", response_model=List[OrderResponse])
-def get_orders(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_orders(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get user's order history"""
-    orders = db.query(Order).filter(Order.user_id == current_user.id).order_by(Order.created_at.desc()).all()
+    orders = (await db.execute(
+        select(Order)
+        .options(order_items_eager())
+        .where(Order.user_id == current_user.id)
+        .order_by(Order.created_at.desc())
+    )).scalars().all()
     return orders
 
 @app.get("/api/orders/{order_id}", response_model=OrderResponse)
-def get_order(
+async def get_order(
     order_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """Get specific order details"""
-    order = db.query(Order).filter(
-        Order.id == order_id,
-        Order.user_id == current_user.id
-    ).first()
+    order = (await db.execute(
+        select(Order)
+        .options(order_items_eager())
+        .where(
+            Order.id == order_id,
+            Order.user_id == current_user.id
+        )
+    )).scalar_one_or_none()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     return order
 
+@app.post("/api/orders/{order_id}/reorder", response_model=List[CartItemResponse], tags=["Orders"])
+async def reorder(
+    order_id: int,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Buy again: add every line of a past order to the cart (merged with what is
+    already there) and return the whole cart. Uses the same single stock
+    check as /api/cart/batch; if any product is gone or short, nothing is
+    added and the 400 response lists them.
+    """
+    user_id = current_user.id
+    lines = (await db.execute(
+        select(OrderItem.product_id, OrderItem.quantity, OrderItem.size_ordered)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.id == order_id, Order.user_id == user_id)
+        .order_by(OrderItem.id)
+    )).all()
+    if not lines:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    operations = [
+        CartBatchOperation(op="add", product_id=line.product_id, quantity=line.quantity, selected_size=line.size_ordered)
+        for line in lines if line.product_id is not None
+    ]
+    if not operations:
+        raise HTTPException(status_code=400, detail="None of this order's products can be reordered")
+    
+    await write_queue.run(lambda conn: apply_cart_operations(conn, user_id, operations))
+    return await load_cart(db, user_id)
+
+# Admin order list sort keys: (column, descending); ties break on id in the same direction
+ADMIN_ORDER_SORTS = {
+    "newest": (Order.id, True),
+    "oldest": (Order.id, False),
+    "amount_high": (Order.total_amount, True),
+    "amount_low": (Order.total_amount, False),
+}
+ADMIN_ORDER_COUNT_CAP = 10000
+
+def encode_cursor(value, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/admin/orders")
 def get_all_orders_admin(
+    request: Request,
     status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    pincode: Optional[str] = None,
+    city: Optional[str] = None,
+    user_id: Optional[int] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    sort: str = "newest",
+    cursor: Optional[str] = None,
+    limit: int = 50,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Admin: Get all orders with product images"""
+    """
+    Admin: Filtered, keyset-paginated order list.
+    
+    Each order carries `item_count` and a `first_item` preview instead of all
+    items; fetch GET /api/admin/orders/{order_id} for the full item list.
+    Pass `next_cursor` back as `cursor` for the next page. `total` is counted
+    on the first page only and stops at 10,000 (`total_capped`). A bare
+    `date_to` date includes orders placed during that day.
+    """
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
+    if sort not in ADMIN_ORDER_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Must be one of: {list(ADMIN_ORDER_SORTS)}")
+    limit = max(1, min(limit, 200))
     
-    query = db.query(Order).options(joinedload(Order.order_items).joinedload(OrderItem.product))
+    filters = []
     if status:
-        query = query.filter(Order.status == status)
-    
-    orders = query.order_by(Order.created_at.desc()).all()
+        filters.append(Order.status == status)
+    if date_from:
+        filters.append(Order.created_at >= date_from)
+    if date_to:
+        if len(request.query_params["date_to"].strip()) == len("YYYY-MM-DD"):
+            # A bare date covers that whole day
+            filters.append(Order.created_at < date_to + timedelta(days=1))
+        else:
+            filters.append(Order.created_at <= date_to)
+    if pincode:
+        filters.append(Order.delivery_pincode == pincode)
+    if city:
+        filters.append(func.lower(Order.delivery_city) == city.lower())
+    if user_id:
+        filters.append(Order.user_id == user_id)
+    if min_amount is not None:
+        filters.append(Order.total_amount >= min_amount)
+    if max_amount is not None:
+        filters.append(Order.total_amount <= max_amount)
+    
+    sort_column, descending = ADMIN_ORDER_SORTS[sort]
+    page_filters = list(filters)
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        if sort_column is Order.id:
+            page_filters.append(Order.id < last_id if descending else Order.id > last_id)
+        else:
+            key = tuple_(sort_column, Order.id)
+            page_filters.append(key < tuple_(value, last_id) if descending else key > tuple_(value, last_id))
+    
+    order_by = [sort_column.desc(), Order.id.desc()] if descending else [sort_column.asc(), Order.id.asc()]
+    if sort_column is Order.id:
+        order_by = order_by[:1]
+    
+    # Fetch one extra row to know whether there is a next page
+    orders = db.query(Order).filter(*page_filters).order_by(*order_by).limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+    
+    # Item count and first item of every order on the page, in one statement
+    previews = {}
+    if orders:
+        counts = select(
+            OrderItem.order_id,
+            func.min(OrderItem.id).label("first_item_id"),
+            func.count(OrderItem.id).label("item_count")
+        ).where(OrderItem.order_id.in_([order.id for order in orders])).group_by(OrderItem.order_id).subquery()
+        preview_rows = db.execute(
+            select(
+                counts.c.order_id,
+                counts.c.item_count,
+                OrderItem.product_name,
+                OrderItem.quantity,
+                OrderItem.size_ordered,
+                Product.image_path
+            )
+            .join(OrderItem, OrderItem.id == counts.c.first_item_id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+        ).all()
+        previews = {row.order_id: row for row in preview_rows}
+    
+    # Cheap count: first page only, and bounded
+    total = None
+    total_capped = False
+    if cursor is None:
+        capped = db.query(Order.id).filter(*filters).limit(ADMIN_ORDER_COUNT_CAP + 1).subquery()
+        total = db.query(func.count()).select_from(capped).scalar()
+        total_capped = total > ADMIN_ORDER_COUNT_CAP
+        total = min(total, ADMIN_ORDER_COUNT_CAP)
     
-    # Build response with product images
     result = []
     for order in orders:
-        order_dict = {
+        preview = previews.get(order.id)
+        result.append({
             "id": order.id,
             "user_id": order.user_id,
             "order_number": order.order_number,
@@ -1899,26 +2733,42 @@ def get_all_orders_admin(
             "order_day": order.order_day,
             "points_earned": order.points_earned or 0,
             "created_at": order.created_at,
-            "order_items": []
-        }
-        
-        for item in order.order_items:
-            item_dict = {
-                "id": item.id,
-                "product_id": item.product_id,
-                "product_name": item.product_name,
-                "product_image": item.product.image_path if item.product else None,
-                "quantity": item.quantity,
-                "price_at_purchase": item.price_at_purchase,
-                "original_price": item.original_price,
-                "discount_percent": item.discount_percent,
-                "size_ordered": item.size_ordered
-            }
-            order_dict["order_items"].append(item_dict)
-        
-        result.append(order_dict)
+            "item_count": preview.item_count if preview else 0,
+            "first_item": {
+                "product_name": preview.product_name,
+                "product_image": preview.image_path,
+                "quantity": preview.quantity,
+                "size_ordered": preview.size_ordered
+            } if preview else None
+        })
     
-    return result
+    next_cursor = None
+    if has_more:
+        last = orders[-1]
+        next_cursor = encode_cursor(last.id if sort_column is Order.id else getattr(last, sort_column.key), last.id)
+    
+    return {
+        "orders": result,
+        "next_cursor": next_cursor,
+        "total": total,
+        "total_capped": total_capped
+    }
+
+@app.get("/api/admin/orders/{order_id}", response_model=OrderResponse)
+def get_order_admin(
+    order_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """Admin: One order with all its items and product images"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    order = db.query(Order).options(order_items_eager()).filter(Order.id == order_id).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    return order
 
 @app.get(
     "/api/admin/sales-analytics",
@@ -1928,7 +2778,7 @@ def get_all_orders_admin(
 )
 def get_sales_analytics(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get comprehensive sales analytics for business intelligence.
@@ -2067,28 +2917,45 @@ def get_sales_analytics(
     }
 
 @app.put("/api/admin/orders/{order_id}/status")
-def update_order_status(
+async def update_order_status(
     order_id: int,
     status: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async)
 ):
     """Admin: Update order status"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    valid_statuses = ["pending", "confirmed", "processing", "shipped", "delivered", "cancelled"]
-    if status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
+    if status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {ORDER_STATUSES}")
     
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    order.status = status
-    db.commit()
+    await write_queue.run(lambda conn: set_order_status(conn, order_id, status))
     return {"message": f"Order status updated to {status}"}
 
+def set_order_status(conn, order_id: int, status: str):
+    """Write job: change an order's status and queue its follow-up job and notification"""
+    db = Session(bind=conn)
+    try:
+        order = db.query(Order).filter(Order.id == order_id).first()
+        if not order:
+            raise HTTPException(status_code=404, detail="Order not found")
+        
+        previous_status = order.status
+        order.status = status
+        if status != previous_status:
+            # Points and the purchase index drop a cancelled order (and take back a reinstated one) after commit
+            enqueue_job(db, JOB_ORDER_STATUS_CHANGED, {"order_id": order.id, "previous_status": previous_status})
+            # Delivered to the customer's sockets after commit by the outbox dispatcher
+            enqueue_event(db, ORDER_STATUS_CHANGED, order.user_id, {
+                "order_id": order.id,
+                "order_number": order.order_number,
+                "status": status,
+                "previous_status": previous_status
+            })
+        db.commit()
+    finally:
+        db.close()
+
 # ============================================================================
 # ADMIN CUSTOMERS MANAGEMENT
 # ============================================================================
@@ -2096,7 +2963,7 @@ def update_order_status(
 @app.get("/api/admin/customers", tags=["Admin - Customers"])
 def get_all_customers(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Admin: Get all customers with their statistics"""
     if not current_user.is_admin:
@@ -2146,24 +3013,81 @@ def get_all_customers(
 @app.get("/api/admin/customers/{customer_id}", tags=["Admin - Customers"])
 def get_customer_details(
     customer_id: int,
+    skip: int = 0,
+    limit: int = 50,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Admin: Get detailed customer information with orders"""
+    """
+    Admin: Get detailed customer information with a page of their orders.
+    
+    Three statements regardless of order count: the customer with a summary
+    aggregated over all their orders, one page of orders (newest first), and
+    every item of that page (with product images) via IN.
+    """
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    # Get customer
-    customer = db.query(User).filter(User.id == customer_id).first()
+    limit = max(1, min(limit, 200))
+    
+    # Customer plus summary
+    customer = db.query(
+        User,
+        func.count(Order.id).label("total_orders"),
+        func.coalesce(func.sum(Order.total_amount), 0).label("total_spent"),
+        func.coalesce(func.sum(Order.discount_amount), 0).label("total_saved"),
+        func.coalesce(func.sum(Order.points_earned), 0).label("points_earned"),
+        func.min(Order.created_at).label("first_order_at"),
+        func.max(Order.created_at).label("last_order_at"),
+        *[
+            func.coalesce(func.sum(case((Order.status == order_status, 1), else_=0)), 0).label(order_status)
+            for order_status in ORDER_STATUSES
+        ]
+    ).outerjoin(Order, Order.user_id == User.id).filter(User.id == customer_id).group_by(User.id).first()
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    # Get customer's orders with items
-    orders = db.query(Order).filter(Order.user_id == customer_id).order_by(Order.created_at.desc()).all()
+    user = customer.User
+    total_orders = customer.total_orders or 0
+    summary = {
+        "total_orders": total_orders,
+        "total_spent": float(customer.total_spent),
+        "total_saved": float(customer.total_saved),
+        "average_order_value": round(float(customer.total_spent) / total_orders, 2) if total_orders else 0.0,
+        "points_earned": int(customer.points_earned),
+        "first_order_at": customer.first_order_at.isoformat() if customer.first_order_at else None,
+        "last_order_at": customer.last_order_at.isoformat() if customer.last_order_at else None,
+        "orders_by_status": {order_status: int(getattr(customer, order_status)) for order_status in ORDER_STATUSES}
+    }
+    
+    # One page of orders
+    orders = db.query(Order).filter(Order.user_id == customer_id).order_by(
+        Order.created_at.desc(), Order.id.desc()
+    ).offset(skip).limit(limit).all()
+    
+    # All items for the page in one statement
+    items_by_order = defaultdict(list)
+    if orders:
+        item_rows = db.query(OrderItem, Product.image_path).outerjoin(
+            Product, Product.id == OrderItem.product_id
+        ).filter(
+            OrderItem.order_id.in_([order.id for order in orders])
+        ).order_by(OrderItem.order_id, OrderItem.id).all()
+        for item, image_path in item_rows:
+            items_by_order[item.order_id].append({
+                "id": item.id,
+                "product_id": item.product_id,
+                "product_name": item.product_name,
+                "quantity": item.quantity,
+                "price_at_purchase": item.price_at_purchase,
+                "original_price": item.original_price,
+                "discount_percent": item.discount_percent,
+                "size_ordered": item.size_ordered,
+                "product_image": image_path
+            })
     
     orders_data = []
     for order in orders:
-        order_items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
         orders_data.append({
             "id": order.id,
             "order_number": order.order_number,
@@ -2180,72 +3104,65 @@ def get_customer_details(
             "order_time": order.order_time,
             "order_day": order.order_day,
             "created_at": order.created_at.isoformat() if order.created_at else None,
-            "items": [
-                {
-                    "id": item.id,
-                    "product_id": item.product_id,
-                    "product_name": item.product_name,
-                    "quantity": item.quantity,
-                    "price_at_purchase": item.price_at_purchase,
-                    "original_price": item.original_price,
-                    "discount_percent": item.discount_percent
-                }
-                for item in order_items
-            ]
+            "items": items_by_order[order.id]
         })
     
     return {
-        "id": customer.id,
-        "email": customer.email,
-        "full_name": customer.full_name,
-        "phone": customer.phone,
-        "address": customer.address,
-        "city": customer.city,
-        "state": customer.state,
-        "pincode": customer.pincode,
-        "created_at": customer.created_at.isoformat() if customer.created_at else None,
-        "orders": orders_data
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "phone": user.phone,
+        "address": user.address,
+        "city": user.city,
+        "state": user.state,
+        "pincode": user.pincode,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "summary": summary,
+        "orders": orders_data,
+        "skip": skip,
+        "limit": limit,
+        "has_more": skip + len(orders) < total_orders
     }
 
 @app.get("/api/admin/products/analytics", tags=["Admin - Analytics"])
 def get_product_analytics(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Admin: Get all products with order analytics"""
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
     from sqlalchemy import func, distinct, or_
-    from sqlalchemy.orm import aliased
     
     # Get ALL products with their order stats
     products = db.query(Product).filter(Product.is_active == True).all()
     
-    result = []
-    for product in products:
-        # Count orders for this product - match by product_id OR product_name (for hardcoded products)
-        order_stats = db.query(
+    # Order stats for every product in one grouped query - match by product_id OR product_name (for hardcoded products)
+    order_stats = {
+        row.product_id: row
+        for row in db.query(
+            Product.id.label('product_id'),
             func.count(distinct(Order.user_id)).label('unique_customers'),
             func.count(OrderItem.id).label('total_orders'),
             func.coalesce(func.sum(OrderItem.quantity), 0).label('total_quantity_sold')
-        ).select_from(OrderItem)\
+        ).select_from(Product)\
+         .join(OrderItem, or_(OrderItem.product_id == Product.id, OrderItem.product_name == Product.name))\
          .join(Order, OrderItem.order_id == Order.id)\
-         .filter(
-             or_(
-                 OrderItem.product_id == product.id,
-                 OrderItem.product_name == product.name
-             )
-         )\
-         .first()
-        
+         .filter(Product.is_active == True)\
+         .group_by(Product.id)
+    }
+    
+    result = []
+    for product in products:
+        stats = order_stats.get(product.id)
         result.append({
             "id": product.id,
             "name": product.name,
             "image_url": product.image_path,
-            "unique_customers": order_stats.unique_customers if order_stats else 0,
-            "total_orders": order_stats.total_orders if order_stats else 0,
-            "total_quantity_sold": order_stats.total_quantity_sold if order_stats else 0,
+            "unique_customers": stats.unique_customers if stats else 0,
+            "total_orders": stats.total_orders if stats else 0,
+            "total_quantity_sold": stats.total_quantity_sold if stats else 0,
         })
     
     # Sort by total_orders descending (products with most orders first)
@@ -2257,6 +3174,12 @@ def get_product_analytics(
 # ADMIN OFFERS MANAGEMENT
 # ============================================================================
 
+def invalidate_offer_caches():
+    """Rebuild the pricing rules and offer schedule after an offer write, on every worker"""
+    pricing_engine.invalidate()
+    offer_schedule.invalidate()
+    notification_bus.publish_from_thread("offers", {"event": "invalidate"})
+
 @app.post("/api/admin/offers", response_model=AdminOfferResponse, tags=["Admin - Offers"])
 def create_admin_offer(
     offer_data: AdminOfferCreate,
@@ -2271,6 +3194,7 @@ def create_admin_offer(
     db.add(db_offer)
     db.commit()
     db.refresh(db_offer)
+    invalidate_offer_caches()
     return db_offer
 
 @app.get("/api/admin/offers", response_model=List[AdminOfferResponse], tags=["Admin - Offers"])
@@ -2287,16 +3211,9 @@ def get_all_admin_offers(
 
 @app.get("/api/offers", response_model=List[AdminOfferResponse], tags=["Offers"])
 def get_active_offers(db: Session = Depends(get_db)):
-    """Get active promotional offers for users"""
-    from datetime import datetime
-    now = datetime.now()
-    
-    offers = db.query(AdminOffer).filter(
-        AdminOffer.is_active == True,
-        AdminOffer.valid_from <= now,
-        AdminOffer.valid_until >= now
-    ).all()
-    return offers
+    """Get active promotional offers for users (served from the in-process offer schedule)"""
+    offer_schedule.ensure_fresh(db)
+    return offer_schedule.active_at()
 
 @app.put("/api/admin/offers/{offer_id}", response_model=AdminOfferResponse, tags=["Admin - Offers"])
 def update_admin_offer(
@@ -2318,6 +3235,7 @@ def update_admin_offer(
     
     db.commit()
     db.refresh(offer)
+    invalidate_offer_caches()
     return offer
 
 @app.delete("/api/admin/offers/{offer_id}", tags=["Admin - Offers"])
@@ -2336,6 +3254,7 @@ def delete_admin_offer(
     
     db.delete(offer)
     db.commit()
+    invalidate_offer_caches()
     return {"message": "Offer deleted successfully"}
 
 @app.patch("/api/admin/offers/{offer_id}/toggle", tags=["Admin - Offers"])
@@ -2354,56 +3273,68 @@ def toggle_offer_status(
     
     offer.is_active = not offer.is_active
     db.commit()
+    invalidate_offer_caches()
     return {"message": f"Offer {'activated' if offer.is_active else 'deactivated'}", "is_active": offer.is_active}
 
 # ============================================================================
 # WebSocket Notification System
 # ============================================================================
 
-class ConnectionManager:
-    """Manages WebSocket connections for real-time notifications"""
-    
-    def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = defaultdict(list)
-    
-    async def connect(self, websocket: WebSocket, user_id: int):
-        """Connect a new WebSocket client"""
-        await websocket.accept()
-        self.active_connections[user_id].append(websocket)
-        print(f"✅ User {user_id} connected. Active connections: {len(self.active_connections[user_id])}")
-    
-    def disconnect(self, websocket: WebSocket, user_id: int):
-        """Disconnect a WebSocket client"""
-        if user_id in self.active_connections:
-            self.active_connections[user_id].remove(websocket)
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
-            print(f"❌ User {user_id} disconnected. Remaining connections: {len(self.active_connections.get(user_id, []))}")
-    
-    async def send_personal_message(self, message: dict, user_id: int):
-        """Send a message to a specific user"""
-        if user_id in self.active_connections:
-            disconnected = []
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception as e:
-                    print(f"Error sending message to user {user_id}: {e}")
-                    disconnected.append(connection)
-            
-            # Remove disconnected connections
-            for conn in disconnected:
-                self.disconnect(conn, user_id)
-    
-    async def broadcast(self, message: dict, exclude_user: Optional[int] = None):
-        """Broadcast a message to all connected users"""
-        for user_id, connections in list(self.active_connections.items()):
-            if exclude_user and user_id == exclude_user:
-                continue
-            await self.send_personal_message(message, user_id)
+# Initialize connection manager (holds this worker's sockets only)
+manager = ConnectionManager.from_env()
 
-# Initialize connection manager
-manager = ConnectionManager()
+# Cross-worker fan-out: notifications are published on the bus and every
+# worker delivers them to the sockets it holds
+notification_bus = create_bus()
+
+async def deliver_notification(data: dict):
+    """Bus subscriber: deliver a published notification (or batch) to local sockets"""
+    if "batch" in data:
+        for item in data["batch"]:
+            await manager.send_personal_message(item["message"], item["user_id"])
+    elif data.get("user_id") is None:
+        await manager.broadcast(data["message"], exclude_user=data.get("exclude_user"))
+    else:
+        await manager.send_personal_message(data["message"], data["user_id"])
+
+async def apply_offer_invalidation(data: dict):
+    """Bus subscriber: another worker changed offers, drop local offer caches"""
+    pricing_engine.invalidate()
+    offer_schedule.invalidate()
+
+async def apply_catalog_invalidation(data: dict):
+    """Bus subscriber: products changed on another worker, rebuild local catalogue caches"""
+    if data.get("origin") != WORKER_ID:
+        catalog_version.bump()
+        product_rankings.mark_stale()
+
+def announce_sales(payload: dict):
+    """Job listener: an order's sales counts were applied, refresh popular lists on every worker"""
+    product_rankings.mark_stale()
+    notification_bus.publish_from_thread("sales", {"order_id": payload["order_id"], "origin": WORKER_ID})
+
+def announce_related_rebuild(payload: dict):
+    """Job listener: product_relations was rebuilt, reload the related-products index on every worker"""
+    related_products.invalidate()
+    notification_bus.publish_from_thread("related", {"origin": WORKER_ID})
+
+async def apply_related_rebuild(data: dict):
+    """Bus subscriber: another worker rebuilt product_relations"""
+    if data.get("origin") != WORKER_ID:
+        related_products.invalidate()
+
+async def apply_sales_update(data: dict):
+    """Bus subscriber: sales counts moved on another worker"""
+    if data.get("origin") != WORKER_ID:
+        product_rankings.mark_stale()
+
+notification_bus.subscribe("notifications", deliver_notification)
+notification_bus.subscribe("offers", apply_offer_invalidation)
+notification_bus.subscribe("catalog", apply_catalog_invalidation)
+notification_bus.subscribe("sales", apply_sales_update)
+notification_bus.subscribe("related", apply_related_rebuild)
+job_queue.on_complete(JOB_ORDER_CREATED, announce_sales)
+job_queue.on_complete(JOB_RELATED_PRODUCTS, announce_related_rebuild)
 
 @app.websocket("/ws/notifications/{user_id}")
 async def websocket_notifications(
@@ -2423,6 +3354,11 @@ async def websocket_notifications(
     **Query Parameters:**
     - `token`: JWT authentication token (required)
     
+    **Heartbeats:**
+    - The server sends `{"type": "heartbeat"}` frames periodically
+    - Clients must send a frame (e.g. `ping`, answered with `pong`) at least
+      every WS_IDLE_TIMEOUT seconds (default 75) or the socket is closed
+    
     **Message Format:**
     ```json
     {
@@ -2451,26 +3387,29 @@ async def websocket_notifications(
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
     
-    # Connect the client
-    await manager.connect(websocket, user_id)
+    # Connect the client (refused with 1013 when this worker is at capacity)
+    if not await manager.connect(websocket, user_id):
+        return
     
-    # Send welcome message
-    await manager.send_personal_message({
+    # Send welcome message to this socket only
+    manager.send_text(websocket, user_id, json.dumps({
         "id": f"welcome_{user_id}_{int(time.time())}",
         "type": "info",
         "title": "Connected",
         "message": "You are now connected to real-time notifications",
         "timestamp": datetime.now().isoformat()
-    }, user_id)
+    }))
     
     try:
         while True:
             # Keep connection alive and receive messages from client
             data = await websocket.receive_text()
+            # Any client frame counts as liveness for the idle reaper
+            manager.touch(websocket, user_id)
             
             # Handle ping/pong for connection health
             if data == "ping":
-                await websocket.send_text("pong")
+                manager.send_text(websocket, user_id, "pong")
             
     except WebSocketDisconnect:
         manager.disconnect(websocket, user_id)
@@ -2478,6 +3417,155 @@ async def websocket_notifications(
         print(f"WebSocket error for user {user_id}: {e}")
         manager.disconnect(websocket, user_id)
 
+@app.get("/api/admin/ws/stats", tags=["Admin - Analytics"])
+async def get_websocket_stats(admin_user: User = Depends(get_admin_user)):
+    """Admin: Live WebSocket gauges for the worker that serves this request"""
+    return manager.stats()
+
+@app.get("/api/admin/db/pool", tags=["Admin - Analytics"])
+async def get_db_pool_stats(admin_user: User = Depends(get_admin_user)):
+    """Admin: Connection pool gauges (checkout wait, overflow, invalidations) for this worker"""
+    return {**get_pool_stats(), "writer": write_queue.stats(), "replicas": replica_router.stats()}
+
+# Per-worker families refreshed from the components' stats() before each snapshot
+POOL_CONNECTIONS = metrics.add("db_pool_connections", "gauge", "Pooled connections by state", ("pool", "state"))
+POOL_CHECKOUTS = metrics.add("db_pool_checkouts_total", "counter", "Connection checkouts", ("pool",))
+POOL_TIMEOUTS = metrics.add("db_pool_checkout_timeouts_total", "counter", "Checkouts that timed out waiting", ("pool",))
+POOL_WAIT_MAX = metrics.add(
+    "db_pool_checkout_wait_max_seconds", "gauge", "Longest wait for a connection", ("pool",), aggregate="max")
+CACHE_REQUESTS = metrics.add("cache_requests_total", "counter", "In-memory cache lookups by result", ("cache", "result"))
+CACHE_ENTRIES = metrics.add("cache_entries", "gauge", "Entries held by in-memory caches", ("cache",))
+RANKINGS_BUILDS = metrics.add("product_rankings_builds_total", "counter", "Popular/featured list rebuilds")
+RANKINGS_AGE = metrics.add(
+    "product_rankings_age_seconds", "gauge", "Age of the oldest worker's popular/featured lists", aggregate="max")
+WS_CONNECTIONS = metrics.add("websocket_connections", "gauge", "Open notification sockets")
+WS_USERS = metrics.add("websocket_users", "gauge", "Users with an open notification socket")
+WS_QUEUE_DEPTH = metrics.add("websocket_queue_depth", "gauge", "Frames waiting in socket send queues")
+WS_FRAMES = metrics.add("websocket_frames_total", "counter", "Notification frames by result", ("result",))
+WRITE_QUEUE_DEPTH = metrics.add("write_queue_depth", "gauge", "Write jobs waiting for the group-commit writer")
+WRITE_QUEUE_JOBS = metrics.add("write_queue_jobs_total", "counter", "Write jobs committed by the group-commit writer")
+WRITE_QUEUE_BATCHES = metrics.add("write_queue_batches_total", "counter", "Group commits")
+JOB_RESULTS = metrics.add("job_worker_jobs_total", "counter", "Background jobs run by result", ("result",))
+JOB_LAG_P95 = metrics.add(
+    "job_worker_lag_p95_seconds", "gauge", "p95 wait from a job being due to a worker starting it", aggregate="max")
+
+@metrics.collector
+def collect_runtime_metrics():
+    """Copy this worker's pool, cache, writer, socket and job worker stats into the registry"""
+    pools = get_pool_stats()
+    for name in ("sync", "async"):
+        pool = pools[name]
+        for state in ("checked_out", "checked_in", "overflow"):
+            if state in pool:
+                # QueuePool reports overflow below zero while under pool_size
+                POOL_CONNECTIONS.set((name, state), max(pool[state], 0))
+        POOL_CHECKOUTS.set((name,), pool["checkouts"])
+        POOL_TIMEOUTS.set((name,), pool["checkout_timeouts"])
+        POOL_WAIT_MAX.set((name,), pool["checkout_wait_max_ms"] / 1000)
+    
+    for name, cache in (("cart_summary", cart_summary_cache), ("product_rankings", product_rankings)):
+        CACHE_REQUESTS.set((name, "hit"), cache.hits)
+        CACHE_REQUESTS.set((name, "miss"), cache.misses)
+    CACHE_ENTRIES.set(("cart_summary",), cart_summary_cache.stats()["entries"])
+    CACHE_ENTRIES.set(("related_products",), related_products.stats()["products"])
+    rankings = product_rankings.stats()
+    RANKINGS_BUILDS.set((), rankings["builds"])
+    if rankings["age_seconds"] is not None:
+        RANKINGS_AGE.set((), rankings["age_seconds"])
+    
+    sockets = manager.stats()
+    WS_CONNECTIONS.set((), sockets["connections"])
+    WS_USERS.set((), sockets["users"])
+    WS_QUEUE_DEPTH.set((), sockets["queue_depth_total"])
+    WS_FRAMES.set(("sent",), sockets["frames_sent"])
+    WS_FRAMES.set(("dropped",), sockets["frames_dropped"])
+    
+    writer = write_queue.stats()
+    WRITE_QUEUE_DEPTH.set((), writer["queued"])
+    WRITE_QUEUE_JOBS.set((), writer["jobs"])
+    WRITE_QUEUE_BATCHES.set((), writer["batches"])
+    
+    JOB_RESULTS.set(("processed",), job_queue.processed)
+    JOB_RESULTS.set(("retried",), job_queue.retried)
+    JOB_RESULTS.set(("failed",), job_queue.failed)
+    lag_p95 = job_queue.lag_at(0.95)
+    if lag_p95 is not None:
+        JOB_LAG_P95.set((), lag_p95)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics(
+    authorization: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Prometheus scrape target: every worker's metrics summed, plus the shared
+    job queue depth and lag. Set METRICS_TOKEN to require "Bearer <token>".
+    """
+    token = os.getenv("METRICS_TOKEN")
+    if token and authorization != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    # The job table is shared, so it is read once per scrape rather than per worker
+    jobs = job_queue.stats(db)
+    queue_jobs = Metric("job_queue_jobs", "gauge", "Background jobs by status", ("status",))
+    for job_status in ("pending", "done", "failed"):
+        queue_jobs.set((job_status,), jobs[job_status])
+    queue_lag = Metric("job_queue_lag_seconds", "gauge", "How long the oldest due job has waited")
+    queue_lag.set((), jobs["lag_seconds"])
+    
+    return PlainTextResponse(
+        metrics.render(extra={metric.name: metric.snapshot() for metric in (queue_jobs, queue_lag)}),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/api/admin/jobs", tags=["Admin - Analytics"])
+def get_job_queue_stats(
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin: Background job queue depth and lag, plus the most recent failed jobs"""
+    failed = db.query(BackgroundJob).filter(BackgroundJob.status == "failed").order_by(BackgroundJob.id.desc()).limit(20).all()
+    return {
+        **job_queue.stats(db),
+        "recent_failures": [
+            {
+                "id": job.id,
+                "kind": job.kind,
+                "payload": json.loads(job.payload),
+                "attempts": job.attempts,
+                "last_error": job.last_error,
+                "failed_at": datetime.fromtimestamp(job.finished_ts).isoformat() if job.finished_ts else None
+            }
+            for job in failed
+        ]
+    }
+
+@app.post("/api/admin/jobs/{job_id}/retry", tags=["Admin - Analytics"])
+def retry_background_job(
+    job_id: int,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin: Requeue a failed background job"""
+    if not job_queue.retry(db, job_id):
+        raise HTTPException(status_code=404, detail="Failed job not found")
+    db.commit()
+    return {"message": f"Job {job_id} requeued"}
+
+@app.post("/api/admin/recommendations/rebuild", tags=["Admin - Analytics"])
+def rebuild_related_products(
+    top_k: int = 10,
+    min_count: int = 1,
+    admin_user: User = Depends(get_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Admin: Queue a rebuild of "frequently bought together" from order history"""
+    if top_k < 1 or min_count < 1:
+        raise HTTPException(status_code=400, detail="top_k and min_count must be at least 1")
+    enqueue_job(db, JOB_RELATED_PRODUCTS, {"top_k": top_k, "min_count": min_count}, max_attempts=2)
+    db.commit()
+    return {"message": "Related products rebuild queued"}
+
 # Helper function to send notifications
 async def send_notification(user_id: int, notification: dict):
     """Helper function to send notification to a specific user"""
@@ -2489,7 +3577,41 @@ async def send_notification(user_id: int, notification: dict):
         "timestamp": notification.get("timestamp", datetime.now().isoformat()),
         "data": notification.get("data", {})
     }
-    await manager.send_personal_message(notification_data, user_id)
+    await notification_bus.publish("notifications", {"user_id": user_id, "message": notification_data})
+
+async def publish_outbox_batch(batch: List[dict]):
+    """Outbox dispatcher callback: one bus message per batch of order/points events"""
+    await notification_bus.publish("notifications", {
+        "batch": [{"user_id": item["user_id"], "message": item["message"]} for item in batch]
+    })
+
+async def broadcast_notification(message: dict, exclude_user: Optional[int] = None):
+    """Helper function to send a notification to every connected user on all workers"""
+    await notification_bus.publish("notifications", {"user_id": None, "exclude_user": exclude_user, "message": message})
+
+async def push_offer_transitions(started: List[dict], ended: List[dict]):
+    """
+    Broadcast offer start/end events from the offer schedule to all connected clients.
+    
+    Every worker runs its own schedule, so this delivers to local sockets only
+    instead of going through the bus (which would repeat it once per worker).
+    """
+    for event, offers in (("offer_started", started), ("offer_ended", ended)):
+        for offer in offers:
+            await manager.broadcast({
+                "id": f"{event}_{offer['id']}_{int(time.time())}",
+                "type": "discount",
+                "title": offer["title"] if event == "offer_started" else f"Offer ended: {offer['title']}",
+                "message": offer.get("description") or f"{offer['discount_percent']}% off",
+                "timestamp": datetime.now().isoformat(),
+                "data": {
+                    "event": event,
+                    "offer_id": offer["id"],
+                    "discount_percent": offer["discount_percent"],
+                    "valid_from": offer["valid_from"].isoformat(),
+                    "valid_until": offer["valid_until"].isoformat()
+                }
+            })
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,321 @@
+"""
+Prometheus metrics.
+
+Each worker records into an in-process registry of counters, gauges and
+histograms:
+- MetricsMiddleware (plain ASGI) times each request by route template and
+  counts requests in flight.
+- SQLAlchemy cursor events count queries and their time, both per engine
+  and for the request that ran them. The request's tally sits in a
+  context variable, so queries issued from the threadpool are attributed
+  too.
+- Collectors copy the existing stats() of pools, caches, the writer, and
+  WebSockets into gauges just before a snapshot.
+
+uvicorn workers don't share memory. Every worker writes a JSON snapshot of
+its registry to METRICS_DIR every flush_interval seconds. GET /metrics,
+answered by whichever worker gets the scrape, sums its own live registry
+with every other worker's recent snapshot and renders the Prometheus text
+format. Snapshots older than stale_after (e.g. from a worker that died)
+are ignored.
+"""
+import asyncio
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional, List, Dict, Tuple, Callable, Iterable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+
+# Seconds; tuned for API latencies from sub-millisecond cache hits to slow reports
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# [queries, seconds] for the request being handled, shared by the threads serving it
+_request_db: ContextVar[Optional[List]] = ContextVar("request_db", default=None)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """One metric family; values are keyed by label values in `labels` order"""
+
+    def __init__(
+        self, name: str, kind: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple = (), aggregate: str = "sum"
+    ):
+        self.name = name
+        self.kind = kind  # counter, gauge or histogram
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.aggregate = aggregate  # across workers: sum, or max for gauges like ages and lags
+        self._lock = threading.Lock()
+        # counter/gauge: value; histogram: [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[LabelValues, object] = {}
+
+    def inc(self, labels: LabelValues = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set(self, labels: LabelValues = (), value: float = 0.0):
+        with self._lock:
+            self._values[labels] = value
+
+    def observe(self, labels: LabelValues, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._values.get(labels)
+            if histogram is None:
+                histogram = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            values = [
+                [list(labels), [list(value[0]), value[1], value[2]] if self.kind == "histogram" else value]
+                for labels, value in self._values.items()
+            ]
+        return {"kind": self.kind, "help": self.help, "labels": list(self.labels),
+                "buckets": list(self.buckets), "aggregate": self.aggregate, "values": values}
+
+
+def merge_snapshots(snapshots: Iterable[Dict]) -> Dict[str, Dict]:
+    """Combine metric families across worker snapshots (summed unless the family says max)"""
+    merged: Dict[str, Dict] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, {**family, "values": {}})
+            values = target["values"]
+            for labels, value in family["values"]:
+                key = tuple(labels)
+                if family["kind"] == "histogram":
+                    current = values.get(key)
+                    if current is None or len(current[0]) != len(value[0]):
+                        values[key] = [list(value[0]), value[1], value[2]]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], value[0])]
+                        current[1] += value[1]
+                        current[2] += value[2]
+                elif family.get("aggregate") == "max":
+                    values[key] = max(values.get(key, value), value)
+                else:
+                    values[key] = values.get(key, 0.0) + value
+    return merged
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(families: Dict[str, Dict]) -> str:
+    """Prometheus text exposition format 0.0.4"""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        names = family["labels"]
+        for labels in sorted(family["values"]):
+            value = family["values"][labels]
+            if family["kind"] != "histogram":
+                lines.append(f"{name}{format_labels(names, labels)} {format_value(value)}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket in zip(list(family["buckets"]) + ["+Inf"], counts):
+                cumulative += bucket
+                le = bound if bound == "+Inf" else format_value(bound)
+                lines.append(f"{name}_bucket{format_labels(list(names) + ['le'], list(labels) + [le])} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(names, labels)} {format_value(total)}")
+            lines.append(f"{name}_count{format_labels(names, labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsRegistry:
+    """This worker's metrics, their collectors and the cross-worker snapshot files"""
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 5.0, stale_after: float = 30.0):
+        self.enabled = True
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    @classmethod
+    def from_env(cls) -> "MetricsRegistry":
+        registry = cls(
+            directory=os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "kubti_metrics")),
+            flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+        )
+        registry.enabled = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes", "on")
+        return registry
+
+    def add(
+        self, name: str, kind: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple = (), aggregate: str = "sum"
+    ) -> Metric:
+        metric = self.metrics[name] = Metric(name, kind, help, labels, buckets, aggregate)
+        return metric
+
+    def collector(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Register fn to refresh gauges right before a snapshot"""
+        self.collectors.append(fn)
+        return fn
+
+    def snapshot(self) -> Dict[str, Dict]:
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"⚠️  Metrics collector {collect.__name__} failed: {e}")
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f"worker-{pid}.json")
+
+    def flush(self):
+        """Write this worker's snapshot for the others to merge (atomic rename)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(os.getpid())
+        with open(path + ".tmp", "w") as f:
+            json.dump({"pid": os.getpid(), "ts": time.time(), "metrics": self.snapshot()}, f)
+        os.replace(path + ".tmp", path)
+
+    def peer_snapshots(self) -> List[Dict]:
+        """Recent snapshots of the other workers; removes long-dead workers' files"""
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        snapshots = []
+        now = time.time()
+        own = os.path.basename(self._path(os.getpid()))
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json") or filename == own:
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                age = now - os.path.getmtime(path)
+                if age > self.stale_after * 20:
+                    os.remove(path)
+                    continue
+                if age > self.stale_after:
+                    continue
+                with open(path) as f:
+                    snapshots.append(json.load(f)["metrics"])
+            except (OSError, ValueError, KeyError):
+                continue  # being replaced or removed by its worker
+        return snapshots
+
+    def render(self, extra: Optional[Dict[str, Dict]] = None) -> str:
+        """Metrics of every live worker, plus scrape-time families in snapshot form"""
+        snapshots = [self.snapshot()] + self.peer_snapshots()
+        if extra:
+            snapshots.append(extra)
+        return render(merge_snapshots(snapshots))
+
+    async def run(self):
+        """Background task: publish this worker's snapshot every flush_interval"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await run_in_threadpool(self.flush)
+            except Exception as e:
+                print(f"⚠️  Metrics flush failed: {e}")
+
+
+# Process-wide registry
+metrics = MetricsRegistry.from_env()
+
+HTTP_REQUESTS = metrics.add(
+    "http_requests_total", "counter", "HTTP requests by route template and status", ("method", "route", "status"))
+HTTP_LATENCY = metrics.add(
+    "http_request_duration_seconds", "histogram", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = metrics.add("http_requests_in_flight", "gauge", "HTTP requests being handled")
+REQUEST_QUERIES = metrics.add(
+    "http_request_db_queries", "histogram", "Database queries issued per HTTP request", ("route",), QUERY_COUNT_BUCKETS)
+REQUEST_DB_SECONDS = metrics.add(
+    "http_request_db_seconds", "histogram", "Database time per HTTP request", ("route",), LATENCY_BUCKETS)
+DB_QUERIES = metrics.add("db_queries_total", "counter", "Database queries by engine", ("engine",))
+DB_QUERY_SECONDS = metrics.add("db_query_seconds_total", "counter", "Database query time by engine", ("engine",))
+
+
+def request_db_stats() -> Optional[List]:
+    """[queries, seconds] of the current request so far, or None outside a request"""
+    return _request_db.get()
+
+
+def instrument_engine(engine, name: str):
+    """Count queries and their time on a sync engine (async_engine.sync_engine for async)"""
+    queries = DB_QUERIES
+    seconds = DB_QUERY_SECONDS
+    labels = (name,)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is None or not metrics.enabled:
+            return
+        elapsed = time.perf_counter() - started
+        queries.inc(labels)
+        seconds.inc(labels, elapsed)
+        tally = _request_db.get()
+        if tally is not None:
+            tally[0] += 1
+            tally[1] += elapsed
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no per-request Request/Response objects) timing HTTP requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        tally = [0, 0.0]
+        token = _request_db.set(tally)
+        status_code = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.inc(amount=-1)
+            _request_db.reset(token)
+            # The router leaves the matched route in the scope; templates keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc((method, path, str(status_code[0])))
+            HTTP_LATENCY.observe((method, path), time.perf_counter() - started)
+            REQUEST_QUERIES.observe((path,), tally[0])
+            REQUEST_DB_SECONDS.observe((path,), tally[1])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -33,8 +33,12 @@ class User(Base):
     is_profile_complete = Column(Boolean, default=False)
     
     # Loyalty points system
+    # Cached running balance of the user's points_ledger account (see PointsLedger)
     points = Column(Integer, default=0)
     
+    # Bumped with every change to the user's cart lines; keys the cart summary cache (see app/carts.py)
+    cart_version = Column(Integer, nullable=False, default=0, server_default="0")
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -118,9 +122,20 @@ class AdminOffer(Base):
     valid_until = Column(DateTime(timezone=True), nullable=False)
     is_active = Column(Boolean, default=True)
     
+    # Targeting (all optional; an offer with none of these applies to every product)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
+    size = Column(String, nullable=True)  # e.g., "20L"
+    min_quantity = Column(Integer, default=1)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Cache refreshes load non-expired offers: WHERE is_active AND valid_until >= now
+        Index("ix_admin_offers_active_window", "is_active", "valid_until", "valid_from"),
+    )
+
 
 class Order(Base):
     __tablename__ = "orders"
@@ -155,12 +170,18 @@ class Order(Base):
     user = relationship("User", back_populates="orders")
     order_items = relationship("OrderItem", back_populates="order")
 
+    __table_args__ = (
+        # Keyset pagination for a customer's orders and the admin status filter
+        Index("ix_orders_user_id_id", "user_id", "id"),
+        Index("ix_orders_status_id", "status", "id"),
+    )
+
 
 class OrderItem(Base):
     __tablename__ = "order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)  # Items are always fetched by order
     product_id = Column(Integer, ForeignKey("products.id"), nullable=True)  # Allow null for hardcoded products
     product_name = Column(String, nullable=False)  # Store product name at time of purchase
     quantity = Column(Integer, nullable=False)
@@ -172,3 +193,130 @@ class OrderItem(Base):
     # Relationships
     order = relationship("Order", back_populates="order_items")
     product = relationship("Product", back_populates="order_items")
+
+    @property
+    def product_image(self):
+        """Image of the ordered product, only if `product` was eager-loaded (never triggers a query)"""
+        product = self.__dict__.get("product")
+        return product.image_path if product is not None else None
+
+
+class PointsLedger(Base):
+    """Append-only double-entry journal for loyalty points.
+
+    Every posting writes two rows sharing a txn_id: one on the user's
+    account and a balancing row on the system "issued" account, so the
+    deltas of each transaction sum to zero. User.points caches the
+    running balance of the user account.
+    """
+    __tablename__ = "points_ledger"
+
+    id = Column(Integer, primary_key=True, index=True)
+    txn_id = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    account = Column(String(20), nullable=False)  # "user" or "issued"
+    delta = Column(Integer, nullable=False)
+    balance_after = Column(Integer, nullable=True)  # Only set on "user" rows
+    reason = Column(String(50), nullable=False)  # order_award, order_reversal, opening_balance, adjustment
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Keyset pagination over a user's history: WHERE user_id=? AND account=? AND id<? ORDER BY id DESC
+        Index("ix_points_ledger_user_account_id", "user_id", "account", "id"),
+    )
+
+
+class BusMessage(Base):
+    """Transport table for the database message bus (see app/bus.py); rows are short-lived"""
+    __tablename__ = "bus_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    created_ts = Column(Float, nullable=False, index=True)  # time.time() at publish, for pruning
+
+    # Workers tail by id, so SQLite must never hand out an id again once the table is pruned empty
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class OutboxEvent(Base):
+    """Transactional outbox: domain events written with the change they describe (see app/events.py)"""
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String(50), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    created_ts = Column(Float, nullable=False)
+    claim_token = Column(String(32), nullable=True, index=True)
+    claimed_ts = Column(Float, nullable=True)
+    dispatched_ts = Column(Float, nullable=True)
+
+    __table_args__ = (
+        # Dispatcher scans undelivered events in id order
+        Index("ix_outbox_events_pending", "dispatched_ts", "id"),
+    )
+
+
+class BackgroundJob(Base):
+    """Durable queue of follow-up work run after commit by background workers (see app/jobs.py)"""
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String(20), nullable=False, default="pending")  # pending, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    created_ts = Column(Float, nullable=False)
+    run_after_ts = Column(Float, nullable=False)  # not claimable before this (retry backoff)
+    claim_token = Column(String(32), nullable=True)
+    claimed_ts = Column(Float, nullable=True)
+    finished_ts = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # Workers scan pending jobs in due order
+        Index("ix_background_jobs_due", "status", "run_after_ts"),
+    )
+
+
+class UserPurchase(Base):
+    """Per-user index of purchased products and sizes, maintained from new orders (see app/purchases.py)"""
+    __tablename__ = "user_purchases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    product_id = Column(Integer, nullable=False)  # no FK: history outlives deleted products
+    size = Column(String(50), nullable=False, default="")  # "" when the product has no size
+    order_count = Column(Integer, nullable=False, default=0)  # orders that included it
+    total_quantity = Column(Integer, nullable=False, default=0)
+    last_quantity = Column(Integer, nullable=False, default=0)
+    last_order_id = Column(Integer, nullable=True)
+    last_ordered_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ux_user_purchases_key", "user_id", "product_id", "size", unique=True),
+        # "Buy again" lists read a user's most frequent items
+        Index("ix_user_purchases_frequency", "user_id", "order_count"),
+    )
+
+
+class ProductRelation(Base):
+    """Top "frequently bought together" partners per product, rebuilt wholesale (see app/recommendations.py)"""
+    __tablename__ = "product_relations"
+
+    # No foreign keys: rows are replaced on every rebuild and must not block product deletes
+    product_id = Column(Integer, primary_key=True)
+    related_product_id = Column(Integer, primary_key=True)
+    rank = Column(Integer, nullable=False)  # 1 = most often bought together
+    together_count = Column(Integer, nullable=False)  # orders containing both products
+
+
+class ReplicaHeartbeat(Base):
+    """Single-row clock written on the primary; its value on a replica is how fresh that replica is (see app/replicas.py)"""
+    __tablename__ = "replica_heartbeats"
+
+    id = Column(Integer, primary_key=True)
+    ts = Column(Float, nullable=False)  # time.time() of the last heartbeat write
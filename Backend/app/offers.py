@@ -0,0 +1,163 @@
+"""
+Time-indexed cache of promotional offers.
+
+All active offers are loaded once and their validity windows are cut into
+segments between consecutive start/end boundaries. Each segment stores the
+offers active throughout it, so "active at t" is a bisect over the sorted
+boundaries. A background task sleeps until the next boundary and reports
+offers that started or ended to a callback (used for WebSocket pushes).
+"""
+import asyncio
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Tuple, Callable, Awaitable, Iterable
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import AdminOffer
+from .pricing import naive_local
+
+# valid_until is inclusive, so an offer stops being active one tick after it
+END_TICK = timedelta(microseconds=1)
+
+TransitionCallback = Callable[[List[Dict], List[Dict]], Awaitable[None]]
+
+
+def offer_snapshot(offer: AdminOffer) -> Dict:
+    """Detached copy of an offer row, safe to share across requests"""
+    return {column.name: getattr(offer, column.name) for column in AdminOffer.__table__.columns}
+
+
+class OfferSchedule:
+    """Interval index over offer validity windows"""
+
+    def __init__(self, refresh_interval: float = 300.0):
+        self.refresh_interval = refresh_interval
+        # (offers by id, boundaries, segments) swapped as one reference so readers never see a mix;
+        # segments[i] holds offers active in [boundaries[i-1], boundaries[i])
+        self._index: Tuple[Dict[int, Dict], List[datetime], List[Tuple[int, ...]]] = ({}, [], [()])
+        self._loaded_at: Optional[float] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def load(self, offers: Iterable[AdminOffer]):
+        """Rebuild the index from offer rows"""
+        snapshots: Dict[int, Dict] = {}
+        events: List[Tuple[datetime, int, int]] = []
+        for offer in offers:
+            start = naive_local(offer.valid_from)
+            end = naive_local(offer.valid_until) + END_TICK
+            if end <= start:
+                continue
+            snapshots[offer.id] = offer_snapshot(offer)
+            events.append((start, 1, offer.id))
+            events.append((end, -1, offer.id))
+        events.sort()
+
+        boundaries: List[datetime] = []
+        segments: List[Tuple[int, ...]] = [()]
+        active: Dict[int, None] = {}
+        for i, (at, kind, offer_id) in enumerate(events):
+            if kind > 0:
+                active[offer_id] = None
+            else:
+                active.pop(offer_id, None)
+            # Close the segment once all events at this instant are applied
+            if i + 1 == len(events) or events[i + 1][0] != at:
+                boundaries.append(at)
+                segments.append(tuple(active))
+
+        self._index = (snapshots, boundaries, segments)
+        self._loaded_at = time.monotonic()
+
+    def refresh(self, db: Session):
+        """Reload active, not yet expired offers from the database"""
+        offers = db.query(AdminOffer).filter(
+            AdminOffer.is_active == True,
+            AdminOffer.valid_until >= datetime.now()
+        ).all()
+        self.load(offers)
+
+    def ensure_fresh(self, db: Session):
+        """Reload if never loaded, invalidated, or older than the refresh interval"""
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self.refresh_interval:
+            self.refresh(db)
+
+    def invalidate(self):
+        """Drop the index after an offer write and wake the scheduler"""
+        self._loaded_at = None
+        if self._changed is not None and self._loop is not None:
+            # Admin endpoints run in the threadpool, so hand the wake-up to the loop
+            self._loop.call_soon_threadsafe(self._changed.set)
+
+    def active_ids(self, now: Optional[datetime] = None) -> Tuple[int, ...]:
+        _, boundaries, segments = self._index
+        return segments[bisect_right(boundaries, now or datetime.now())]
+
+    def active_at(self, now: Optional[datetime] = None) -> List[Dict]:
+        """Offers active at the given instant, O(log n) + output size"""
+        offers, boundaries, segments = self._index
+        return [offers[offer_id] for offer_id in segments[bisect_right(boundaries, now or datetime.now())]]
+
+    def next_boundary(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """The next instant at which the active set changes"""
+        _, boundaries, _ = self._index
+        index = bisect_right(boundaries, now or datetime.now())
+        return boundaries[index] if index < len(boundaries) else None
+
+    async def run(self, on_transition: TransitionCallback):
+        """Wake at each boundary (or on invalidate) and report started/ended offers"""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        previous: Optional[Dict[int, Dict]] = None
+
+        while True:
+            # Clear before reading so an invalidate() during this pass wakes the next wait
+            self._changed.clear()
+            try:
+                if not self.is_loaded or time.monotonic() - self._loaded_at >= self.refresh_interval:
+                    await run_in_threadpool(self._refresh_with_session)
+
+                now = datetime.now()
+                current = {offer["id"]: offer for offer in self.active_at(now)}
+                # The first pass only records the baseline; offers already running aren't news
+                if previous is not None:
+                    started = [offer for offer_id, offer in current.items() if offer_id not in previous]
+                    ended = [offer for offer_id, offer in previous.items() if offer_id not in current]
+                    if started or ended:
+                        await on_transition(started, ended)
+                previous = current
+
+                timeout = self.refresh_interval
+                boundary = self.next_boundary(now)
+                if boundary is not None:
+                    timeout = min(timeout, max((boundary - datetime.now()).total_seconds(), 0.0))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Offer schedule error: {e}")
+                timeout = self.refresh_interval
+
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _refresh_with_session(self):
+        db = SessionLocal()
+        try:
+            self.refresh(db)
+        finally:
+            db.close()
+
+
+# Process-wide schedule shared by all requests
+offer_schedule = OfferSchedule()
@@ -0,0 +1,197 @@
+"""
+Loyalty points ledger.
+
+All balance changes go through post_points(), which appends a balanced pair
+of PointsLedger rows and updates the cached User.points balance in the
+caller's transaction. Reading a balance is therefore a single column read,
+no matter how long the ledger grows.
+"""
+import uuid
+from typing import Optional, List, Dict
+
+from sqlalchemy import func, update, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from .models import User, Order, PointsLedger
+from .events import enqueue_event, POINTS_CHANGED
+
+USER_ACCOUNT = "user"
+ISSUED_ACCOUNT = "issued"
+
+REASON_ORDER_AWARD = "order_award"
+REASON_ORDER_REVERSAL = "order_reversal"
+REASON_OPENING_BALANCE = "opening_balance"
+REASON_ADJUSTMENT = "adjustment"
+
+
+def calculate_points_from_size(size_str: Optional[str]) -> int:
+    """Calculate points: 1L=1pt, 4L=4pts, 10L=10pts, 20L=20pts"""
+    if not size_str:
+        return 0
+    try:
+        return int(size_str.replace('L', '').strip())
+    except ValueError:
+        return 0
+
+
+def post_points(
+    db: Session,
+    user_id: int,
+    delta: int,
+    reason: str,
+    order_id: Optional[int] = None
+) -> int:
+    """
+    Append a points transaction and update the cached balance.
+
+    Does not commit; the posting becomes visible together with the rest of the
+    caller's unit of work. Returns the new balance.
+    """
+    # Increment in SQL so concurrent postings for the same user don't lose updates
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(points=func.coalesce(User.points, 0) + delta)
+        .execution_options(synchronize_session=False)
+    )
+    balance = db.execute(select(User.points).where(User.id == user_id)).scalar_one()
+
+    txn_id = uuid.uuid4().hex
+    db.add_all([
+        PointsLedger(
+            txn_id=txn_id,
+            user_id=user_id,
+            account=USER_ACCOUNT,
+            delta=delta,
+            balance_after=balance,
+            reason=reason,
+            order_id=order_id
+        ),
+        PointsLedger(
+            txn_id=txn_id,
+            user_id=user_id,
+            account=ISSUED_ACCOUNT,
+            delta=-delta,
+            reason=reason,
+            order_id=order_id
+        ),
+    ])
+
+    enqueue_event(db, POINTS_CHANGED, user_id, {
+        "delta": delta,
+        "balance": balance,
+        "reason": reason,
+        "order_id": order_id
+    })
+
+    # Keep any loaded User instance in sync with the SQL-side increment
+    user = db.identity_map.get(db.identity_key(User, user_id))
+    if user is not None:
+        set_committed_value(user, "points", balance)
+
+    return balance
+
+
+def get_order_points_net(db: Session, order_id: int) -> int:
+    """Net points currently credited to the user for an order"""
+    return db.query(func.coalesce(func.sum(PointsLedger.delta), 0)).filter(
+        PointsLedger.order_id == order_id,
+        PointsLedger.account == USER_ACCOUNT
+    ).scalar() or 0
+
+
+def sync_order_points(db: Session, order: Order) -> int:
+    """
+    Bring the points credited for an order in line with its status.
+
+    Cancelled orders carry zero points, every other status carries
+    order.points_earned. Posting only the difference makes this idempotent,
+    so it is safe to call on every status change. Returns the delta posted.
+    """
+    target = 0 if order.status == "cancelled" else (order.points_earned or 0)
+    delta = target - get_order_points_net(db, order.id)
+    if delta:
+        reason = REASON_ORDER_AWARD if delta > 0 else REASON_ORDER_REVERSAL
+        post_points(db, order.user_id, delta, reason, order_id=order.id)
+    return delta
+
+
+def get_points_history(
+    db: Session,
+    user_id: int,
+    before_id: Optional[int] = None,
+    limit: int = 50
+) -> Dict:
+    """Keyset-paginated user account entries, newest first"""
+    query = db.query(PointsLedger).filter(
+        PointsLedger.user_id == user_id,
+        PointsLedger.account == USER_ACCOUNT
+    )
+    if before_id is not None:
+        query = query.filter(PointsLedger.id < before_id)
+
+    # Fetch one extra row to know whether another page exists
+    entries = query.order_by(PointsLedger.id.desc()).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    return {
+        "entries": entries,
+        "next_before_id": entries[-1].id if has_more else None
+    }
+
+
+def reconcile_balances(db: Session, fix: bool = False, sample_limit: int = 100) -> Dict:
+    """
+    Verify every cached User.points against the ledger in bulk.
+
+    The ledger balance is a correlated sum per user (served by the
+    user/account index). One query counts mismatched users and another
+    returns the first sample_limit of them; a third checks that all
+    transactions are balanced. With fix=True, one UPDATE rewrites every
+    mismatched cache from the ledger (the ledger is the source of truth).
+    Does not commit.
+    """
+    ledger_balance = (
+        select(func.coalesce(func.sum(PointsLedger.delta), 0))
+        .where(PointsLedger.user_id == User.id, PointsLedger.account == USER_ACCOUNT)
+        .scalar_subquery()
+    )
+    cached_balance = func.coalesce(User.points, 0)
+    mismatched = cached_balance != ledger_balance
+
+    mismatch_count = db.execute(select(func.count(User.id)).where(mismatched)).scalar() or 0
+    mismatches: List[Dict] = [
+        {"user_id": row.id, "cached_balance": int(row.cached), "ledger_balance": int(row.ledger)}
+        for row in db.execute(
+            select(User.id, cached_balance.label("cached"), ledger_balance.label("ledger"))
+            .where(mismatched)
+            .order_by(User.id)
+            .limit(sample_limit)
+        )
+    ]
+
+    unbalanced_txns = db.execute(
+        select(PointsLedger.txn_id)
+        .group_by(PointsLedger.txn_id)
+        .having(func.sum(PointsLedger.delta) != 0)
+        .limit(100)
+    ).scalars().all()
+
+    if fix and mismatch_count:
+        db.execute(
+            update(User)
+            .where(mismatched)
+            .values(points=ledger_balance)
+            .execution_options(synchronize_session=False)
+        )
+
+    return {
+        "users_checked": db.query(func.count(User.id)).scalar() or 0,
+        "mismatch_count": mismatch_count,
+        # The first sample_limit mismatches, by user id
+        "mismatches": mismatches,
+        "unbalanced_transactions": list(unbalanced_txns),
+        "fixed": fix and bool(mismatch_count)
+    }
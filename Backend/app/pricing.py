@@ -0,0 +1,201 @@
+"""
+Offer pricing engine.
+
+Active AdminOffer rows are compiled into an in-memory rule index keyed by
+product and category, so pricing a cart costs one dictionary lookup per line
+instead of a query per line. The index is rebuilt lazily after an admin offer
+write (invalidate()) or when it is older than the TTL, which bounds how long
+other workers can serve stale rules.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Iterable, Tuple
+
+from sqlalchemy.orm import Session
+
+from .models import AdminOffer, Product
+
+
+def naive_local(dt: Optional[datetime]) -> Optional[datetime]:
+    """Normalize to naive local time (SQLite returns naive, PostgreSQL aware)"""
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone().replace(tzinfo=None)
+    return dt
+
+
+def apply_discount_percent(product: Product) -> Product:
+    """Set the response-only discount_percent from original_price vs price"""
+    if product.original_price and product.original_price > product.price:
+        product.discount_percent = int(((product.original_price - product.price) / product.original_price) * 100)
+    else:
+        product.discount_percent = 0
+    return product
+
+
+class OfferRule:
+    """A compiled offer: targeting predicates plus the discount to apply"""
+
+    __slots__ = (
+        "offer_id", "title", "discount_percent", "valid_from", "valid_until",
+        "category_id", "product_id", "size", "min_quantity"
+    )
+
+    def __init__(self, offer: AdminOffer):
+        self.offer_id = offer.id
+        self.title = offer.title
+        self.discount_percent = max(0, min(offer.discount_percent or 0, 100))
+        self.valid_from = naive_local(offer.valid_from)
+        self.valid_until = naive_local(offer.valid_until)
+        self.category_id = offer.category_id
+        self.product_id = offer.product_id
+        self.size = offer.size.strip().upper() if offer.size else None
+        self.min_quantity = offer.min_quantity or 1
+
+    def matches(self, quantity: int, size: Optional[str], now: datetime) -> bool:
+        if self.valid_from and now < self.valid_from:
+            return False
+        if self.valid_until and now > self.valid_until:
+            return False
+        if quantity < self.min_quantity:
+            return False
+        if self.size and (not size or size.strip().upper() != self.size):
+            return False
+        return True
+
+
+class PricingEngine:
+    """Prices cart lines against the compiled offer index"""
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (by_product, by_category, global) swapped as one reference so readers never see a mix
+        self._index: Tuple[Dict[int, List[OfferRule]], Dict[int, List[OfferRule]], List[OfferRule]] = ({}, {}, [])
+        self._loaded_at: Optional[float] = None
+        self.version = 0
+
+    def invalidate(self):
+        """Force a rebuild on next use (call after any offer write)"""
+        with self._lock:
+            self._loaded_at = None
+
+    def compile(self, offers: Iterable[AdminOffer]):
+        """Build the rule index from offer rows"""
+        by_product: Dict[int, List[OfferRule]] = {}
+        by_category: Dict[int, List[OfferRule]] = {}
+        global_rules: List[OfferRule] = []
+
+        for offer in offers:
+            rule = OfferRule(offer)
+            if rule.product_id is not None:
+                by_product.setdefault(rule.product_id, []).append(rule)
+            elif rule.category_id is not None:
+                by_category.setdefault(rule.category_id, []).append(rule)
+            else:
+                global_rules.append(rule)
+
+        # Highest discount first so the first match is the best one
+        for rules in list(by_product.values()) + list(by_category.values()) + [global_rules]:
+            rules.sort(key=lambda r: r.discount_percent, reverse=True)
+
+        with self._lock:
+            self._index = (by_product, by_category, global_rules)
+            self._loaded_at = time.monotonic()
+            self.version += 1
+
+    def ensure_fresh(self, db: Session):
+        """Recompile from the database if invalidated or past the TTL"""
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl_seconds:
+            return
+        now = datetime.now()
+        # Expired offers can never match again; future ones are kept and gated by matches()
+        offers = db.query(AdminOffer).filter(
+            AdminOffer.is_active == True,
+            AdminOffer.valid_until >= now
+        ).all()
+        self.compile(offers)
+
+    def best_offer(
+        self,
+        product: Product,
+        quantity: int,
+        size: Optional[str],
+        now: Optional[datetime] = None
+    ) -> Optional[OfferRule]:
+        """Return the highest-discount rule that applies to this line"""
+        now = now or datetime.now()
+        best = None
+        by_product, by_category, global_rules = self._index
+        candidates = (
+            by_product.get(product.id, ()),
+            by_category.get(product.category_id, ()),
+            global_rules
+        )
+        for rules in candidates:
+            for rule in rules:
+                if best is not None and rule.discount_percent <= best.discount_percent:
+                    break
+                if rule.matches(quantity, size, now):
+                    best = rule
+                    break
+        return best
+
+    def price_line(
+        self,
+        product: Product,
+        quantity: int,
+        size: Optional[str] = None,
+        now: Optional[datetime] = None
+    ) -> Dict:
+        """Price a single line; the offer discount stacks on the product's selling price"""
+        size = size or product.size
+        rule = self.best_offer(product, quantity, size, now)
+
+        original_price = product.original_price if product.original_price else product.price
+        unit_price = product.price
+        if rule is not None and rule.discount_percent:
+            unit_price = round(product.price * (100 - rule.discount_percent) / 100, 2)
+
+        discount_percent = 0
+        if original_price and original_price > unit_price:
+            discount_percent = int(((original_price - unit_price) / original_price) * 100)
+
+        return {
+            "product_id": product.id,
+            "product_name": product.name,
+            "quantity": quantity,
+            "size": size,
+            "unit_price": unit_price,
+            "unit_original_price": original_price,
+            "discount_percent": discount_percent,
+            "line_total": round(unit_price * quantity, 2),
+            "line_original_total": round(original_price * quantity, 2),
+            "offer_id": rule.offer_id if rule else None,
+            "offer_title": rule.title if rule else None
+        }
+
+    def price_lines(
+        self,
+        db: Session,
+        lines: Iterable[Tuple[Product, int, Optional[str]]]
+    ) -> Dict:
+        """Price (product, quantity, size) lines in one pass and total them"""
+        self.ensure_fresh(db)
+        now = datetime.now()
+
+        priced = [self.price_line(product, quantity, size, now) for product, quantity, size in lines]
+        total_amount = round(sum(line["line_total"] for line in priced), 2)
+        original_amount = round(sum(line["line_original_total"] for line in priced), 2)
+
+        return {
+            "lines": priced,
+            "total_amount": total_amount,
+            "original_amount": original_amount,
+            "discount_amount": round(original_amount - total_amount, 2)
+        }
+
+
+# Process-wide engine shared by all requests
+pricing_engine = PricingEngine()
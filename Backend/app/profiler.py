@@ -0,0 +1,217 @@
+"""
+SQL query profiler.
+
+Cursor events on the engines record every statement of a request, grouped
+by its normalized shape: literals, placeholders and IN lists are collapsed,
+so the per-row lazy loads of an N+1 pattern all share one shape. A shape
+repeated repeat_threshold times or more in one request is flagged.
+
+With SQL_PROFILE=1 (debug only), QueryProfilerMiddleware profiles every
+request. It adds a Server-Timing header (query count and DB time, plus the
+worst repeated shape) that browser dev tools show per request, and it logs
+flagged requests. Otherwise the listeners only cost a context variable
+lookup per statement.
+
+query_budget() is the same machinery for checks and tests: it records
+every statement on the engines while the block runs, and raises
+QueryBudgetExceeded (an AssertionError) if there were too many, or if any
+shape repeated too often. See tests/test_query_budgets.py.
+"""
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional, List, Dict, Tuple
+
+from sqlalchemy import event
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+# ?, %s, %(name)s, :name, $1 and SQLAlchemy's expanding IN markers
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|(?<![:\w]):\w+|\$\d+|__\[POSTCOMPILE_\w+\]")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(statement: str) -> str:
+    """Statement shape: one line, literals and placeholders as ?, IN lists as (?...)"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("(?...)", shape)
+
+
+class QueryProfile:
+    """Statements of one request (or budget block) grouped by shape"""
+
+    __slots__ = ("shapes", "count", "seconds")
+
+    def __init__(self):
+        # statement text -> [executions, seconds]; grouped() folds these into shapes
+        self.shapes: Dict[str, List] = {}
+        self.count = 0
+        self.seconds = 0.0
+
+    def record(self, statement: str, elapsed: float):
+        entry = self.shapes.get(statement)
+        if entry is None:
+            # Normalized lazily in grouped(), so recording stays a dict lookup
+            entry = self.shapes[statement] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        self.count += 1
+        self.seconds += elapsed
+
+    def grouped(self) -> List[Tuple[str, int, float]]:
+        """(shape, executions, seconds), most executed first"""
+        groups: Dict[str, List] = {}
+        for statement, (count, seconds) in self.shapes.items():
+            group = groups.setdefault(normalize_sql(statement), [0, 0.0])
+            group[0] += count
+            group[1] += seconds
+        return sorted(
+            ((shape, count, seconds) for shape, (count, seconds) in groups.items()),
+            key=lambda group: (-group[1], -group[2])
+        )
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int, float]]:
+        """Shapes executed at least `threshold` times: likely N+1 loads"""
+        return [group for group in self.grouped() if group[1] >= threshold]
+
+    def describe(self, limit: int = 10) -> str:
+        lines = [f"{self.count} queries, {self.seconds * 1000:.1f}ms"]
+        for shape, count, seconds in self.grouped()[:limit]:
+            lines.append(f"  {count:>4}x {seconds * 1000:7.1f}ms  {shape[:200]}")
+        return "\n".join(lines)
+
+
+_current: ContextVar[Optional[QueryProfile]] = ContextVar("query_profile", default=None)
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _current.get()
+
+
+class QueryProfiler:
+    """Engine listeners plus the debug-mode settings"""
+
+    def __init__(self, enabled: bool = False, repeat_threshold: int = 5):
+        self.enabled = enabled
+        self.repeat_threshold = repeat_threshold
+        # Budget blocks recording every statement, regardless of request context
+        self._budgets: List[QueryProfile] = []
+
+    @classmethod
+    def from_env(cls) -> "QueryProfiler":
+        return cls(
+            enabled=os.getenv("SQL_PROFILE", "0").lower() in ("1", "true", "yes", "on"),
+            repeat_threshold=int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5"))
+        )
+
+    def instrument(self, engine):
+        """Listen to cursor events on a sync engine (async_engine.sync_engine for async)"""
+        budgets = self._budgets
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if budgets or _current.get() is not None:
+                context._profile_started = time.perf_counter()
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_profile_started", None)
+            if started is None:
+                return
+            elapsed = time.perf_counter() - started
+            profile = _current.get()
+            if profile is not None:
+                profile.record(statement, elapsed)
+            for budget in budgets:
+                if budget is not profile:
+                    budget.record(statement, elapsed)
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    @contextmanager
+    def profile(self):
+        """Record this context's statements (and the threadpool calls it makes) into a fresh profile"""
+        profile = QueryProfile()
+        token = _current.set(profile)
+        try:
+            yield profile
+        finally:
+            _current.reset(token)
+
+    def server_timing(self, profile: QueryProfile, total: float) -> str:
+        entries = [
+            f'db;dur={profile.seconds * 1000:.2f};desc="{profile.count} queries"',
+            f"app;dur={total * 1000:.2f}"
+        ]
+        repeated = profile.repeated(self.repeat_threshold)
+        if repeated:
+            shape, count, seconds = repeated[0]
+            table = re.search(r"\bFROM (\w+)", shape)
+            label = f"{count}x {table.group(1) if table else shape[:40]}".replace('"', "'")
+            entries.append(f'nplus1;dur={seconds * 1000:.2f};desc="{label}"')
+        return ", ".join(entries)
+
+
+# Process-wide profiler
+query_profiler = QueryProfiler.from_env()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget(); the message lists the statement shapes"""
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None):
+    """
+    Fail if the block runs more than max_queries statements, or (with
+    max_repeats) any one statement shape more than max_repeats times. Counts
+    every instrumented engine, so keep background tasks out of the block.
+    """
+    profile = QueryProfile()
+    query_profiler._budgets.append(profile)
+    try:
+        yield profile
+    finally:
+        query_profiler._budgets.remove(profile)
+
+    problems = []
+    if profile.count > max_queries:
+        problems.append(f"{profile.count} queries (budget {max_queries})")
+    if max_repeats is not None:
+        for shape, count, _ in profile.repeated(max_repeats + 1):
+            problems.append(f"{count}x the same statement (limit {max_repeats}): {shape[:120]}")
+    if problems:
+        raise QueryBudgetExceeded("; ".join(problems) + "\n" + profile.describe())
+
+
+class QueryProfilerMiddleware:
+    """Debug mode: profile each HTTP request, add Server-Timing and log N+1 suspects"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not query_profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with query_profiler.profile() as profile:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    # Headers go out before the body, so this covers the handler but not streaming
+                    timing = query_profiler.server_timing(profile, time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode("latin-1", "replace"))]
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
+
+        for shape, count, seconds in profile.repeated(query_profiler.repeat_threshold):
+            print(f"⚠️  Possible N+1 in {scope['method']} {scope['path']}: {count}x ({seconds * 1000:.1f}ms) {shape[:160]}")
@@ -0,0 +1,61 @@
+"""
+Per-user purchase index for "buy again".
+
+Each row is one (user, product, size) the user has ordered. It records how
+many orders included it, the total and most recent quantity, and the last
+order. Cancelled orders are left out. The order_created and
+order_status_changed jobs call record_order() after an order commits or
+changes status, so GET /api/user/frequent-items reads a few indexed rows
+instead of scanning the user's order history.
+"""
+from typing import Dict, Tuple
+
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+
+from .models import Order, OrderItem, UserPurchase
+
+
+def record_order(db: Session, order: Order):
+    """
+    Rebuild the user's index rows for this order's products from their
+    non-cancelled orders (does not commit). Recomputing rather than adding
+    makes the jobs safe to run out of order or more than once, and lets a
+    cancellation or reinstatement take the order out or put it back.
+    """
+    product_ids = set(db.execute(
+        select(OrderItem.product_id).where(OrderItem.order_id == order.id, OrderItem.product_id.isnot(None))
+    ).scalars())
+    if not product_ids:
+        return
+
+    # One row per (product, size, order), oldest order first
+    purchases: Dict[Tuple[int, str], Dict] = {}
+    for product_id, size, order_id, ordered_at, quantity in db.execute(
+        select(OrderItem.product_id, func.coalesce(OrderItem.size_ordered, ""), Order.id, Order.created_at,
+               func.sum(OrderItem.quantity))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(
+            Order.user_id == order.user_id,
+            Order.status != "cancelled",
+            OrderItem.product_id.in_(product_ids)
+        )
+        .group_by(OrderItem.product_id, func.coalesce(OrderItem.size_ordered, ""), Order.id, Order.created_at)
+        .order_by(Order.id)
+    ):
+        row = purchases.setdefault((product_id, size), {
+            "user_id": order.user_id, "product_id": product_id, "size": size,
+            "order_count": 0, "total_quantity": 0
+        })
+        row["order_count"] += 1
+        row["total_quantity"] += quantity
+        row.update(last_quantity=quantity, last_order_id=order_id, last_ordered_at=ordered_at)
+
+    db.execute(delete(UserPurchase).where(
+        UserPurchase.user_id == order.user_id,
+        UserPurchase.product_id.in_(product_ids)
+    ))
+    if purchases:
+        # A concurrent job for the same user may insert the same key first; the
+        # unique index rejects ours and the job retries
+        db.execute(insert(UserPurchase), list(purchases.values()))
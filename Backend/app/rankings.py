@@ -0,0 +1,158 @@
+"""
+Materialized "popular" and "featured" product lists.
+
+Instead of sorting the whole active catalogue on every request, each worker
+keeps the top-N popular (sales_count, then views) and featured (newest
+first) products per category and across the catalogue, as ready-to-serve
+ProductResponse dicts. Reads are a dictionary lookup plus a slice.
+
+The lists are rebuilt with two window-function queries (top N per
+category); the global lists are taken from the union of the per-category
+ones, which always contains the global top N. A background task rebuilds
+every refresh_interval, and sooner after mark_stale() (product writes,
+completed orders), waiting min_rebuild_interval so a burst of sales costs
+one rebuild.
+"""
+import asyncio
+import os
+import time
+from typing import Optional, List, Dict, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, joinedload
+
+from .database import SessionLocal
+from .models import Product
+from .pricing import apply_discount_percent
+from .schemas import ProductResponse
+
+POPULAR = "popular"
+FEATURED = "featured"
+
+RANKING_ORDER = {
+    POPULAR: (Product.sales_count.desc(), Product.views.desc(), Product.id),
+    FEATURED: (Product.created_at.desc(), Product.id.desc()),
+}
+
+
+def popular_key(product: Dict):
+    return -(product["sales_count"] or 0), -(product["views"] or 0), product["id"]
+
+
+def featured_key(product: Dict):
+    return -product["created_at"].timestamp(), -product["id"]
+
+
+class ProductRankings:
+    """Per-worker top-N lists keyed by (list name, category id or None)"""
+
+    def __init__(self, top_n: int = 50, refresh_interval: float = 300.0, min_rebuild_interval: float = 5.0):
+        self.top_n = top_n
+        self.refresh_interval = refresh_interval
+        self.min_rebuild_interval = min_rebuild_interval
+        self._lists: Dict[Tuple[str, Optional[int]], List[Dict]] = {}
+        self._built_at: Optional[float] = None
+        self.builds = 0
+        self.build_ms = 0.0
+        # Reads served from the lists vs. reads that had to build them first
+        self.hits = 0
+        self.misses = 0
+        self._stale: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> "ProductRankings":
+        return cls(
+            top_n=int(os.getenv("RANKINGS_TOP_N", "50")),
+            refresh_interval=float(os.getenv("RANKINGS_REFRESH_INTERVAL", "300"))
+        )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._built_at is not None
+
+    def top(self, name: str, category_id: Optional[int] = None) -> List[Dict]:
+        """The precomputed list (empty if the category has none)"""
+        return self._lists.get((name, category_id), [])
+
+    def _ranked(self, db: Session, name: str, *criteria) -> List[Product]:
+        rank = func.row_number().over(partition_by=Product.category_id, order_by=RANKING_ORDER[name]).label("rank")
+        ranked = select(Product.id, rank).where(Product.is_active == True, *criteria).subquery()
+        return db.query(Product).options(joinedload(Product.category)).join(
+            ranked, ranked.c.id == Product.id
+        ).filter(ranked.c.rank <= self.top_n).all()
+
+    def build(self, db: Session):
+        started = time.perf_counter()
+        lists: Dict[Tuple[str, Optional[int]], List[Dict]] = {}
+        for name, criteria, key in (
+            (POPULAR, (), popular_key),
+            (FEATURED, (Product.is_featured == True,), featured_key),
+        ):
+            products = [
+                ProductResponse.model_validate(apply_discount_percent(product)).model_dump()
+                for product in self._ranked(db, name, *criteria)
+            ]
+            products.sort(key=key)
+            for product in products:
+                lists.setdefault((name, product["category_id"]), []).append(product)
+            lists[(name, None)] = products[:self.top_n]
+
+        # Swap in one assignment so readers never see a half-built set
+        self._lists = lists
+        self._built_at = time.monotonic()
+        self.builds += 1
+        self.build_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def ensure_loaded(self, db: Session):
+        if self.is_loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.build(db)
+
+    def mark_stale(self):
+        """Ask the background task for a rebuild (safe from any thread)"""
+        if self._stale is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stale.set)
+
+    def _build_with_session(self):
+        db = SessionLocal()
+        try:
+            self.build(db)
+        finally:
+            db.close()
+
+    async def run(self):
+        """Background task: rebuild on a timer and shortly after mark_stale()"""
+        self._loop = asyncio.get_running_loop()
+        self._stale = asyncio.Event()
+        while True:
+            try:
+                await run_in_threadpool(self._build_with_session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Product rankings rebuild failed: {e}")
+            try:
+                await asyncio.wait_for(self._stale.wait(), timeout=self.refresh_interval)
+                # Let a burst of changes settle into one rebuild
+                await asyncio.sleep(self.min_rebuild_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._stale.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "lists": len(self._lists),
+            "builds": self.builds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "last_build_ms": self.build_ms,
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at else None
+        }
+
+
+# Process-wide rankings
+product_rankings = ProductRankings.from_env()
@@ -0,0 +1,177 @@
+"""
+"Frequently bought together" recommendations.
+
+build_relations() streams order_items once, ordered by order, and turns each
+order into a basket of distinct product ids. Every pair in a basket is
+counted with a single Counter.update() over the basket's combinations, so
+counting runs in C instead of a Python loop per pair. The result is a
+sparse, symmetric co-occurrence matrix. Each product keeps its top_k
+partners (ties go to the lower product id), and these are written to
+product_relations in one transaction. Cancelled orders are ignored. Baskets
+larger than max_basket are skipped, since bulk orders say little about what
+goes together and would cost quadratic pairs.
+
+The rebuild runs offline: from scripts/build_related_products.py (cron) or
+as a background job queued by an admin. Each worker serves
+/api/products/{id}/related from an in-memory copy, reloaded when a rebuild
+finishes or the catalogue changes.
+"""
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+from typing import Optional, List, Dict, Iterable, Tuple
+
+from sqlalchemy import select, insert, delete
+from sqlalchemy.orm import Session, joinedload
+
+from .catalog import catalog_version
+from .models import Order, OrderItem, Product, ProductRelation
+from .pricing import apply_discount_percent
+from .schemas import ProductResponse
+
+
+def order_baskets(db: Session, chunk_size: int = 10000) -> Iterable[List[int]]:
+    """Distinct product ids per non-cancelled order, streamed in order id order"""
+    rows = db.execute(
+        select(OrderItem.order_id, OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(OrderItem.product_id.isnot(None), Order.status != "cancelled")
+        .order_by(OrderItem.order_id)
+        .execution_options(yield_per=chunk_size)
+    )
+    for _, items in groupby(rows, key=itemgetter(0)):
+        yield sorted({product_id for _, product_id in items})
+
+
+def count_pairs(baskets: Iterable[List[int]], max_basket: int = 50) -> Tuple[Counter, Dict]:
+    """Co-occurrence counts keyed by (lower id, higher id), plus basket stats"""
+    pairs: Counter = Counter()
+    stats = {"orders": 0, "lines": 0, "skipped_orders": 0}
+    for basket in baskets:
+        stats["orders"] += 1
+        stats["lines"] += len(basket)
+        if len(basket) > max_basket:
+            stats["skipped_orders"] += 1
+            continue
+        # Baskets are sorted, so each pair comes out as (lower, higher)
+        pairs.update(combinations(basket, 2))
+    return pairs, stats
+
+
+def top_partners(pairs: Counter, top_k: int = 10, min_count: int = 1) -> Dict[int, List[Tuple[int, int]]]:
+    """product id -> [(partner id, together count)] best first"""
+    # (-count, partner id) sorts best first, and by lower id on ties, without a key function
+    candidates: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for (a, b), count in pairs.items():
+        if count >= min_count:
+            candidates[a].append((-count, b))
+            candidates[b].append((-count, a))
+    return {
+        product_id: [(partner_id, -count) for count, partner_id in heapq.nsmallest(top_k, ranked)]
+        for product_id, ranked in candidates.items()
+    }
+
+
+def build_relations(db: Session, top_k: int = 10, min_count: int = 1, max_basket: int = 50) -> Dict:
+    """Recount co-occurrences and replace product_relations (does not commit)"""
+    started = time.perf_counter()
+    pairs, stats = count_pairs(order_baskets(db), max_basket=max_basket)
+    partners = top_partners(pairs, top_k=top_k, min_count=min_count)
+    rows = [
+        {"product_id": product_id, "related_product_id": related_id, "rank": rank, "together_count": count}
+        for product_id, related in partners.items()
+        for rank, (related_id, count) in enumerate(related, start=1)
+    ]
+    db.execute(delete(ProductRelation))
+    if rows:
+        db.execute(insert(ProductRelation), rows)
+    seconds = time.perf_counter() - started
+    return {
+        **stats,
+        "pairs": len(pairs),
+        "products": len(partners),
+        "relations": len(rows),
+        "seconds": round(seconds, 3),
+        "lines_per_sec": round(stats["lines"] / seconds, 1) if seconds else None
+    }
+
+
+class RelatedProducts:
+    """
+    In-memory copy of product_relations with the partner products already
+    serialized, so a lookup is one dict access and no query
+    """
+
+    def __init__(self, ttl_seconds: float = 3600.0):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (product id -> [(partner id, together count)], partner id -> ProductResponse dict)
+        self._index: Tuple[Dict[int, List[Tuple[int, int]]], Dict[int, Dict]] = ({}, {})
+        self._loaded_at: Optional[float] = None
+        self._catalog_version: Optional[int] = None
+
+    def invalidate(self):
+        """Reload on next use (call after a rebuild)"""
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self, db: Session):
+        version = catalog_version.value
+        related: Dict[int, List[Tuple[int, int]]] = {}
+        for product_id, related_id, count in db.execute(
+            select(ProductRelation.product_id, ProductRelation.related_product_id, ProductRelation.together_count)
+            .order_by(ProductRelation.product_id, ProductRelation.rank)
+        ):
+            related.setdefault(product_id, []).append((related_id, count))
+
+        # Only active partners are served; deactivated ones drop out until the next rebuild
+        partners = db.query(Product).options(joinedload(Product.category)).filter(
+            Product.is_active == True,
+            Product.id.in_(select(ProductRelation.related_product_id).distinct())
+        ).all()
+        products = {
+            product.id: ProductResponse.model_validate(apply_discount_percent(product)).model_dump()
+            for product in partners
+        }
+
+        with self._lock:
+            self._index = (related, products)
+            self._loaded_at = time.monotonic()
+            self._catalog_version = version
+
+    def ensure_fresh(self, db: Session):
+        """Reload if invalidated, the catalogue changed, or past the TTL"""
+        loaded_at = self._loaded_at
+        if (
+            loaded_at is not None
+            and self._catalog_version == catalog_version.value
+            and time.monotonic() - loaded_at < self.ttl_seconds
+        ):
+            return
+        self.load(db)
+
+    def get(self, product_id: int, limit: int = 10) -> List[Dict]:
+        related, products = self._index
+        results = []
+        for related_id, count in related.get(product_id, []):
+            product = products.get(related_id)
+            if product is not None:
+                results.append({**product, "together_count": count})
+                if len(results) >= limit:
+                    break
+        return results
+
+    def stats(self) -> Dict:
+        related, products = self._index
+        return {
+            "products": len(related),
+            "partners": len(products),
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None
+        }
+
+
+# Process-wide index
+related_products = RelatedProducts()
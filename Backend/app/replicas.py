@@ -0,0 +1,258 @@
+"""
+Read-replica routing.
+
+Read-only endpoints take their session from get_read_db / get_async_read_db.
+When DATABASE_REPLICA_URLS lists replicas, those sessions run SELECTs on a
+replica and anything that writes (flushes, DML, SELECT ... FOR UPDATE) on the
+primary; with no replicas they are ordinary primary sessions.
+
+Replication lag is measured with a heartbeat: every heartbeat_interval the
+primary's replica_heartbeats row is rewritten with the current time, and
+reading that row on a replica gives the time the replica is current as of.
+A replica serves a read only if it is current as of now - max_staleness
+and, for a user who has written recently, as of that write
+(read-your-writes); otherwise the read goes to the primary. A write is any
+successful non-GET request with a bearer token. The worker that served it
+remembers the time, and the response carries it as a signed X-Last-Write
+header; clients send that header back on later requests so whichever
+worker answers them keeps the user's reads read-your-writes, with no shared
+state between workers.
+
+To try it locally, point DATABASE_REPLICA_URLS at a copy of the SQLite
+database and keep it current with scripts/sync_sqlite_replica.py.
+"""
+import asyncio
+import hashlib
+import hmac
+import itertools
+import os
+import time
+from typing import Optional, List, Dict
+
+from fastapi import Header
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, select, update, insert, exc
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+
+from .auth import decode_token, SECRET_KEY
+from .database import engine, async_engine, PoolMetrics, pool_settings, get_async_database_url
+from .models import ReplicaHeartbeat
+
+HEARTBEAT_ID = 1
+# Response/request header carrying the user's last write time (see module docstring)
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+class RoutingSession(Session):
+    """Session that reads from its replica engine and writes to the primary"""
+
+    def __init__(self, replica_engine=None, **kwargs):
+        super().__init__(**kwargs)
+        self.replica_engine = replica_engine
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.replica_engine is not None
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and getattr(clause, "_for_update_arg", None) is None
+        ):
+            return self.replica_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+
+class Replica:
+    """One replica's engines and the freshness last read from it"""
+
+    __slots__ = ("url", "engine", "async_engine", "as_of", "reads", "errors")
+
+    def __init__(self, url: str):
+        self.url = url
+        connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+        self.engine = create_engine(url, connect_args=connect_args, **pool_settings(url, PoolMetrics()))
+        async_url = get_async_database_url(url)
+        self.async_engine = create_async_engine(async_url, **pool_settings(async_url, PoolMetrics(), is_async=True))
+        self.as_of = 0.0  # unknown until the first heartbeat read
+        self.reads = 0
+        self.errors = 0
+
+
+class ReplicaRouter:
+    """Picks a sufficiently fresh replica per read session"""
+
+    def __init__(self, urls: List[str], max_staleness: float = 5.0, heartbeat_interval: float = 1.0):
+        self.replicas = [Replica(url) for url in urls]
+        self.max_staleness = max_staleness
+        self.heartbeat_interval = heartbeat_interval
+        self._last_write: Dict[int, float] = {}
+        self._counter = itertools.count()
+        self.primary_reads = 0
+
+    @classmethod
+    def from_env(cls) -> "ReplicaRouter":
+        urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+        return cls(
+            urls,
+            max_staleness=float(os.getenv("REPLICA_MAX_STALENESS", "5")),
+            heartbeat_interval=float(os.getenv("REPLICA_HEARTBEAT_INTERVAL", "1"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def mark_write(self, user_id: int, ts: Optional[float] = None):
+        """Pin the user's reads to data at least as new as this write"""
+        ts = ts or time.time()
+        if ts > self._last_write.get(user_id, 0.0):
+            self._last_write[user_id] = ts
+
+    def choose(self, user_id: Optional[int] = None, last_write: Optional[float] = None) -> Optional[Replica]:
+        """A replica fresh enough for this user (and their client's last write), or None to read from the primary"""
+        if not self.replicas:
+            return None
+        required = time.time() - self.max_staleness
+        if last_write is not None and last_write > required:
+            required = last_write
+        if user_id is not None and user_id in self._last_write:
+            last_write = self._last_write[user_id]
+            if last_write > required:
+                required = last_write
+            else:
+                # Older than the staleness bound, so it no longer constrains anything
+                del self._last_write[user_id]
+
+        candidates = [replica for replica in self.replicas if replica.as_of >= required]
+        if not candidates:
+            self.primary_reads += 1
+            return None
+        replica = candidates[next(self._counter) % len(candidates)]
+        replica.reads += 1
+        return replica
+
+    def beat(self):
+        """Write the heartbeat on the primary and read it back from every replica"""
+        now = time.time()
+        try:
+            with engine.begin() as conn:
+                updated = conn.execute(
+                    update(ReplicaHeartbeat).where(ReplicaHeartbeat.id == HEARTBEAT_ID).values(ts=now)
+                ).rowcount
+                if not updated:
+                    conn.execute(insert(ReplicaHeartbeat).values(id=HEARTBEAT_ID, ts=now))
+        except exc.IntegrityError:
+            pass  # another worker created the row first
+
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    replica.as_of = conn.execute(
+                        select(ReplicaHeartbeat.ts).where(ReplicaHeartbeat.id == HEARTBEAT_ID)
+                    ).scalar() or 0.0
+            except Exception as e:
+                replica.errors += 1
+                # Log once per outage rather than on every beat
+                if replica.as_of or replica.errors == 1:
+                    print(f"⚠️  Replica heartbeat failed for {replica.engine.url.render_as_string(hide_password=True)}: {e}")
+                # An unreachable replica is never fresh enough
+                replica.as_of = 0.0
+
+    async def run(self):
+        """Background task: heartbeat every heartbeat_interval until cancelled"""
+        while True:
+            try:
+                await run_in_threadpool(self.beat)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Replica heartbeat error: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+            await replica.async_engine.dispose()
+
+    def stats(self) -> Dict:
+        now = time.time()
+        return {
+            "max_staleness": self.max_staleness,
+            "primary_reads": self.primary_reads,
+            "sticky_users": len(self._last_write),
+            "replicas": [
+                {
+                    "url": replica.engine.url.render_as_string(hide_password=True),
+                    "lag_seconds": round(now - replica.as_of, 3) if replica.as_of else None,
+                    "reads": replica.reads,
+                    "errors": replica.errors
+                }
+                for replica in self.replicas
+            ]
+        }
+
+
+def token_user_id(authorization: Optional[str]) -> Optional[int]:
+    """user_id claim from a "Bearer <token>" header, without touching the database"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    payload = decode_token(authorization[7:])
+    return payload.get("user_id") if payload else None
+
+
+def _write_signature(user_id: int, ts: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), f"{user_id}:{ts}".encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def write_marker(user_id: int, ts: float) -> str:
+    """X-Last-Write value for a user's write at ts: "<ts>.<signature>" """
+    stamp = f"{ts:.3f}"
+    return f"{stamp}.{_write_signature(user_id, stamp)}"
+
+
+def marker_ts(marker: Optional[str], user_id: Optional[int]) -> Optional[float]:
+    """Write time from an X-Last-Write header, if it was signed for this user"""
+    if not marker or user_id is None:
+        return None
+    stamp, _, signature = marker.rpartition(".")
+    if not stamp or not hmac.compare_digest(signature, _write_signature(user_id, stamp)):
+        return None
+    try:
+        return float(stamp)
+    except ValueError:
+        return None
+
+
+def choose_replica(authorization: Optional[str], last_write: Optional[str]) -> Optional[Replica]:
+    if not replica_router.enabled:
+        return None
+    user_id = token_user_id(authorization)
+    return replica_router.choose(user_id, marker_ts(last_write, user_id))
+
+
+# Process-wide router
+replica_router = ReplicaRouter.from_env()
+
+
+# Dependency for read-only sync endpoints
+def get_read_db(authorization: Optional[str] = Header(None), x_last_write: Optional[str] = Header(None)):
+    replica = choose_replica(authorization, x_last_write)
+    db = ReadSessionLocal(replica_engine=replica.engine if replica else None)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Dependency for read-only async endpoints
+async def get_async_read_db(authorization: Optional[str] = Header(None), x_last_write: Optional[str] = Header(None)):
+    replica = choose_replica(authorization, x_last_write)
+    async with AsyncReadSessionLocal(replica_engine=replica.async_engine.sync_engine if replica else None) as db:
+        yield db
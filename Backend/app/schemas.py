@@ -230,6 +230,41 @@ class ProductUpdate(BaseModel):
     is_featured: Optional[bool] = None
     is_active: Optional[bool] = None
 
+class ProductImportRow(BaseModel):
+    """One row of a bulk catalogue import; category is a slug or name"""
+    name: str = Field(..., min_length=1)
+    category_id: Optional[int] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = Field(None, ge=0)  # required for new products, see CatalogImport.apply
+    original_price: Optional[float] = Field(None, ge=0)
+    stock: int = Field(0, ge=0)
+    image_path: Optional[str] = None
+    size: Optional[str] = None
+    color: Optional[str] = None
+    finish: Optional[str] = None
+    is_featured: bool = False
+    is_active: bool = True
+
+class ProductBulkItem(ProductUpdate):
+    id: int
+
+class ProductBulkFilter(BaseModel):
+    ids: Optional[List[int]] = None
+    category_id: Optional[int] = None
+    name_contains: Optional[str] = None
+    size: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_featured: Optional[bool] = None
+
+class ProductBulkUpdate(BaseModel):
+    """Either a list of per-product updates, or a filter plus one patch for every match"""
+    updates: List[ProductBulkItem] = []
+    filter: Optional[ProductBulkFilter] = None
+    patch: Optional[ProductUpdate] = None
+    price_change_percent: Optional[float] = Field(None, gt=-100)
+    dry_run: bool = False
+
 class ProductResponse(BaseModel):
     id: int
     category_id: int
@@ -253,6 +288,9 @@ class ProductResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class RelatedProductResponse(ProductResponse):
+    together_count: int  # orders that contained both products
+
 # Cart Schemas
 class CartItemCreate(BaseModel):
     product_id: int
@@ -263,6 +301,32 @@ class CartItemUpdate(BaseModel):
     quantity: int
     selected_size: Optional[str] = None
 
+class CartBatchOperation(BaseModel):
+    """add: product_id + quantity; update/remove: cart_item_id or product_id"""
+    op: str
+    product_id: Optional[int] = None
+    cart_item_id: Optional[int] = None
+    quantity: int = Field(1, ge=0)
+    selected_size: Optional[str] = None
+    
+    @validator('op')
+    def validate_op(cls, v):
+        if v not in ('add', 'update', 'remove'):
+            raise ValueError('op must be add, update or remove')
+        return v
+
+class CartBatch(BaseModel):
+    operations: List[CartBatchOperation] = Field(..., min_length=1, max_length=200)
+
+class FrequentItemResponse(BaseModel):
+    product_id: int
+    size: Optional[str] = None
+    order_count: int
+    total_quantity: int
+    last_quantity: int
+    last_ordered_at: Optional[datetime] = None
+    product: ProductResponse
+
 class CartItemResponse(BaseModel):
     id: int
     product_id: int
@@ -282,6 +346,16 @@ class AdminOfferCreate(BaseModel):
     valid_from: datetime
     valid_until: datetime
     is_active: bool = True
+    category_id: Optional[int] = None
+    product_id: Optional[int] = None
+    size: Optional[str] = None
+    min_quantity: int = Field(1, ge=1)
+    
+    @validator('discount_percent')
+    def validate_discount_percent(cls, v):
+        if v < 0 or v > 100:
+            raise ValueError('Discount percent must be between 0 and 100')
+        return v
 
 class AdminOfferResponse(BaseModel):
     id: int
@@ -291,6 +365,10 @@ class AdminOfferResponse(BaseModel):
     valid_from: datetime
     valid_until: datetime
     is_active: bool
+    category_id: Optional[int] = None
+    product_id: Optional[int] = None
+    size: Optional[str] = None
+    min_quantity: Optional[int] = 1
     created_at: datetime
 
     class Config:
@@ -356,3 +434,21 @@ class OrderResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+# Points Ledger Schemas
+class PointsLedgerEntryResponse(BaseModel):
+    id: int
+    txn_id: str
+    delta: int
+    balance_after: Optional[int] = None
+    reason: str
+    order_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class PointsHistoryResponse(BaseModel):
+    balance: int
+    entries: List[PointsLedgerEntryResponse]
+    next_before_id: Optional[int] = None
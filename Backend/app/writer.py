@@ -0,0 +1,193 @@
+"""
+Single-writer queue with group commit for SQLite.
+
+SQLite allows one writer at a time and every commit pays for a WAL sync. In
+SQLite production mode each worker runs one writer thread that takes every
+job waiting in its queue (up to max_batch) and runs them in a single
+BEGIN IMMEDIATE transaction, each job inside its own savepoint so a failing
+job only rolls back itself. Workers still take turns on the database lock,
+but once per batch instead of once per request, and BEGIN IMMEDIATE waits
+out busy_timeout up front instead of failing mid-transaction with
+"database is locked". A job's caller is only answered after its batch
+commits.
+
+Jobs are plain functions that take a Connection and return plain data. On
+other databases (or with SQLITE_MODE=default) each job runs directly in its
+own transaction on the async engine. ORM code can run as a job through a
+Session bound to the job's connection; its commit() only releases the job's
+savepoint.
+
+Routed through the queue: cart writes, view counters, catalogue import
+and bulk update, order creation (cart and direct) and order status changes.
+Not routed, relying on busy_timeout instead:
+- rare admin writes (single products, categories, offers, users)
+- the background loops (outbox dispatcher, job worker, bus polling and
+  pruning), which run one transaction per poll, not per request
+"""
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Any, Optional, Tuple, List, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Connection
+from sqlalchemy.pool import StaticPool
+
+from .database import DATABASE_URL, SQLITE_PRODUCTION, connect_args, apply_sqlite_pragmas, async_engine
+
+WriteJob = Callable[[Connection], Any]
+
+
+def create_writer_engine():
+    """One connection for the writer thread, with explicit BEGIN IMMEDIATE transactions"""
+    writer_engine = create_engine(DATABASE_URL, connect_args=connect_args, poolclass=StaticPool)
+
+    @event.listens_for(writer_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, connection_record)
+        # Stop pysqlite managing transactions itself so savepoints behave
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(writer_engine, "begin")
+    def on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return writer_engine
+
+
+class WriteQueue:
+    """Per-worker write funnel; see module docstring"""
+
+    def __init__(self, max_batch: int = 128, enabled: bool = SQLITE_PRODUCTION):
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._queue: "queue.Queue[Optional[Tuple[WriteJob, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._engine = None
+        self._deferred = set()
+
+        # Counters for stats()
+        self.batches = 0
+        self.jobs = 0
+        self.failed_jobs = 0
+        self.failed_batches = 0
+        self.batch_max = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Start the writer thread (no-op unless SQLite production mode is on)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self._engine = create_writer_engine()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Finish queued jobs, then stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        self._engine.dispose()
+        self._engine = None
+
+    def submit(self, job: WriteJob) -> Future:
+        """Queue a job for the writer thread; the future resolves after its batch commits"""
+        future: Future = Future()
+        self._queue.put((job, future))
+        return future
+
+    async def run(self, job: WriteJob) -> Any:
+        """Run a write job and return its result (exceptions raised by the job propagate)"""
+        if self._thread is None:
+            async with async_engine.begin() as conn:
+                return await conn.run_sync(job)
+        return await asyncio.wrap_future(self.submit(job))
+
+    def defer(self, job: WriteJob):
+        """Fire-and-forget write (e.g. view counters); failures are only logged"""
+        if self._thread is not None:
+            self.submit(job).add_done_callback(self._log_failure)
+            return
+        task = asyncio.ensure_future(self.run(job))
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+        task.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"⚠️  Deferred write failed: {future.exception()}")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            # Whatever queued up during the previous commit goes into this one
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit_batch(batch)
+            if stopping:
+                return
+
+    def _commit_batch(self, batch: List[Tuple[WriteJob, Future]]):
+        outcomes = []
+        try:
+            with self._engine.begin() as conn:
+                for job, future in batch:
+                    # Skip jobs whose caller has gone away
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with conn.begin_nested():
+                            outcomes.append((future, job(conn), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            # The commit failed, so nothing in this batch was written
+            self.failed_batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.jobs += len(outcomes)
+        self.batch_max = max(self.batch_max, len(outcomes))
+        for future, result, error in outcomes:
+            if error is not None:
+                self.failed_jobs += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "failed_jobs": self.failed_jobs,
+            "failed_batches": self.failed_batches,
+            "avg_batch": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.batch_max
+        }
+
+
+# Process-wide writer
+write_queue = WriteQueue()
@@ -0,0 +1,53 @@
+"""
+Migration script to add the per-user cart version
+Adds:
+- users.cart_version column, bumped with every cart change and used to key
+  the cart summary cache
+"""
+import sqlite3
+import os
+import sys
+
+def get_db_path():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = os.path.join(backend_dir, 'kubti_hardware.db')
+    return db_path
+
+def add_cart_version():
+    db_path = get_db_path()
+    if not os.path.exists(db_path):
+        print(f"Database not found at: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+
+    try:
+        conn.execute('BEGIN')
+
+        try:
+            cur.execute("ALTER TABLE users ADD COLUMN cart_version INTEGER NOT NULL DEFAULT 0")
+            print("✓ Added 'cart_version' column to users table")
+        except sqlite3.OperationalError as e:
+            if 'duplicate column name' in str(e):
+                print("- Column 'cart_version' already exists in users table")
+            else:
+                raise
+
+        conn.commit()
+        print("\n✅ Cart version migration completed successfully!")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during migration: {e}")
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("CART VERSION MIGRATION")
+    print("=" * 60)
+    success = add_cart_version()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,70 @@
+"""
+Migration script to add offer targeting to the database
+Adds:
+- admin_offers.category_id column
+- admin_offers.product_id column
+- admin_offers.size column
+- admin_offers.min_quantity column
+- ix_admin_offers_active_window index (is_active, valid_until, valid_from)
+"""
+import sqlite3
+import os
+import sys
+
+def get_db_path():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = os.path.join(backend_dir, 'kubti_hardware.db')
+    return db_path
+
+COLUMNS = [
+    ("category_id", "INTEGER REFERENCES categories(id)"),
+    ("product_id", "INTEGER REFERENCES products(id)"),
+    ("size", "TEXT"),
+    ("min_quantity", "INTEGER DEFAULT 1"),
+]
+
+def add_offer_targeting_columns():
+    db_path = get_db_path()
+    if not os.path.exists(db_path):
+        print(f"Database not found at: {db_path}")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    
+    try:
+        conn.execute('BEGIN')
+        
+        for name, coltype in COLUMNS:
+            try:
+                cur.execute(f"ALTER TABLE admin_offers ADD COLUMN {name} {coltype}")
+                print(f"✓ Added '{name}' column to admin_offers table")
+            except sqlite3.OperationalError as e:
+                if 'duplicate column name' in str(e):
+                    print(f"- Column '{name}' already exists in admin_offers table")
+                else:
+                    raise
+        
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_admin_offers_active_window "
+            "ON admin_offers(is_active, valid_until, valid_from)"
+        )
+        print("✓ Ensured 'ix_admin_offers_active_window' index")
+        
+        conn.commit()
+        print("\n✅ Offer targeting migration completed successfully!")
+        return True
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during migration: {e}")
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("OFFER TARGETING MIGRATION")
+    print("=" * 60)
+    success = add_offer_targeting_columns()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,55 @@
+"""
+Migration script to add order lookup indexes to the database
+Adds:
+- ix_order_items_order_id index (order_items.order_id)
+- ix_orders_user_id_id index (user_id, id)
+- ix_orders_status_id index (status, id)
+"""
+import sqlite3
+import os
+import sys
+
+def get_db_path():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = os.path.join(backend_dir, 'kubti_hardware.db')
+    return db_path
+
+INDEXES = [
+    ("ix_order_items_order_id", "order_items(order_id)"),
+    ("ix_orders_user_id_id", "orders(user_id, id)"),
+    ("ix_orders_status_id", "orders(status, id)"),
+]
+
+def add_order_indexes():
+    db_path = get_db_path()
+    if not os.path.exists(db_path):
+        print(f"Database not found at: {db_path}")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    
+    try:
+        conn.execute('BEGIN')
+        
+        for name, target in INDEXES:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+            print(f"✓ Ensured '{name}' index")
+        
+        conn.commit()
+        print("\n✅ Order index migration completed successfully!")
+        return True
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during migration: {e}")
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ORDER INDEX MIGRATION")
+    print("=" * 60)
+    success = add_order_indexes()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,86 @@
+"""
+Migration script to add the points ledger to the database
+Adds:
+- points_ledger table (append-only, double-entry)
+- opening_balance entries so existing users.points reconcile with the ledger
+"""
+import sqlite3
+import os
+import sys
+import uuid
+
+def get_db_path():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = os.path.join(backend_dir, 'kubti_hardware.db')
+    return db_path
+
+def add_points_ledger():
+    db_path = get_db_path()
+    if not os.path.exists(db_path):
+        print(f"Database not found at: {db_path}")
+        return False
+    
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    
+    try:
+        conn.execute('BEGIN')
+        
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS points_ledger (
+                id INTEGER PRIMARY KEY,
+                txn_id VARCHAR(32) NOT NULL,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                account VARCHAR(20) NOT NULL,
+                delta INTEGER NOT NULL,
+                balance_after INTEGER,
+                reason VARCHAR(50) NOT NULL,
+                order_id INTEGER REFERENCES orders(id),
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_points_ledger_id ON points_ledger(id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_points_ledger_txn_id ON points_ledger(txn_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_points_ledger_order_id ON points_ledger(order_id)")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_points_ledger_user_account_id "
+            "ON points_ledger(user_id, account, id)"
+        )
+        print("✓ Ensured 'points_ledger' table and indexes")
+        
+        # Open the ledger for users whose balance predates it
+        cur.execute("""
+            SELECT u.id, u.points FROM users u
+            WHERE COALESCE(u.points, 0) != 0
+              AND NOT EXISTS (SELECT 1 FROM points_ledger l WHERE l.user_id = u.id)
+        """)
+        rows = cur.fetchall()
+        for user_id, points in rows:
+            txn_id = uuid.uuid4().hex
+            cur.executemany(
+                "INSERT INTO points_ledger (txn_id, user_id, account, delta, balance_after, reason) "
+                "VALUES (?, ?, ?, ?, ?, 'opening_balance')",
+                [
+                    (txn_id, user_id, 'user', points, points),
+                    (txn_id, user_id, 'issued', -points, None),
+                ]
+            )
+        print(f"✓ Added opening balances for {len(rows)} users")
+        
+        conn.commit()
+        print("\n✅ Points ledger migration completed successfully!")
+        return True
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during migration: {e}")
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("POINTS LEDGER MIGRATION")
+    print("=" * 60)
+    success = add_points_ledger()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,95 @@
+"""
+Migration script to add the per-user purchase index ("buy again")
+Adds:
+- user_purchases table with its unique (user, product, size) key
+- rows backfilled from existing order history, leaving out cancelled
+  orders; new orders and status changes are handled by the order background
+  jobs
+"""
+import sqlite3
+import os
+import sys
+
+def get_db_path():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = os.path.join(backend_dir, 'kubti_hardware.db')
+    return db_path
+
+def add_user_purchases():
+    db_path = get_db_path()
+    if not os.path.exists(db_path):
+        print(f"Database not found at: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+
+    try:
+        conn.execute('BEGIN')
+
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS user_purchases (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL REFERENCES users(id),
+                product_id INTEGER NOT NULL,
+                size VARCHAR(50) NOT NULL DEFAULT '',
+                order_count INTEGER NOT NULL DEFAULT 0,
+                total_quantity INTEGER NOT NULL DEFAULT 0,
+                last_quantity INTEGER NOT NULL DEFAULT 0,
+                last_order_id INTEGER,
+                last_ordered_at DATETIME
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_user_purchases_id ON user_purchases(id)")
+        cur.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_user_purchases_key "
+            "ON user_purchases(user_id, product_id, size)"
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS ix_user_purchases_frequency "
+            "ON user_purchases(user_id, order_count)"
+        )
+        print("✓ Ensured 'user_purchases' table and indexes")
+
+        cur.execute("SELECT COUNT(*) FROM user_purchases")
+        if cur.fetchone()[0]:
+            print("✓ Purchase index already populated, skipping backfill")
+        else:
+            # One row per (user, product, size, order), oldest order first
+            cur.execute("""
+                SELECT o.user_id, i.product_id, COALESCE(i.size_ordered, ''), o.id, o.created_at, SUM(i.quantity)
+                FROM order_items i JOIN orders o ON o.id = i.order_id
+                WHERE i.product_id IS NOT NULL AND o.status != 'cancelled'
+                GROUP BY o.user_id, i.product_id, COALESCE(i.size_ordered, ''), o.id
+                ORDER BY o.id
+            """)
+            purchases = {}
+            for user_id, product_id, size, order_id, ordered_at, quantity in cur.fetchall():
+                row = purchases.setdefault((user_id, product_id, size), [0, 0, 0, None, None])
+                row[0] += 1
+                row[1] += quantity
+                row[2:] = [quantity, order_id, ordered_at]
+            cur.executemany(
+                "INSERT INTO user_purchases (user_id, product_id, size, order_count, total_quantity, "
+                "last_quantity, last_order_id, last_ordered_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [key + tuple(row) for key, row in purchases.items()]
+            )
+            print(f"✓ Backfilled {len(purchases)} purchase rows from order history")
+
+        conn.commit()
+        print("\n✅ User purchases migration completed successfully!")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during migration: {e}")
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("USER PURCHASES MIGRATION")
+    print("=" * 60)
+    success = add_user_purchases()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,70 @@
+"""
+Migration script to rebuild bus_messages with AUTOINCREMENT ids
+Without it SQLite restarts ids from 1 once the bus prunes the table empty,
+and workers tailing by id skip every later message. New databases get it
+from create_all; this rebuilds an existing table, keeping its rows (so the
+id sequence continues from the current maximum).
+"""
+import sqlite3
+import os
+import sys
+
+def get_db_path():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = os.path.join(backend_dir, 'kubti_hardware.db')
+    return db_path
+
+def rebuild_bus_messages():
+    db_path = get_db_path()
+    if not os.path.exists(db_path):
+        print(f"Database not found at: {db_path}")
+        return False
+
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+
+    try:
+        conn.execute('BEGIN')
+
+        cur.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bus_messages'")
+        row = cur.fetchone()
+        if row is None:
+            print("✓ No 'bus_messages' table yet, the app creates it with AUTOINCREMENT")
+        elif "AUTOINCREMENT" in row[0].upper():
+            print("✓ 'bus_messages' already uses AUTOINCREMENT")
+        else:
+            cur.execute("ALTER TABLE bus_messages RENAME TO bus_messages_old")
+            cur.execute("""
+                CREATE TABLE bus_messages (
+                    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+                    channel VARCHAR(50) NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_ts FLOAT NOT NULL
+                )
+            """)
+            cur.execute(
+                "INSERT INTO bus_messages (id, channel, payload, created_ts) "
+                "SELECT id, channel, payload, created_ts FROM bus_messages_old"
+            )
+            cur.execute("DROP TABLE bus_messages_old")
+            cur.execute("CREATE INDEX IF NOT EXISTS ix_bus_messages_id ON bus_messages(id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS ix_bus_messages_created_ts ON bus_messages(created_ts)")
+            print("✓ Rebuilt 'bus_messages' with AUTOINCREMENT ids")
+
+        conn.commit()
+        print("\n✅ Bus messages migration completed successfully!")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\n❌ Error during migration: {e}")
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("BUS MESSAGES MIGRATION")
+    print("=" * 60)
+    success = rebuild_bus_messages()
+    sys.exit(0 if success else 1)
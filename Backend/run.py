@@ -31,4 +31,6 @@ if __name__ == "__main__":
                 raise e
     else:
         workers = int(os.getenv("WEB_CONCURRENCY", 4))
+        # Workers read this to pick a cross-worker notification bus (see app/bus.py)
+        os.environ["WEB_CONCURRENCY"] = str(workers)
         uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=workers)
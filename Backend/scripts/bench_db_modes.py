@@ -0,0 +1,154 @@
+"""
+Benchmark the sync (threadpool) and async database paths under concurrency.
+Seeds a scratch database, then runs the product listing and cart queries the
+hot endpoints use, N at a time, through SessionLocal + run_in_threadpool and
+through AsyncSessionLocal, and reports latency percentiles and throughput.
+
+Usage: python scripts/bench_db_modes.py [--concurrency 10,50,200] [--requests 2000]
+       [--database-url sqlite:///./bench.db]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", default="10,50,200")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    return parser.parse_args()
+
+
+args = parse_args()
+scratch = None
+if args.database_url is None:
+    scratch = os.path.join(tempfile.mkdtemp(), "bench.db")
+    args.database_url = f"sqlite:///{scratch}"
+# Must be set before app.database creates its engines
+os.environ["DATABASE_URL"] = args.database_url
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from app.database import Base, engine, async_engine, SessionLocal, AsyncSessionLocal
+from app.models import User, Category, Product, CartItem
+
+
+def seed(products: int) -> int:
+    """Create one category, `products` products and a user with a 10-line cart"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        category = Category(name="Bench", slug="bench")
+        db.add(category)
+        db.flush()
+        db.add_all([
+            Product(category_id=category.id, name=f"Paint {i}", price=100 + i % 50, original_price=150, stock=100)
+            for i in range(products)
+        ])
+        user = User(email="bench@example.com", hashed_password="x", full_name="Bench")
+        db.add(user)
+        db.flush()
+        db.add_all([CartItem(user_id=user.id, product_id=i + 1, quantity=1) for i in range(10)])
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def products_query():
+    return (
+        select(Product).options(joinedload(Product.category))
+        .where(Product.is_active == True)
+        .order_by(Product.created_at.desc())
+        .limit(50)
+    )
+
+
+def cart_query(user_id: int):
+    return (
+        select(CartItem)
+        .options(joinedload(CartItem.product).joinedload(Product.category))
+        .where(CartItem.user_id == user_id)
+    )
+
+
+def sync_request(user_id: int):
+    db = SessionLocal()
+    try:
+        db.execute(products_query()).scalars().all()
+        db.execute(cart_query(user_id)).scalars().all()
+    finally:
+        db.close()
+
+
+async def async_request(user_id: int):
+    async with AsyncSessionLocal() as db:
+        (await db.execute(products_query())).scalars().all()
+        (await db.execute(cart_query(user_id))).scalars().all()
+
+
+async def run(mode: str, concurrency: int, requests: int, user_id: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            if mode == "sync":
+                await run_in_threadpool(sync_request, user_id)
+            else:
+                await async_request(user_id)
+            latencies.append(time.perf_counter() - started)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": requests,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "requests_per_sec": round(requests / elapsed, 1),
+    }
+
+
+async def bench(user_id: int) -> list:
+    results = []
+    for concurrency in [int(n) for n in args.concurrency.split(",")]:
+        for mode in ("sync", "async"):
+            results.append(await run(mode, concurrency, args.requests, user_id))
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    user_id = seed(args.products)
+    try:
+        results = asyncio.run(bench(user_id))
+    finally:
+        engine.dispose()
+        if scratch:
+            os.remove(scratch)
+    print(json.dumps({"database": engine.url.get_backend_name(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Micro-benchmark the functions on every request's hot path.
+Runs each one in timed batches in-process (no database, no network):
+- JWT decode and encode
+- password verification
+- offer pricing (apply_discount_percent, price_line, a 10-line cart)
+- response serialization of product and order lists, the way FastAPI does
+  it for a response_model
+It reports the per-call p50/p95/p99 across batches, plus calls per second.
+
+Usage: python scripts/bench_hot_paths.py [--batches 200] [--batch-ms 5] [--only token_decode,price_line]
+Compare two runs with scripts/compare_benchmarks.py.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+
+from app.auth import create_access_token, decode_token, get_password_hash, verify_password
+from app.models import Category, Product, Order, OrderItem, AdminOffer
+from app.pricing import PricingEngine, apply_discount_percent
+from app.schemas import ProductResponse, OrderResponse
+
+SIZES = ["1L", "4L", "10L", "20L"]
+
+
+def make_catalogue(count: int, rng: random.Random) -> List[Product]:
+    """Transient products (with their category loaded) like a listing query returns"""
+    now = datetime.now()
+    categories = [
+        Category(id=i + 1, name=f"Range {i}", slug=f"range-{i}", display_order=i, is_active=True, created_at=now)
+        for i in range(5)
+    ]
+    products = []
+    for i in range(count):
+        price = round(rng.uniform(80, 6000), 2)
+        category = categories[i % len(categories)]
+        products.append(Product(
+            id=i + 1, category_id=category.id, category=category, name=f"Royale Sage Matte 4L #{i}",
+            description="Premium interior emulsion", price=price, original_price=round(price * 1.2, 2),
+            stock=100, image_path=f"/images/{i}.webp", size=rng.choice(SIZES), finish="Matte",
+            is_featured=False, is_active=True, views=0, sales_count=rng.randint(0, 500), created_at=now
+        ))
+    return products
+
+
+def make_orders(count: int, products: List[Product]) -> List[Order]:
+    now = datetime.now()
+    orders = []
+    for n in range(count):
+        items = [
+            OrderItem(
+                id=n * 3 + i, product_id=product.id, product_name=product.name, quantity=2,
+                price_at_purchase=product.price, original_price=product.original_price, discount_percent=16,
+                size_ordered=product.size
+            )
+            for i, product in enumerate(products[n:n + 3])
+        ]
+        orders.append(Order(
+            id=n + 1, user_id=1, order_number=f"ORD{n:08d}", total_amount=1000.0, original_amount=1200.0,
+            discount_amount=200.0, status="delivered", delivery_address="1 Main Street", delivery_city="Pune",
+            order_date=now.strftime('%d-%m-%Y'), order_time=now.strftime('%I:%M %p'), order_day=now.strftime('%A'),
+            points_earned=8, created_at=now, order_items=items
+        ))
+    return orders
+
+
+def make_pricing_engine(products: List[Product], rng: random.Random) -> PricingEngine:
+    now = datetime.now()
+    offers = [
+        AdminOffer(
+            id=i + 1, title=f"Offer {i}", discount_percent=rng.choice([5, 10, 15, 20]),
+            valid_from=now - timedelta(days=1), valid_until=now + timedelta(days=30), is_active=True,
+            category_id=(i % 5) + 1 if i % 2 == 0 else None,
+            product_id=products[i * 7 % len(products)].id if i % 2 == 1 else None,
+            size=SIZES[i % 4] if i % 3 == 0 else None, min_quantity=1 + i % 3
+        )
+        for i in range(20)
+    ]
+    # Never stale, so price_lines() does not go to the database
+    engine = PricingEngine(ttl_seconds=float("inf"))
+    engine.compile(offers)
+    return engine
+
+
+def serializer(model):
+    """validate (from attributes) -> dump to JSON types -> json.dumps, as FastAPI serializes a response_model"""
+    adapter = TypeAdapter(List[model])
+
+    def serialize(objects):
+        content = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    return serialize
+
+
+def benchmarks() -> dict:
+    rng = random.Random(42)
+    products = make_catalogue(200, rng)
+    orders = make_orders(20, products)
+    pricing = make_pricing_engine(products, rng)
+    token = create_access_token({"sub": "buyer@example.com", "user_id": 1})
+    password_hash = get_password_hash("SecurePass123")
+    cart = [(product, 1 + i % 3, product.size) for i, product in enumerate(products[:10])]
+    now = datetime.now()
+    serialize_products = serializer(ProductResponse)
+    serialize_orders = serializer(OrderResponse)
+    listing = [apply_discount_percent(product) for product in products[:50]]
+
+    return {
+        "token_decode": lambda: decode_token(token),
+        "token_encode": lambda: create_access_token({"sub": "buyer@example.com", "user_id": 1}),
+        "password_verify": lambda: verify_password("SecurePass123", password_hash),
+        "discount_percent": lambda: apply_discount_percent(products[7]),
+        "price_line": lambda: pricing.price_line(products[3], 2, "4L", now),
+        "price_cart_10_lines": lambda: pricing.price_lines(None, cart),
+        "serialize_products_50": lambda: serialize_products(listing),
+        "serialize_orders_20": lambda: serialize_orders(orders),
+    }
+
+
+def measure(fn, batches: int, batch_seconds: float) -> dict:
+    # Calibrate the batch size so each batch runs about batch_seconds
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        if time.perf_counter() - started >= batch_seconds or calls >= 1_000_000:
+            break
+        calls *= 2
+
+    per_call = []
+    for _ in range(batches):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        per_call.append((time.perf_counter() - started) / calls)
+    per_call.sort()
+
+    def percentile(p: float) -> float:
+        return round(per_call[min(len(per_call) - 1, int(len(per_call) * p))] * 1e6, 3)
+
+    return {
+        "calls_per_batch": calls,
+        "p50_us": percentile(0.50),
+        "p95_us": percentile(0.95),
+        "p99_us": percentile(0.99),
+        "calls_per_sec": round(1 / (sum(per_call) / len(per_call)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--batch-ms", type=float, default=5.0, help="target duration of one timed batch")
+    parser.add_argument("--only", default=None, help="comma-separated benchmark names")
+    args = parser.parse_args()
+
+    selected = benchmarks()
+    if args.only:
+        names = args.only.split(",")
+        unknown = set(names) - set(selected)
+        if unknown:
+            parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}; choose from {', '.join(selected)}")
+        selected = {name: selected[name] for name in names}
+
+    results = {name: measure(fn, args.batches, args.batch_ms / 1000) for name, fn in selected.items()}
+    print(json.dumps({
+        "python": platform.python_version(),
+        "batches": args.batches,
+        "benchmarks": results
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
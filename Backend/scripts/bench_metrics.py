@@ -0,0 +1,159 @@
+"""
+Benchmark the overhead of the metrics subsystem (app/metrics.py).
+Seeds a scratch database and drives the full app in-process (every
+middleware, real queries, no network). It alternates rounds with metrics
+switched off and on, and reports per-request latency, throughput and the
+relative overhead. It also times the primitives: one histogram observe and
+one /metrics render.
+
+Usage: python scripts/bench_metrics.py [--rounds 6] [--requests 300] [--concurrency 10]
+       [--database-url sqlite:///./bench.db]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=6, help="off/on round pairs")
+    parser.add_argument("--requests", type=int, default=300, help="requests per round")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    return parser.parse_args()
+
+
+args = parse_args()
+scratch = None
+if args.database_url is None:
+    scratch = os.path.join(tempfile.mkdtemp(), "bench.db")
+    args.database_url = f"sqlite:///{scratch}"
+# Must be set before app.database creates its engines
+os.environ["DATABASE_URL"] = args.database_url
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.mkdtemp(), "metrics"))
+
+import httpx
+
+from app.database import Base, engine, SessionLocal
+from app.models import Category, Product
+from app.metrics import metrics, HTTP_LATENCY
+from app.main import app
+
+# The app rate-limits per client IP, so each chunk of requests comes from a new address
+REQUESTS_PER_CLIENT = 50
+PATHS = ("/api/products?limit=20", "/api/categories", "/api/products?sort_by=price_low&limit=20")
+
+
+def seed(products: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        category = Category(name="Bench", slug="bench")
+        db.add(category)
+        db.flush()
+        db.add_all([
+            Product(category_id=category.id, name=f"Paint {i}", price=100 + i % 50, original_price=150, stock=100)
+            for i in range(products)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def run(enabled: bool, round_index: int) -> dict:
+    metrics.enabled = enabled
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    clients = {}
+
+    def client_for(i: int) -> httpx.AsyncClient:
+        chunk = (round_index * args.requests + i) // REQUESTS_PER_CLIENT
+        if chunk not in clients:
+            address = f"10.{chunk // 65536 % 256}.{chunk // 256 % 256}.{chunk % 256}"
+            clients[chunk] = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app, client=(address, 40000)), base_url="http://bench"
+            )
+        return clients[chunk]
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client_for(i).get(PATHS[i % len(PATHS)])
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    for client in clients.values():
+        await client.aclose()
+
+    latencies.sort()
+    return {
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "requests_per_sec": args.requests / elapsed
+    }
+
+
+def primitives() -> dict:
+    iterations = 100000
+    started = time.perf_counter()
+    for i in range(iterations):
+        HTTP_LATENCY.observe(("GET", "/bench"), (i % 100) / 1000)
+    observe_ns = (time.perf_counter() - started) / iterations * 1e9
+
+    started = time.perf_counter()
+    text = metrics.render()
+    render_ms = (time.perf_counter() - started) * 1000
+    return {"observe_ns": round(observe_ns, 1), "render_ms": round(render_ms, 2), "render_lines": text.count("\n")}
+
+
+async def bench() -> dict:
+    async with app.router.lifespan_context(app):
+        await run(True, -1)  # warm up caches, pools and code paths
+        rounds = {False: [], True: []}
+        for round_index in range(args.rounds):
+            # Alternate the order so drift (WAL growth, cache warmth) hits both sides alike
+            for enabled in ((False, True) if round_index % 2 == 0 else (True, False)):
+                rounds[enabled].append(await run(enabled, round_index * 2 + enabled))
+        metrics.enabled = True
+        micro = primitives()
+
+    def summary(results: list) -> dict:
+        return {key: round(statistics.median(result[key] for result in results), 3) for key in results[0]}
+
+    off, on = summary(rounds[False]), summary(rounds[True])
+    return {
+        "rounds": args.rounds,
+        "requests_per_round": args.requests,
+        "concurrency": args.concurrency,
+        "metrics_off": off,
+        "metrics_on": on,
+        "overhead_percent": round((on["mean_ms"] - off["mean_ms"]) / off["mean_ms"] * 100, 2),
+        "throughput_change_percent": round((on["requests_per_sec"] - off["requests_per_sec"]) / off["requests_per_sec"] * 100, 2),
+        "primitives": micro
+    }
+
+
+def main():
+    seed(args.products)
+    try:
+        results = asyncio.run(bench())
+    finally:
+        engine.dispose()
+        if scratch:
+            os.remove(scratch)
+    print(json.dumps({"database": engine.url.get_backend_name(), **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark SQLite default vs production mode (WAL + pragmas + group-commit writer).
+Starts W worker processes against one scratch database; each runs C
+concurrent clients doing a read/write mix (product listing reads, cart line
+upserts) for a fixed time, the same way the async endpoints do. Reports
+throughput, p50/p95/p99 per operation and "database is locked" errors.
+
+Usage: python scripts/bench_sqlite_modes.py [--workers 1,4] [--clients 32]
+       [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+USERS = 200
+PRODUCTS = 500
+
+
+def configure(db_path: str, mode: str):
+    # Must run before anything imports app.database
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["SQLITE_MODE"] = mode
+
+
+def seed(db_path: str, mode: str):
+    configure(db_path, mode)
+    from app.database import Base, engine, SessionLocal
+    from app.models import User, Category, Product
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        category = Category(name="Bench", slug="bench")
+        db.add(category)
+        db.flush()
+        db.add_all([
+            Product(category_id=category.id, name=f"Paint {i}", price=100 + i % 50, original_price=150, stock=10 ** 9)
+            for i in range(PRODUCTS)
+        ])
+        db.add_all([
+            User(email=f"bench{i}@example.com", hashed_password="x", full_name=f"Bench {i}")
+            for i in range(USERS)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    engine.dispose()
+
+
+def worker(db_path: str, mode: str, clients: int, seconds: float, write_ratio: float, results):
+    configure(db_path, mode)
+    from sqlalchemy import select, insert, update
+    from sqlalchemy.orm import joinedload
+    from app.database import AsyncSessionLocal, async_engine
+    from app.models import Product, CartItem
+    from app.writer import write_queue
+
+    def add_line(user_id: int, product_id: int):
+        def job(conn):
+            existing = conn.execute(
+                select(CartItem.id, CartItem.quantity)
+                .where(CartItem.user_id == user_id, CartItem.product_id == product_id)
+            ).first()
+            if existing:
+                conn.execute(update(CartItem).where(CartItem.id == existing.id).values(quantity=existing.quantity + 1))
+            else:
+                conn.execute(insert(CartItem).values(user_id=user_id, product_id=product_id, quantity=1))
+        return job
+
+    async def read():
+        async with AsyncSessionLocal() as db:
+            (await db.execute(
+                select(Product).options(joinedload(Product.category))
+                .where(Product.is_active == True)
+                .order_by(Product.created_at.desc())
+                .limit(50)
+            )).scalars().all()
+
+    async def client(deadline: float, latencies: dict, errors: dict):
+        while time.perf_counter() < deadline:
+            op = "write" if random.random() < write_ratio else "read"
+            started = time.perf_counter()
+            try:
+                if op == "write":
+                    await write_queue.run(add_line(random.randint(1, USERS), random.randint(1, PRODUCTS)))
+                else:
+                    await read()
+                latencies[op].append(time.perf_counter() - started)
+            except Exception as e:
+                key = "database is locked" if "locked" in str(e) else type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+
+    async def main():
+        write_queue.start()
+        latencies = {"read": [], "write": []}
+        errors = {}
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(client(deadline, latencies, errors) for _ in range(clients)))
+        write_queue.stop()
+        await async_engine.dispose()
+        results.append({"latencies": latencies, "errors": errors, "writer": write_queue.stats()})
+
+    asyncio.run(main())
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+
+    def at(p: float) -> float:
+        return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+    return {"count": len(values), "p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99)}
+
+
+def run(mode: str, workers: int, args) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(target=seed, args=(db_path, mode))
+    process.start()
+    process.join()
+
+    with context.Manager() as manager:
+        results = manager.list()
+        processes = [
+            context.Process(target=worker, args=(db_path, mode, args.clients, args.seconds, args.write_ratio, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        results = list(results)
+
+    reads = [value for result in results for value in result["latencies"]["read"]]
+    writes = [value for result in results for value in result["latencies"]["write"]]
+    errors = {}
+    for result in results:
+        for key, count in result["errors"].items():
+            errors[key] = errors.get(key, 0) + count
+    writer_batches = sum(result["writer"]["batches"] for result in results)
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "clients_per_worker": args.clients,
+        "ops_per_sec": round((len(reads) + len(writes)) / args.seconds, 1),
+        "writes_per_sec": round(len(writes) / args.seconds, 1),
+        "read": percentiles(reads),
+        "write": percentiles(writes),
+        "errors": errors,
+        "avg_commit_batch": round(len(writes) / writer_batches, 2) if writer_batches else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,4")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent clients per worker")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = []
+    for workers in [int(n) for n in args.workers.split(",")]:
+        for mode in ("default", "production"):
+            results.append(run(mode, workers, args))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark WebSocket notification fan-out through ConnectionManager.
+Simulates N sockets in-process (no network), a fraction of which are slow,
+and reports how long a broadcast takes to enqueue and to reach every fast
+socket.
+
+Usage: python scripts/bench_ws_fanout.py [--sockets 100,1000,10000] [--slow 0.01]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.connections import ConnectionManager
+
+
+class FakeWebSocket:
+    """Stands in for a starlette WebSocket; slow sockets stall on every send"""
+
+    def __init__(self, delay: float, done: asyncio.Event, expected: int, counter: list):
+        self.delay = delay
+        self.done = done
+        self.expected = expected
+        self.counter = counter
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received += 1
+        if self.received == self.expected and not self.delay:
+            self.counter[0] += 1
+            if self.counter[0] == self.counter[1]:
+                self.done.set()
+
+
+async def run(sockets: int, slow_fraction: float, messages: int) -> dict:
+    manager = ConnectionManager(queue_size=32, send_timeout=30.0)
+    done = asyncio.Event()
+    slow_count = int(sockets * slow_fraction)
+    counter = [0, sockets - slow_count]  # [fast sockets finished, fast sockets total]
+
+    for i in range(sockets):
+        delay = 2.0 if i < slow_count else 0.0
+        manager.register(FakeWebSocket(delay, done, messages, counter), user_id=i)
+
+    payload = {"type": "info", "title": "Benchmark", "message": "x" * 200, "data": {"n": 1}}
+
+    start = time.perf_counter()
+    for _ in range(messages):
+        await manager.broadcast(payload)
+    enqueued = time.perf_counter() - start
+
+    await asyncio.wait_for(done.wait(), timeout=120)
+    delivered = time.perf_counter() - start
+
+    for user_id, connections in list(manager.active_connections.items()):
+        for websocket in list(connections):
+            manager.disconnect(websocket, user_id)
+
+    return {
+        "sockets": sockets,
+        "slow_sockets": slow_count,
+        "messages": messages,
+        "enqueue_ms": round(enqueued * 1000, 2),
+        "fast_delivery_ms": round(delivered * 1000, 2),
+        "frames_per_sec": round(messages * (sockets - slow_count) / delivered),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sockets", default="100,1000,10000")
+    parser.add_argument("--slow", type=float, default=0.01, help="fraction of slow sockets")
+    parser.add_argument("--messages", type=int, default=5)
+    args = parser.parse_args()
+
+    # Silence per-connection prints from the manager
+    devnull = open(os.devnull, "w")
+    results = []
+    for sockets in [int(n) for n in args.sockets.split(",")]:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            results.append(asyncio.run(run(sockets, args.slow, args.messages)))
+        finally:
+            sys.stdout = stdout
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Rebuild the "frequently bought together" index from order history.
+Counts how often each pair of products shares a non-cancelled order and
+stores the top K partners per product in product_relations. Run from cron;
+running servers reload the index within an hour, or at once if the rebuild
+is queued through POST /api/admin/recommendations/rebuild (--queue).
+
+Usage: python scripts/build_related_products.py [--top-k 10] [--min-count 1]
+       [--max-basket 50] [--dry-run] [--queue]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base, engine, SessionLocal
+from app.jobs import enqueue_job, JOB_RELATED_PRODUCTS
+from app.recommendations import build_relations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--top-k", type=int, default=10, help="partners kept per product")
+    parser.add_argument("--min-count", type=int, default=1, help="orders a pair needs in common to count")
+    parser.add_argument("--max-basket", type=int, default=50, help="skip orders with more distinct products")
+    parser.add_argument("--dry-run", action="store_true", help="count and report without writing")
+    parser.add_argument("--queue", action="store_true", help="queue the rebuild for the server's job workers instead")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.queue:
+            enqueue_job(db, JOB_RELATED_PRODUCTS, {
+                "top_k": args.top_k, "min_count": args.min_count, "max_basket": args.max_basket
+            }, max_attempts=2)
+            db.commit()
+            print("✅ Rebuild queued")
+            return
+
+        stats = build_relations(db, top_k=args.top_k, min_count=args.min_count, max_basket=args.max_basket)
+        if args.dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    finally:
+        db.close()
+
+    print(json.dumps(stats, indent=2))
+    action = "Would store" if args.dry_run else "Stored"
+    print(f"✅ {action} {stats['relations']} relations for {stats['products']} products "
+          f"from {stats['lines']} order lines at {stats['lines_per_sec']} lines/sec")
+
+
+if __name__ == "__main__":
+    main()
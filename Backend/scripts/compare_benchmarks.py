@@ -0,0 +1,85 @@
+"""
+Compare two benchmark results (the JSON printed by load_test.py,
+bench_hot_paths.py or any bench_*.py script).
+It matches every latency (p50/p95/p99/mean, in ms or us) and throughput
+(*_per_sec) figure present in both files by its path, and reports the
+change in percent. A change counts as a regression if it is worse than
+--threshold: latency up, or throughput down. Exits 1 on any regression, so
+a CI job or a before/after check can gate on it.
+
+Usage: python scripts/load_test.py > before.json   (change code)   python scripts/load_test.py > after.json
+       python scripts/compare_benchmarks.py before.json after.json [--threshold 10]
+"""
+import argparse
+import json
+import re
+import sys
+
+LATENCY = re.compile(r"^(p\d+|mean)_(ms|us)$")
+THROUGHPUT = re.compile(r"_per_sec$")
+
+
+def figures(node, path: str = "") -> dict:
+    """path -> (value, higher_is_better) for every comparable number"""
+    found = {}
+    if isinstance(node, dict):
+        for key, value in node.items():
+            child = f"{path}.{key}" if path else key
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if LATENCY.search(key):
+                    found[child] = (value, False)
+                elif THROUGHPUT.search(key):
+                    found[child] = (value, True)
+            else:
+                found.update(figures(value, child))
+    elif isinstance(node, list):
+        for index, value in enumerate(node):
+            # bench_db_modes-style result lists: label entries by their mode/concurrency when present
+            label = "/".join(str(value[key]) for key in ("mode", "concurrency", "sockets") if isinstance(value, dict) and key in value)
+            found.update(figures(value, f"{path}[{label or index}]"))
+    return found
+
+
+def compare(before: dict, after: dict, threshold: float) -> dict:
+    old, new = figures(before), figures(after)
+    changes, regressions, improvements = {}, [], []
+    for path in old.keys() & new.keys():
+        (was, higher_is_better), (now, _) = old[path], new[path]
+        if not was:
+            continue
+        change = (now - was) / was * 100
+        changes[path] = {"before": was, "after": now, "change_percent": round(change, 2)}
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            regressions.append(path)
+        elif worse < -threshold:
+            improvements.append(path)
+    return {
+        "threshold_percent": threshold,
+        "compared": len(changes),
+        "regressions": sorted(regressions),
+        "improvements": sorted(improvements),
+        "changes": dict(sorted(changes.items()))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change treated as noise")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    result = compare(before, after, args.threshold)
+    print(json.dumps(result, indent=2))
+    if not result["compared"]:
+        print("⚠️  No comparable figures in common", file=sys.stderr)
+    sys.exit(1 if result["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
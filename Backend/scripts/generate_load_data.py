@@ -0,0 +1,273 @@
+"""
+Generate a synthetic dataset for benchmarks and load tests.
+Fills an empty (or scratch) database with categories, products, offers,
+users, order history, carts and the derived tables (sales counts, the
+purchase index and the related-products index). It writes with bulk
+inserts, so even the production scale takes under a minute. Output is
+deterministic for a given --seed, so runs on the same scale compare.
+
+Every generated user signs in with LOAD_TEST_PASSWORD. The admin is
+loadtest-admin@example.com and the customers are loadtest-user-<n>@example.com.
+
+Usage: python scripts/generate_load_data.py --database-url sqlite:///./loadtest.db
+       [--scale small|medium|production] [--users N] [--products N] [--orders N]
+       [--cart-lines N] [--seed 42]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, create_engine, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.auth import get_password_hash
+from app.database import Base
+from app.models import User, Category, Product, CartItem, Order, OrderItem, AdminOffer, UserPurchase
+from app.recommendations import build_relations
+
+LOAD_TEST_PASSWORD = "LoadTest123"
+ADMIN_EMAIL = "loadtest-admin@example.com"
+
+# Row counts per scale; production is roughly a year of trade for a busy store
+SCALES = {
+    "small": {"users": 200, "products": 300, "orders": 2000, "cart_lines": 500},
+    "medium": {"users": 2000, "products": 1500, "orders": 20000, "cart_lines": 5000},
+    "production": {"users": 20000, "products": 5000, "orders": 200000, "cart_lines": 50000},
+}
+
+CATEGORIES = [
+    "Interior Emulsions", "Exterior Emulsions", "Enamels", "Wood Finishes", "Primers",
+    "Putty", "Waterproofing", "Distempers", "Textures", "Metal Paints", "Tools", "Adhesives"
+]
+LINES = ["Royale", "Luxury", "Premium", "Classic", "Shield", "Ultima", "Calista", "One"]
+FINISHES = ["Matte", "Soft Sheen", "Gloss", "Satin"]
+COLOURS = ["White", "Ivory", "Sky Blue", "Sage", "Terracotta", "Charcoal", "Sunflower", "Coral"]
+SIZES = ["1L", "4L", "10L", "20L"]
+STATUSES = ["pending", "confirmed", "shipped", "delivered", "cancelled"]
+STATUS_WEIGHTS = [10, 15, 15, 55, 5]
+
+CHUNK = 5000  # orders generated and inserted per batch, so memory stays flat at any scale
+
+
+def user_email(n: int) -> str:
+    return f"loadtest-user-{n}@example.com"
+
+
+def skewed(rng: random.Random, n: int, power: float) -> int:
+    """Index in [0, n) with a long tail: a few popular items, many rare ones"""
+    return int(n * rng.random() ** power)
+
+
+def next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def generate(engine, users: int, products: int, orders: int, cart_lines: int, seed: int = 42) -> dict:
+    """Insert the dataset through `engine`; returns row counts and timing"""
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    counts = {}
+
+    with engine.begin() as conn:
+        if conn.execute(select(User.id).where(User.email == ADMIN_EMAIL)).first():
+            raise SystemExit(f"❌ {engine.url!r} already holds load test data; use a fresh database")
+
+        category_id = next_id(conn, Category)
+        category_ids = list(range(category_id, category_id + len(CATEGORIES)))
+        conn.execute(insert(Category), [
+            {"id": cid, "name": f"{name} (load test)", "slug": f"loadtest-{cid}", "display_order": i, "is_active": True}
+            for i, (cid, name) in enumerate(zip(category_ids, CATEGORIES))
+        ])
+
+        product_id = next_id(conn, Product)
+        catalogue = []
+        for i in range(products):
+            price = round(rng.uniform(80, 6000), 2)
+            size = rng.choice(SIZES)
+            catalogue.append({
+                "id": product_id + i,
+                "category_id": category_ids[skewed(rng, len(category_ids), 1.5)],
+                "name": f"{rng.choice(LINES)} {rng.choice(COLOURS)} {rng.choice(FINISHES)} {size} #{i}",
+                "description": "Synthetic product for load testing",
+                "price": price,
+                "original_price": round(price * rng.uniform(1.0, 1.4), 2) if rng.random() < 0.7 else None,
+                "stock": 1_000_000,
+                "size": size,
+                "finish": rng.choice(FINISHES),
+                "is_featured": rng.random() < 0.05,
+                "is_active": rng.random() < 0.97,
+                "views": 0,
+                "sales_count": 0,
+                "created_at": now - timedelta(days=rng.uniform(0, 730)),
+            })
+        conn.execute(insert(Product), catalogue)
+        # Orders and carts only reference products a customer could still buy
+        active = [product for product in catalogue if product["is_active"]]
+
+        conn.execute(insert(AdminOffer), [
+            {
+                "title": f"Load test offer {i}",
+                "discount_percent": rng.choice([5, 10, 15, 20]),
+                "valid_from": now - timedelta(days=30),
+                "valid_until": now + timedelta(days=365),
+                "is_active": True,
+                "category_id": category_ids[i % len(category_ids)] if i % 2 == 0 else None,
+                "product_id": active[skewed(rng, len(active), 2)]["id"] if i % 2 == 1 else None,
+                "size": rng.choice(SIZES) if i % 3 == 0 else None,
+                "min_quantity": rng.choice([1, 1, 2, 5]),
+            }
+            for i in range(20)
+        ])
+
+        password_hash = get_password_hash(LOAD_TEST_PASSWORD)
+        user_id = next_id(conn, User)
+        admin_id = user_id
+        customer_ids = list(range(user_id + 1, user_id + 1 + users))
+        conn.execute(insert(User), [
+            {"id": admin_id, "email": ADMIN_EMAIL, "hashed_password": password_hash, "full_name": "Load Test Admin",
+             "is_admin": True, "is_profile_complete": True, "points": 0, "created_at": now - timedelta(days=730)}
+        ] + [
+            {
+                "id": cid, "email": user_email(n), "hashed_password": password_hash, "full_name": f"Customer {n}",
+                "phone": f"9{n:09d}", "city": "Pune", "state": "Maharashtra", "pincode": "411001",
+                "is_admin": False, "is_profile_complete": True, "points": 0,
+                "created_at": now - timedelta(days=rng.uniform(0, 730)),
+            }
+            for n, cid in enumerate(customer_ids)
+        ])
+
+        order_id = next_id(conn, Order)
+        item_id = first_item_id = next_id(conn, OrderItem)
+        sales = {}
+        # (user, product, size) -> [order_count, total_quantity, last_quantity, last_order_id, last_ordered_at]
+        purchases = {}
+        span = timedelta(days=365) / max(orders, 1)
+        first_order_at = now - timedelta(days=365)
+
+        for chunk_start in range(0, orders, CHUNK):
+            order_rows, item_rows = [], []
+            for n in range(chunk_start, min(chunk_start + CHUNK, orders)):
+                oid = order_id + n
+                uid = customer_ids[skewed(rng, len(customer_ids), 2)]
+                ordered_at = first_order_at + span * n
+                lines, bought = {}, []
+                for _ in range(rng.choice([1, 1, 2, 2, 3, 4, 6])):
+                    product = active[skewed(rng, len(active), 3)]
+                    lines[product["id"]] = (product, rng.choice([1, 1, 1, 2, 4]))
+                total = original = 0.0
+                for product, quantity in lines.values():
+                    original_price = product["original_price"] or product["price"]
+                    total += product["price"] * quantity
+                    original += original_price * quantity
+                    item_rows.append({
+                        "id": item_id, "order_id": oid, "product_id": product["id"], "product_name": product["name"],
+                        "quantity": quantity, "price_at_purchase": product["price"], "original_price": original_price,
+                        "discount_percent": int((original_price - product["price"]) / original_price * 100),
+                        "size_ordered": product["size"]
+                    })
+                    item_id += 1
+                    sales[product["id"]] = sales.get(product["id"], 0) + quantity
+                    bought.append((product, quantity))
+                status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+                # The purchase index leaves out cancelled orders, as the app does
+                if status != "cancelled":
+                    for product, quantity in bought:
+                        row = purchases.setdefault((uid, product["id"], product["size"]), [0, 0, 0, None, None])
+                        row[0] += 1
+                        row[1] += quantity
+                        row[2:] = [quantity, oid, ordered_at]
+                order_rows.append({
+                    "id": oid, "user_id": uid, "order_number": f"LT{oid:08d}",
+                    "total_amount": round(total, 2), "original_amount": round(original, 2),
+                    "discount_amount": round(original - total, 2),
+                    "status": status,
+                    "delivery_address": "1 Load Test Road", "delivery_city": "Pune", "delivery_state": "Maharashtra",
+                    "delivery_pincode": "411001", "delivery_phone": "9000000000",
+                    "order_date": ordered_at.strftime('%d-%m-%Y'), "order_time": ordered_at.strftime('%I:%M %p'),
+                    "order_day": ordered_at.strftime('%A'), "points_earned": 0, "created_at": ordered_at,
+                })
+            conn.execute(insert(Order), order_rows)
+            conn.execute(insert(OrderItem), item_rows)
+
+        if sales:
+            conn.execute(
+                update(Product).where(Product.id == bindparam("b_id")).values(sales_count=bindparam("b_sales")),
+                [{"b_id": pid, "b_sales": quantity} for pid, quantity in sales.items()]
+            )
+        if purchases:
+            conn.execute(insert(UserPurchase), [
+                {
+                    "user_id": uid, "product_id": pid, "size": size, "order_count": row[0], "total_quantity": row[1],
+                    "last_quantity": row[2], "last_order_id": row[3], "last_ordered_at": row[4]
+                }
+                for (uid, pid, size), row in purchases.items()
+            ])
+
+        cart = set()
+        for _ in range(min(cart_lines, len(customer_ids) * len(active))):
+            while True:
+                key = (customer_ids[skewed(rng, len(customer_ids), 1.5)], active[skewed(rng, len(active), 2)]["id"])
+                if key not in cart:
+                    cart.add(key)
+                    break
+        if cart:
+            conn.execute(insert(CartItem), [
+                {"user_id": uid, "product_id": pid, "quantity": rng.choice([1, 1, 2, 3]), "created_at": now}
+                for uid, pid in sorted(cart)
+            ])
+
+        if engine.dialect.name == "postgresql":
+            # Explicit ids leave the serial sequences behind; move them past the new rows
+            for model in (Category, Product, User, Order, OrderItem):
+                table = model.__tablename__
+                conn.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))")
+
+        counts.update({
+            "categories": len(category_ids),
+            "products": products,
+            "offers": 20,
+            "users": users + 1,
+            "orders": orders,
+            "order_items": item_id - first_item_id,
+            "cart_lines": len(cart),
+            "user_purchases": len(purchases),
+        })
+
+    with Session(engine) as db:
+        relations = build_relations(db)
+        db.commit()
+    counts["product_relations"] = relations["relations"]
+    counts["seconds"] = round(time.perf_counter() - started, 2)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="target database; must not already hold load test data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--users", type=int, help="overrides the scale")
+    parser.add_argument("--products", type=int, help="overrides the scale")
+    parser.add_argument("--orders", type=int, help="overrides the scale")
+    parser.add_argument("--cart-lines", type=int, help="overrides the scale")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sizes = {key: getattr(args, key) if getattr(args, key) is not None else value for key, value in SCALES[args.scale].items()}
+    engine = create_engine(args.database_url)
+    try:
+        Base.metadata.create_all(bind=engine)
+        counts = generate(engine, seed=args.seed, **sizes)
+    finally:
+        engine.dispose()
+    print(json.dumps({"database": engine.url.get_backend_name(), "scale": args.scale, "seed": args.seed, "rows": counts}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
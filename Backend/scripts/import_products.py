@@ -0,0 +1,66 @@
+"""
+Bulk import products from a CSV, JSON Lines or JSON file.
+Rows are upserted by category + name + size in a single transaction, so the
+shop never shows a partial catalogue. Columns: name, category (slug or name)
+or category_id, and optionally description, price, original_price, stock,
+image_path, size, color, finish, is_featured, is_active.
+
+Usage: python scripts/import_products.py catalogue.csv [--format csv|jsonl|json]
+       [--replace] [--dry-run] [--skip-invalid] [--batch-size 500]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import Base, engine
+from app.catalog import CatalogImport, import_format, load_categories, IMPORT_FORMATS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IMPORT_FORMATS)
+    parser.add_argument("--replace", action="store_true", help="deactivate products of the imported categories missing from the file")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--skip-invalid", action="store_true", help="import the valid rows even if some are invalid")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    fmt = args.format or import_format(filename=args.path)
+    if not fmt:
+        parser.error("cannot tell the format from the file name, pass --format")
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        catalog_import = CatalogImport(load_categories(conn), batch_size=args.batch_size)
+    with open(args.path, encoding="utf-8-sig", newline="") as stream:
+        catalog_import.read(stream, fmt)
+
+    if catalog_import.invalid and not args.skip_invalid:
+        print(json.dumps(catalog_import.summary(), indent=2))
+        print(f"❌ {catalog_import.invalid} invalid rows, nothing imported")
+        sys.exit(1)
+
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            applied = catalog_import.apply(conn, replace=args.replace)
+            # apply() rejects rows for new products without a price
+            if catalog_import.invalid and not args.skip_invalid:
+                transaction.rollback()
+                print(json.dumps(catalog_import.summary(), indent=2))
+                print(f"❌ {catalog_import.invalid} invalid rows, nothing imported")
+                sys.exit(1)
+            if args.dry_run:
+                transaction.rollback()
+
+    summary = catalog_import.summary(applied)
+    print(json.dumps(summary, indent=2))
+    action = "Would import" if args.dry_run else "Imported"
+    print(f"✅ {action} {summary['valid']} products at {summary['rows_per_sec']} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
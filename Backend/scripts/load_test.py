@@ -0,0 +1,370 @@
+"""
+Scenario load test against a real uvicorn server.
+By default it generates a dataset (scripts/generate_load_data.py) into a
+scratch SQLite file, starts uvicorn on it with the rate limit off, and runs
+each scenario in turn. Every virtual user loops the scenario's steps as one
+signed-in customer, or as the admin for admin_dashboard:
+- browse: categories, category listing, search, product page, related, popular
+- cart: add, view, change quantity, summary, remove
+- checkout: add two lines, summary, place the order, view it
+- admin_dashboard: stats, orders, customers, sales and product analytics
+Requests in the warm-up are not recorded. For every scenario and step it
+reports p50/p95/p99 latency, throughput and errors as JSON (progress goes
+to stderr). Compare two runs with scripts/compare_benchmarks.py.
+
+The load generator is one Python process. If its CPU use (client_cpu_percent)
+nears 100%, the client is the bottleneck and throughput understates the
+server.
+
+Usage: python scripts/load_test.py [--scale small|medium|production] [--workers 2]
+       [--scenarios browse,cart,checkout,admin_dashboard] [--duration 20] [--warmup 3]
+       [--concurrency 20] [--admin-concurrency 2] [--database-url URL] [--keep-database]
+       python scripts/load_test.py --base-url http://127.0.0.1:8000   (server seeded by generate_load_data.py,
+                                                                      started with RATE_LIMIT_PER_MINUTE=0)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+import httpx
+from sqlalchemy import create_engine
+
+from generate_load_data import SCALES, LOAD_TEST_PASSWORD, ADMIN_EMAIL, generate, user_email
+from app.database import Base
+
+SEARCH_TERMS = ["Royale", "Matte", "Sage", "Gloss 4L", "Shield White", "Ultima"]
+DELIVERY = {
+    "delivery_address": "1 Load Test Road", "delivery_city": "Pune", "delivery_state": "Maharashtra",
+    "delivery_pincode": "411001", "delivery_phone": "9000000000"
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default="browse,cart,checkout,admin_dashboard")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unrecorded seconds before each scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual customers")
+    parser.add_argument("--admin-concurrency", type=int, default=2, help="virtual admins for admin_dashboard")
+    parser.add_argument("--base-url", default=None, help="test a running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn workers for the local server")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--keep-database", action="store_true", help="reuse --database-url as already seeded")
+    return parser.parse_args()
+
+
+class IterationFailed(Exception):
+    """A step failed; the virtual user abandons this iteration and starts the next"""
+
+
+class Recorder:
+    """Latencies and errors per step, counted only inside the measured window"""
+
+    def __init__(self, measure_from: float, measure_until: float):
+        self.measure_from = measure_from
+        self.measure_until = measure_until
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = []
+        self.iterations = 0
+        self.finished_at = measure_from
+
+    def counts(self, started: float) -> bool:
+        return self.measure_from <= started < self.measure_until
+
+    def record(self, step: str, started: float, finished: float):
+        if self.counts(started):
+            self.latencies[step].append(finished - started)
+            self.finished_at = max(self.finished_at, finished)
+
+    def error(self, step: str, started: float, detail: str):
+        if self.counts(started):
+            self.errors[step] += 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(f"{step}: {detail}")
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, token: str, catalogue: dict, rng: random.Random):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.catalogue = catalogue
+        self.rng = rng
+        self.recorder = None
+
+    def product(self) -> dict:
+        # Listing order is most popular first; favour the head like real traffic does
+        products = self.catalogue["products"]
+        return products[int(len(products) * self.rng.random() ** 2)]
+
+    async def call(self, step: str, method: str, path: str, body: dict = None):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, json=body, headers=self.headers)
+        except httpx.HTTPError as e:
+            self.recorder.error(step, started, f"{type(e).__name__}: {e}")
+            raise IterationFailed()
+        finished = time.perf_counter()
+        if response.status_code >= 400:
+            self.recorder.error(step, started, f"HTTP {response.status_code} {response.text[:160]}")
+            raise IterationFailed()
+        self.recorder.record(step, started, finished)
+        return response.json() if response.content else None
+
+
+async def browse(user: VirtualUser):
+    product = user.product()
+    await user.call("categories", "GET", "/api/categories")
+    await user.call("category_listing", "GET", f"/api/products?category_id={user.rng.choice(user.catalogue['categories'])}&limit=20")
+    await user.call("search", "GET", f"/api/products?search={user.rng.choice(SEARCH_TERMS)}&sort_by=price_low&limit=20")
+    await user.call("product_page", "GET", f"/api/products/{product['id']}")
+    await user.call("related", "GET", f"/api/products/{product['id']}/related")
+    await user.call("popular", "GET", "/api/products/popular")
+
+
+async def cart(user: VirtualUser):
+    product = user.product()
+    line = await user.call("cart_add", "POST", "/api/cart", {"product_id": product["id"], "quantity": 1, "selected_size": product["size"]})
+    await user.call("cart_view", "GET", "/api/cart")
+    await user.call("cart_update", "PUT", f"/api/cart/{line['id']}", {"quantity": 2})
+    await user.call("cart_summary", "GET", "/api/cart/summary")
+    await user.call("cart_remove", "DELETE", f"/api/cart/{line['id']}")
+
+
+async def checkout(user: VirtualUser):
+    for product in (user.product(), user.product()):
+        await user.call("cart_add", "POST", "/api/cart", {"product_id": product["id"], "quantity": 1, "selected_size": product["size"]})
+    await user.call("cart_summary", "GET", "/api/cart/summary")
+    order = await user.call("place_order", "POST", "/api/orders", DELIVERY)
+    await user.call("order_detail", "GET", f"/api/orders/{order['id']}")
+
+
+async def admin_dashboard(user: VirtualUser):
+    await user.call("stats", "GET", "/api/admin/stats")
+    await user.call("orders", "GET", "/api/admin/orders?limit=50")
+    await user.call("customers", "GET", "/api/admin/customers")
+    await user.call("sales_analytics", "GET", "/api/admin/sales-analytics")
+    await user.call("product_analytics", "GET", "/api/admin/products/analytics")
+
+
+SCENARIOS = {"browse": browse, "cart": cart, "checkout": checkout, "admin_dashboard": admin_dashboard}
+
+
+def percentiles(latencies: list) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+
+    return {
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1] * 1000, 2)
+    }
+
+
+async def run_scenario(name: str, users: list, duration: float, warmup: float) -> dict:
+    scenario = SCENARIOS[name]
+    measure_from = time.perf_counter() + warmup
+    recorder = Recorder(measure_from, measure_from + duration)
+    for user in users:
+        user.recorder = recorder
+
+    async def loop(user: VirtualUser):
+        while time.perf_counter() < recorder.measure_until:
+            started = time.perf_counter()
+            try:
+                await scenario(user)
+            except IterationFailed:
+                continue
+            if recorder.counts(started):
+                recorder.iterations += 1
+
+    cpu_started = time.process_time()
+    await asyncio.gather(*(loop(user) for user in users))
+    cpu_seconds = time.process_time() - cpu_started
+    elapsed = max(recorder.finished_at - measure_from, 1e-9)
+
+    every = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    requests = len(every)
+    errors = sum(recorder.errors.values())
+    return {
+        "virtual_users": len(users),
+        "iterations": recorder.iterations,
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / (requests + errors), 4) if requests + errors else 0.0,
+        "requests_per_sec": round(requests / elapsed, 1),
+        "iterations_per_sec": round(recorder.iterations / elapsed, 2),
+        **percentiles(every),
+        "client_cpu_percent": round(cpu_seconds / (warmup + elapsed) * 100, 1),
+        "steps": {
+            step: {"requests": len(recorder.latencies[step]), "errors": recorder.errors[step], **percentiles(recorder.latencies[step])}
+            for step in sorted(set(recorder.latencies) | set(recorder.errors))
+        },
+        "error_samples": recorder.error_samples
+    }
+
+
+async def login(client: httpx.AsyncClient, email: str) -> str:
+    response = await client.post("/api/auth/login", json={"email": email, "password": LOAD_TEST_PASSWORD})
+    if response.status_code != 200:
+        raise SystemExit(f"❌ Login failed for {email}: HTTP {response.status_code} {response.text[:200]}")
+    return response.json()["access_token"]
+
+
+async def load_test(args, base_url: str, customers: int) -> dict:
+    names = args.scenarios.split(",")
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"❌ Unknown scenario(s): {', '.join(sorted(unknown))}; choose from {', '.join(SCENARIOS)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency + args.admin_concurrency, max_keepalive_connections=args.concurrency + args.admin_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        categories = (await client.get("/api/categories")).json()
+        products = (await client.get("/api/products?sort_by=popular&limit=100")).json()
+        if not categories or not products:
+            raise SystemExit("❌ The target has no categories or products; seed it with scripts/generate_load_data.py")
+        catalogue = {
+            "categories": [category["id"] for category in categories],
+            "products": [{"id": product["id"], "size": product["size"]} for product in products]
+        }
+
+        # Customers spread across the user range: low numbers are the heaviest buyers
+        emails = [user_email(i * customers // args.concurrency) for i in range(args.concurrency)]
+        tokens = await asyncio.gather(*(login(client, email) for email in emails))
+        admin_token = await login(client, ADMIN_EMAIL)
+        rng = random.Random(args.seed)
+        customers_pool = [VirtualUser(client, token, catalogue, random.Random(rng.random())) for token in tokens]
+        admins_pool = [VirtualUser(client, admin_token, catalogue, random.Random(rng.random())) for _ in range(args.admin_concurrency)]
+
+        results = {}
+        for name in names:
+            users = admins_pool if name == "admin_dashboard" else customers_pool
+            print(f"▶ {name}: {len(users)} virtual users, {args.warmup:g}s warm-up + {args.duration:g}s", file=sys.stderr)
+            results[name] = await run_scenario(name, users, args.duration, args.warmup)
+            summary = results[name]
+            print(
+                f"  {summary['requests_per_sec']} req/s, p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, "
+                f"p99 {summary['p99_ms']}ms, {summary['errors']} errors", file=sys.stderr
+            )
+            if summary["client_cpu_percent"] > 90:
+                print("  ⚠️  Load generator is CPU-bound; throughput understates the server", file=sys.stderr)
+        return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url: str, workers: int, workdir: str):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        RATE_LIMIT_PER_MINUTE="0",
+        WEB_CONCURRENCY=str(workers),
+        METRICS_DIR=os.path.join(workdir, "metrics"),
+    )
+    log = open(os.path.join(workdir, "server.log"), "w")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--no-access-log", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            log.close()
+            with open(log.name) as f:
+                raise SystemExit(f"❌ uvicorn exited with {server.returncode}:\n{f.read()[-2000:]}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                # /health answers as soon as one worker is up; give the rest a moment
+                time.sleep(1.0)
+                return server, log, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("❌ uvicorn did not become healthy within 60s")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    report = {"commit": git_commit(), "duration": args.duration, "warmup": args.warmup}
+    customers = SCALES[args.scale]["users"]
+
+    if args.base_url:
+        report.update({"target": args.base_url})
+        report["scenarios"] = asyncio.run(load_test(args, args.base_url, customers))
+        print(json.dumps(report, indent=2))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="kubti_load_")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    server = log = None
+    try:
+        engine = create_engine(database_url)
+        try:
+            if args.keep_database:
+                rows = None
+            else:
+                print(f"▶ Generating the {args.scale} dataset", file=sys.stderr)
+                Base.metadata.create_all(bind=engine)
+                rows = generate(engine, seed=args.seed, **SCALES[args.scale])
+        finally:
+            engine.dispose()
+
+        print(f"▶ Starting uvicorn with {args.workers} worker(s)", file=sys.stderr)
+        server, log, base_url = start_server(database_url, args.workers, workdir)
+        report.update({
+            "target": f"local uvicorn, {args.workers} worker(s)",
+            "database": engine.url.get_backend_name(),
+            "scale": args.scale,
+            "rows": rows,
+        })
+        report["scenarios"] = asyncio.run(load_test(args, base_url, customers))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            log.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import engine, get_db, SessionLocal
 from app.models import Base, Category, Product
+from app.catalog import CatalogImport, load_categories
 
 print("🚀 Populating Neon PostgreSQL database with ALL products...")
 
@@ -18,11 +19,6 @@ print("🚀 Populating Neon PostgreSQL database with ALL products...")
 db = SessionLocal()
 
 try:
-    # First, delete all existing products
-    deleted = db.query(Product).delete()
-    db.commit()
-    print(f"🗑️ Deleted {deleted} existing products")
-    
     # Create categories
     categories_data = [
         {"name": "All-wood Series", "slug": "all-wood-series", "description": "Premium wood coating solutions", "display_order": 1},
@@ -533,33 +529,37 @@ try:
         ("opus-style-series-oil-paint", opus_style_oil_paint_products),
     ]
 
-    total_added = 0
+    # Upsert by category + name + size in one transaction instead of deleting
+    # everything first, so the shop is never empty while this runs
+    rows = []
     for cat_slug, products in products_by_category:
-        category = categories.get(cat_slug)
-        if not category:
+        if cat_slug not in categories:
             print(f"⚠️ Category {cat_slug} not found, skipping...")
             continue
-            
-        print(f"\n📁 Adding products to {category.name}...")
         for product_data in products:
-            product = Product(
-                category_id=category.id,
-                name=product_data["name"],
-                description=product_data["description"],
-                image_path=product_data["image_path"],
-                size=product_data.get("size", "1L"),
-                finish=product_data.get("finish", ""),
-                stock=100,
-                price=0,
-                original_price=0,
-                is_active=True,
-                is_featured=True
-            )
-            db.add(product)
-            total_added += 1
-            print(f"  ✓ Added: {product_data['name']}")
+            rows.append({
+                "category": cat_slug,
+                "name": product_data["name"],
+                "description": product_data["description"],
+                "image_path": product_data["image_path"],
+                "size": product_data.get("size", "1L"),
+                "finish": product_data.get("finish", ""),
+                "stock": 100,
+                "price": 0,
+                "original_price": 0,
+                "is_active": True,
+                "is_featured": True
+            })
     
-    db.commit()
+    with engine.connect() as conn:
+        catalog_import = CatalogImport(load_categories(conn))
+    catalog_import.extend(rows)
+    for error in catalog_import.errors:
+        print(f"⚠️ Row {error['row']}: {error['error']}")
+    with engine.begin() as conn:
+        result = catalog_import.summary(catalog_import.apply(conn, replace=True))
+    print(f"\n📦 {result['inserted']} added, {result['updated']} updated, "
+          f"{result['unchanged']} unchanged, {result['deactivated']} deactivated")
 
     # Count total products
     total_products = db.query(Product).count()
@@ -568,7 +568,7 @@ try:
     print(f"\n✅ Database populated successfully!")
     print(f"📦 Total products: {total_products}")
     print(f"📁 Total categories: {total_categories}")
-    print(f"➕ Products added this run: {total_added}")
+    print(f"⚡ {result['rows_per_sec']} rows/sec")
 
 except Exception as e:
     print(f"❌ Error: {e}")
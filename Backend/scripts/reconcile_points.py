@@ -0,0 +1,44 @@
+"""
+Verify cached user point balances against the points ledger.
+Run periodically (e.g. nightly cron); pass --fix to rewrite mismatched balances.
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.points import reconcile_balances
+
+
+def main():
+    fix = "--fix" in sys.argv[1:]
+    db = SessionLocal()
+    try:
+        report = reconcile_balances(db, fix=fix)
+        if fix:
+            db.commit()
+    finally:
+        db.close()
+
+    print(f"Users checked: {report['users_checked']}, mismatched: {report['mismatch_count']}")
+    for mismatch in report["mismatches"]:
+        print(
+            f"  ⚠️  User {mismatch['user_id']}: cached={mismatch['cached_balance']} "
+            f"ledger={mismatch['ledger_balance']}"
+        )
+    if report["mismatch_count"] > len(report["mismatches"]):
+        print(f"  ... and {report['mismatch_count'] - len(report['mismatches'])} more")
+    for txn_id in report["unbalanced_transactions"]:
+        print(f"  ❌ Unbalanced transaction: {txn_id}")
+
+    if not report["mismatch_count"] and not report["unbalanced_transactions"]:
+        print("✅ All balances reconcile with the ledger")
+        return 0
+    if report["fixed"]:
+        print("✅ Mismatched balances rewritten from the ledger")
+    return 1 if report["unbalanced_transactions"] or not fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
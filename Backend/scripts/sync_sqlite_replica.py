@@ -0,0 +1,53 @@
+"""
+Keep a local SQLite "replica" in step with the primary database file.
+Copies the primary with SQLite's online backup API every --interval seconds,
+so DATABASE_REPLICA_URLS can be tried out without a PostgreSQL replica.
+The replicated heartbeat row tells the app how far behind the copy is.
+
+Usage: python scripts/sync_sqlite_replica.py --primary kubti_hardware.db --replica replica.db
+       [--interval 2] [--once]
+"""
+import argparse
+import sqlite3
+import time
+
+
+def sqlite_path(value: str) -> str:
+    """Accept either a file path or a sqlite:/// URL"""
+    return value.split(":///", 1)[1] if value.startswith("sqlite") else value
+
+
+def sync(primary: str, replica: str):
+    source = sqlite3.connect(primary)
+    target = sqlite3.connect(replica, timeout=5)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--primary", required=True)
+    parser.add_argument("--replica", required=True)
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+
+    primary, replica = sqlite_path(args.primary), sqlite_path(args.replica)
+    while True:
+        started = time.perf_counter()
+        try:
+            sync(primary, replica)
+            print(f"✅ Replica synced in {(time.perf_counter() - started) * 1000:.1f} ms")
+        except sqlite3.Error as e:
+            # Usually the replica is busy serving reads; try again next tick
+            print(f"⚠️  Replica sync skipped: {e}")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Shared test setup: one scratch SQLite database, set before app.database
+creates its engines, with a fresh schema for every test module.
+
+Run from Backend/: python -m pytest tests
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+
+import pytest
+
+from app.main import app  # noqa: F401 - registers every model on Base
+from app.database import Base, engine
+from app.profiler import query_budget as budget
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def query_budget():
+    """app.profiler.query_budget: `with query_budget(3) as profile:` fails past 3 statements"""
+    return budget
@@ -0,0 +1,50 @@
+"""
+GET /api/admin/orders date filters: a bare date_to includes the whole day,
+a date_to with a time is an exact upper bound.
+"""
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.main import app
+from app.database import SessionLocal
+from app.models import User, Order
+
+PLACED = [datetime(2026, 10, 18, 23, 30), datetime(2026, 10, 19, 0, 0), datetime(2026, 10, 19, 18, 45),
+          datetime(2026, 10, 20, 0, 0)]
+
+
+@pytest.fixture(scope="module")
+def client():
+    db = SessionLocal()
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", is_admin=True)
+    db.add(admin)
+    db.flush()
+    db.add_all([
+        Order(user_id=admin.id, order_number=f"ORD{n}", total_amount=100, original_amount=100, discount_amount=0,
+              delivery_address="x", created_at=placed)
+        for n, placed in enumerate(PLACED)
+    ])
+    db.commit()
+    db.close()
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'admin@example.com'})}"
+    return client
+
+
+def order_numbers(client, **params) -> list:
+    response = client.get("/api/admin/orders", params={"sort": "oldest", **params})
+    assert response.status_code == 200, response.text
+    return [order["order_number"] for order in response.json()["orders"]]
+
+
+def test_bare_date_to_includes_that_day(client):
+    assert order_numbers(client, date_to="2026-10-19") == ["ORD0", "ORD1", "ORD2"]
+    assert order_numbers(client, date_from="2026-10-19", date_to="2026-10-19") == ["ORD1", "ORD2"]
+
+
+def test_date_to_with_time_is_exact(client):
+    assert order_numbers(client, date_to="2026-10-19T00:00:00") == ["ORD0", "ORD1"]
+    assert order_numbers(client, date_to="2026-10-19T18:45:00") == ["ORD0", "ORD1", "ORD2"]
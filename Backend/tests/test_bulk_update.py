@@ -0,0 +1,93 @@
+"""
+POST /api/admin/products/bulk-update: explicit nulls for required product
+columns are rejected with a 400 naming the row, and nothing is written.
+
+Run from Backend/: python -m pytest tests
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.main import app
+from app.database import SessionLocal
+from app.models import User, Category, Product
+
+
+@pytest.fixture(scope="module")
+def client():
+    db = SessionLocal()
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", is_admin=True)
+    category = Category(name="Emulsions", slug="emulsions")
+    db.add_all([admin, category])
+    db.flush()
+    db.add_all([
+        Product(id=1, category_id=category.id, name="Royale 4L", price=900, stock=10, is_active=True),
+        Product(id=2, category_id=category.id, name="Royale 20L", price=4000, stock=5, is_active=True),
+    ])
+    db.commit()
+    db.close()
+    # No lifespan: writes run inline on the async engine
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'admin@example.com'})}"
+    return client
+
+
+def product(product_id: int) -> Product:
+    db = SessionLocal()
+    try:
+        return db.get(Product, product_id)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("field", ["price", "name", "stock", "is_active"])
+def test_null_in_update_row_is_rejected(client, field):
+    response = client.post("/api/admin/products/bulk-update", json={
+        "updates": [{"id": 1, "price": 950}, {"id": 2, field: None}]
+    })
+
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert detail["row"] == 1
+    assert detail["id"] == 2
+    assert detail["fields"] == [field]
+    # The valid row in the same request is not written either
+    assert product(1).price == 900
+
+
+def test_null_in_filter_patch_is_rejected(client):
+    response = client.post("/api/admin/products/bulk-update", json={
+        "filter": {"ids": [1, 2]}, "patch": {"price": None}
+    })
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["fields"] == ["price"]
+    assert product(2).price == 4000
+
+
+def test_nullable_fields_can_be_cleared(client):
+    response = client.post("/api/admin/products/bulk-update", json={
+        "updates": [{"id": 1, "description": None, "stock": 12}]
+    })
+
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+    assert product(1).stock == 12
+
+
+def test_patch_price_with_percent_change_is_rejected(client):
+    response = client.post("/api/admin/products/bulk-update", json={
+        "filter": {"ids": [2]}, "patch": {"price": 5000}, "price_change_percent": 10
+    })
+
+    assert response.status_code == 400
+    assert product(2).price == 4000
+
+
+def test_percent_change_with_other_patch_fields(client):
+    response = client.post("/api/admin/products/bulk-update", json={
+        "filter": {"ids": [2]}, "patch": {"stock": 7}, "price_change_percent": 10
+    })
+
+    assert response.status_code == 200
+    assert (product(2).price, product(2).stock) == (4400, 7)
@@ -0,0 +1,81 @@
+"""
+DatabaseBus: ids keep growing after the table is pruned empty, so workers
+tailing by id still deliver later messages.
+"""
+import asyncio
+
+from sqlalchemy import select, func
+
+from app.bus import DatabaseBus
+from app.database import SessionLocal
+from app.models import BusMessage
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out waiting for delivery"
+        await asyncio.sleep(0.01)
+
+
+def bus_rows() -> int:
+    db = SessionLocal()
+    try:
+        return db.execute(select(func.count(BusMessage.id))).scalar()
+    finally:
+        db.close()
+
+
+def test_messages_published_after_a_prune_are_delivered():
+    async def scenario():
+        received = []
+        bus = DatabaseBus(poll_interval=0.01)
+
+        async def handler(data):
+            received.append(data["n"])
+
+        bus.subscribe("test", handler)
+        await bus.start()
+        try:
+            for n in range(5):
+                await bus.publish("test", {"n": n})
+            await wait_for(lambda: len(received) == 5)
+
+            # Everything is past retention now: prune as the poll loop would
+            bus.retention = 0
+            bus._prune()
+            assert bus_rows() <= 1
+
+            await bus.publish("test", {"n": 5})
+            await wait_for(lambda: len(received) == 6)
+        finally:
+            await bus.stop()
+        assert received == [0, 1, 2, 3, 4, 5]
+
+    asyncio.run(scenario())
+
+
+def test_worker_started_after_a_prune_sees_new_messages():
+    async def scenario():
+        first = DatabaseBus(poll_interval=0.01)
+        await first.start()
+        await first.publish("test", {"n": 0})
+        first.retention = 0
+        first._prune()
+        await first.stop()
+
+        received = []
+        second = DatabaseBus(poll_interval=0.01)
+
+        async def handler(data):
+            received.append(data["n"])
+
+        second.subscribe("test", handler)
+        await second.start()
+        try:
+            await second.publish("test", {"n": 1})
+            await wait_for(lambda: received == [1])
+        finally:
+            await second.stop()
+
+    asyncio.run(scenario())
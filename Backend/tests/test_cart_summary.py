@@ -0,0 +1,86 @@
+"""
+GET /api/cart/summary: cached per user under users.cart_version, so a hit
+costs no query beyond authentication and a cart write on any worker is seen
+by the next request.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.carts import cart_summary_cache
+from app.database import SessionLocal, engine
+from app.main import app, apply_cart_operations
+from app.models import User, Category, Product
+from app.schemas import CartBatchOperation
+
+
+@pytest.fixture(scope="module")
+def shopper():
+    db = SessionLocal()
+    user = User(email="shopper@example.com", hashed_password="x", full_name="Shopper")
+    category = Category(name="Emulsions", slug="emulsions")
+    db.add_all([user, category])
+    db.flush()
+    products = [
+        Product(category_id=category.id, name=f"Royale {size}", price=price, stock=20, size=size, is_active=True)
+        for size, price in (("1L", 250), ("4L", 900))
+    ]
+    db.add_all(products)
+    db.commit()
+    ids = {"user_id": user.id, "products": [product.id for product in products]}
+    db.close()
+
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'shopper@example.com'})}"
+    return client, ids
+
+
+def test_cached_summary_costs_only_authentication(shopper, query_budget):
+    client, ids = shopper
+    added = client.post("/api/cart", json={"product_id": ids["products"][0], "quantity": 2})
+    assert added.status_code == 201
+    first = client.get("/api/cart/summary").json()
+    assert first["total_quantity"] == 2
+
+    hits = cart_summary_cache.hits
+    with query_budget(1):
+        second = client.get("/api/cart/summary").json()
+    assert cart_summary_cache.hits == hits + 1
+    assert second == first
+
+
+def test_cart_write_on_another_worker_is_seen(shopper):
+    client, ids = shopper
+    client.get("/api/cart/summary")
+
+    # What a cart write job on another worker does: no message reaches this process
+    operations = [CartBatchOperation(op="add", product_id=ids["products"][1], quantity=3)]
+    with engine.begin() as conn:
+        apply_cart_operations(conn, ids["user_id"], operations)
+
+    summary = client.get("/api/cart/summary").json()
+    assert (summary["item_count"], summary["total_quantity"]) == (2, 5)
+
+
+def test_every_cart_endpoint_bumps_the_version(shopper):
+    client, ids = shopper
+
+    def version() -> int:
+        db = SessionLocal()
+        try:
+            return db.get(User, ids["user_id"]).cart_version
+        finally:
+            db.close()
+
+    line = client.get("/api/cart").json()[0]
+    steps = [
+        lambda: client.post("/api/cart", json={"product_id": ids["products"][0], "quantity": 1}),
+        lambda: client.put(f"/api/cart/{line['id']}", json={"quantity": 4}),
+        lambda: client.post("/api/cart/batch", json={"operations": [{"op": "remove", "product_id": ids["products"][1]}]}),
+        lambda: client.delete(f"/api/cart/{line['id']}"),
+        lambda: client.delete("/api/cart"),
+    ]
+    for step in steps:
+        before = version()
+        assert step().is_success
+        assert version() > before
@@ -0,0 +1,82 @@
+"""
+POST /api/admin/products/import: a row for a new product must carry a price;
+rows that only update an existing product may leave it out.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.auth import create_access_token
+from app.main import app
+from app.database import SessionLocal
+from app.models import User, Category, Product
+
+
+@pytest.fixture(scope="module")
+def client():
+    db = SessionLocal()
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", is_admin=True)
+    category = Category(name="Emulsions", slug="emulsions")
+    db.add_all([admin, category])
+    db.flush()
+    db.add(Product(category_id=category.id, name="Tractor", price=450, stock=10, size="4L"))
+    db.commit()
+    db.close()
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'admin@example.com'})}"
+    return client
+
+
+def products() -> dict:
+    db = SessionLocal()
+    try:
+        return {product.name: product for product in db.execute(select(Product)).scalars()}
+    finally:
+        db.close()
+
+
+def import_csv(client, body: str, **params):
+    return client.post("/api/admin/products/import", content=body, params=params, headers={"Content-Type": "text/csv"})
+
+
+def test_new_product_without_price_aborts_the_import(client):
+    response = import_csv(client, "name,category,size,stock\nTractor,emulsions,4L,20\nRoyale,emulsions,4L,5\n")
+
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert detail["invalid"] == 1
+    assert detail["errors"] == [{"row": 2, "error": "price: required for a new product"}]
+    # The valid update in the same file is rolled back too
+    assert "Royale" not in products()
+    assert products()["Tractor"].stock == 10
+
+
+def test_empty_price_cell_counts_as_missing(client):
+    response = import_csv(client, "name,category,size,price\nRoyale,emulsions,4L,\n", dry_run="true")
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["errors"][0]["error"] == "price: required for a new product"
+
+
+def test_skip_invalid_imports_the_rest(client):
+    response = import_csv(
+        client, "name,category,size,stock\nTractor,emulsions,4L,20\nRoyale,emulsions,4L,5\n", skip_invalid="true"
+    )
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert (summary["invalid"], summary["inserted"], summary["updated"]) == (1, 0, 1)
+    catalogue = products()
+    assert "Royale" not in catalogue
+    # Updates may leave the price out: it keeps its current value
+    assert (catalogue["Tractor"].price, catalogue["Tractor"].stock) == (450, 20)
+
+
+def test_null_price_is_invalid(client):
+    response = client.post("/api/admin/products/import", json=[
+        {"name": "Tractor", "category": "emulsions", "size": "4L", "price": None}
+    ])
+
+    assert response.status_code == 400
+    assert response.json()["detail"]["errors"] == [{"row": 1, "error": "price: cannot be null"}]
+    assert products()["Tractor"].price == 450
@@ -0,0 +1,85 @@
+"""
+Order serialization runs a fixed number of statements: orders, their items,
+then their products' images, each one query however many orders there are.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.database import SessionLocal, AsyncSessionLocal, async_engine
+from app.models import User, Category, Product, Order, OrderItem
+from app.schemas import OrderResponse
+from app.main import order_items_eager
+
+ORDERS = 300
+ITEMS = 3
+STATEMENTS = 3
+
+
+@pytest.fixture(scope="module")
+def user_id() -> int:
+    db = SessionLocal()
+    try:
+        category = Category(name="Check", slug="check")
+        db.add(category)
+        db.flush()
+        products = [
+            Product(category_id=category.id, name=f"Paint {i}", price=100, stock=10, image_path=f"paint_{i}.png")
+            for i in range(50)
+        ]
+        db.add_all(products)
+        user = User(email="orders@example.com", hashed_password="x", full_name="Orders")
+        db.add(user)
+        db.flush()
+        for n in range(ORDERS):
+            order = Order(
+                user_id=user.id, order_number=f"ORD{n}", total_amount=300, original_amount=300,
+                discount_amount=0, delivery_address="x"
+            )
+            db.add(order)
+            db.flush()
+            db.add_all([
+                OrderItem(
+                    order_id=order.id, product_id=products[(n + i) % len(products)].id, product_name="Paint",
+                    quantity=1, price_at_purchase=100, original_price=100
+                )
+                for i in range(ITEMS)
+            ])
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def assert_serialized(orders):
+    serialized = [OrderResponse.model_validate(order) for order in orders]
+    assert len(serialized) == ORDERS
+    assert all(item.product_image for order in serialized for item in order.order_items)
+
+
+def test_sync_session_loads_orders_in_fixed_statements(user_id, query_budget):
+    db = SessionLocal()
+    try:
+        with query_budget(STATEMENTS) as profile:
+            orders = db.query(Order).options(order_items_eager()).filter(Order.user_id == user_id).all()
+            assert_serialized(orders)
+    finally:
+        db.close()
+    assert profile.count == STATEMENTS
+
+
+def test_async_session_loads_orders_in_fixed_statements(user_id, query_budget):
+    async def load():
+        try:
+            async with AsyncSessionLocal() as db:
+                with query_budget(STATEMENTS) as profile:
+                    orders = (await db.execute(
+                        select(Order).options(order_items_eager()).where(Order.user_id == user_id)
+                    )).scalars().all()
+                    assert_serialized(orders)
+            return profile
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(load()).count == STATEMENTS
@@ -0,0 +1,61 @@
+"""
+reconcile_balances(): a fixed number of statements however many balances
+are wrong, a capped sample in the report, and fix=True rewrites every
+mismatched cache from the ledger.
+"""
+import pytest
+from sqlalchemy import update
+
+from app.database import SessionLocal
+from app.models import User
+from app.points import post_points, reconcile_balances, REASON_ADJUSTMENT
+
+USERS = 30
+CORRUPTED = 12
+
+
+@pytest.fixture(scope="module")
+def user_ids():
+    db = SessionLocal()
+    try:
+        users = [User(email=f"member{n}@example.com", hashed_password="x", points=0) for n in range(USERS)]
+        db.add_all(users)
+        db.flush()
+        for n, user in enumerate(users):
+            post_points(db, user.id, 10 + n, REASON_ADJUSTMENT)
+        # Drift the cached balance of some users away from their ledger
+        for user in users[:CORRUPTED]:
+            db.execute(update(User).where(User.id == user.id).values(points=999))
+        db.commit()
+        return [user.id for user in users]
+    finally:
+        db.close()
+
+
+def test_report_counts_all_and_samples_some(user_ids, query_budget):
+    db = SessionLocal()
+    try:
+        with query_budget(4):
+            report = reconcile_balances(db, sample_limit=5)
+    finally:
+        db.close()
+
+    assert report["mismatch_count"] == CORRUPTED
+    assert [m["user_id"] for m in report["mismatches"]] == user_ids[:5]
+    assert report["mismatches"][0] == {"user_id": user_ids[0], "cached_balance": 999, "ledger_balance": 10}
+    assert not report["fixed"]
+
+
+def test_fix_rewrites_every_mismatch_in_one_update(user_ids, query_budget):
+    db = SessionLocal()
+    try:
+        with query_budget(5):
+            report = reconcile_balances(db, fix=True, sample_limit=5)
+        db.commit()
+        assert report["fixed"] and report["mismatch_count"] == CORRUPTED
+
+        assert reconcile_balances(db)["mismatch_count"] == 0
+        balances = dict(db.query(User.id, User.points).filter(User.id.in_(user_ids)).all())
+        assert [balances[user_id] for user_id in user_ids] == [10 + n for n in range(USERS)]
+    finally:
+        db.close()
@@ -0,0 +1,90 @@
+"""
+Per-endpoint query budgets for the endpoints that have regressed into N+1
+patterns before (cart, categories, orders, admin customers and analytics).
+Each request through the full app must stay within its statement budget and
+repeat no statement shape more than MAX_REPEATS times; budgets must not
+depend on data size.
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth import create_access_token
+from app.database import SessionLocal
+from app.models import User, Category, Product, CartItem, Order, OrderItem
+from app.main import app
+
+ORDERS = 40
+PRODUCTS = 30
+MAX_REPEATS = 3
+
+# (path, budget): statements per request, including authentication
+BUDGETS = [
+    ("/api/categories", 2),
+    ("/api/products?limit=50", 2),
+    ("/api/cart", 3),
+    ("/api/orders", 4),
+    ("/api/orders/{order_id}", 4),
+    ("/api/admin/orders?limit=50", 5),
+    ("/api/admin/orders/{order_id}", 4),
+    ("/api/admin/customers", 3),
+    ("/api/admin/customers/{customer_id}", 5),
+    ("/api/admin/products/analytics", 4),
+]
+
+
+@pytest.fixture(scope="module")
+def seeded() -> dict:
+    db = SessionLocal()
+    try:
+        categories = [Category(name=f"Range {i}", slug=f"range-{i}") for i in range(5)]
+        db.add_all(categories)
+        db.flush()
+        catalogue = [
+            Product(category_id=categories[i % len(categories)].id, name=f"Paint {i}", price=100 + i,
+                    original_price=150, stock=1000, size="4L")
+            for i in range(PRODUCTS)
+        ]
+        db.add_all(catalogue)
+        admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", is_admin=True)
+        customer = User(email="buyer@example.com", hashed_password="x", full_name="Buyer")
+        db.add_all([admin, customer])
+        db.flush()
+        db.add_all([
+            CartItem(user_id=customer.id, product_id=product.id, quantity=1)
+            for product in catalogue[:10]
+        ])
+        for n in range(ORDERS):
+            order = Order(
+                user_id=customer.id, order_number=f"ORD{n}", total_amount=300, original_amount=300,
+                discount_amount=0, delivery_address="x"
+            )
+            db.add(order)
+            db.flush()
+            db.add_all([
+                OrderItem(
+                    order_id=order.id, product_id=catalogue[(n + i) % len(catalogue)].id, product_name="Paint",
+                    quantity=1, price_at_purchase=100, original_price=100, size_ordered="4L"
+                )
+                for i in range(3)
+            ])
+        db.commit()
+        return {
+            "admin": create_access_token({"sub": admin.email}),
+            "customer": create_access_token({"sub": customer.email}),
+            "customer_id": customer.id,
+            "order_id": order.id
+        }
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("path,budget", BUDGETS, ids=[path for path, _ in BUDGETS])
+def test_endpoint_within_query_budget(seeded, query_budget, path, budget):
+    # No lifespan: background tasks stay off and writes run inline, so every statement belongs to the request
+    client = TestClient(app)
+    token = seeded["admin"] if path.startswith("/api/admin") else seeded["customer"]
+
+    with query_budget(budget, max_repeats=MAX_REPEATS):
+        response = client.get(path.format(**seeded), headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200, response.text[:200]
@@ -26,6 +26,9 @@ export default function AdminDashboardScreen({ navigation }) {
   const [refreshing, setRefreshing] = useState(false);
   const [stats, setStats] = useState(null);
   const [orders, setOrders] = useState([]);
+  const [ordersTotal, setOrdersTotal] = useState(0);
+  const [ordersCursor, setOrdersCursor] = useState(null);
+  const [loadingMoreOrders, setLoadingMoreOrders] = useState(false);
   const [users, setUsers] = useState([]);
   const [productAnalytics, setProductAnalytics] = useState([]);
   const [selectedOrder, setSelectedOrder] = useState(null);
@@ -94,7 +97,12 @@ export default function AdminDashboardScreen({ navigation }) {
       ]);
 
       if (statsRes.ok) setStats(await statsRes.json());
-      if (ordersRes.ok) setOrders(await ordersRes.json());
+      if (ordersRes.ok) {
+        const ordersPage = await ordersRes.json();
+        setOrders(ordersPage.orders);
+        setOrdersTotal(ordersPage.total);
+        setOrdersCursor(ordersPage.next_cursor);
+      }
       if (usersRes.ok) setUsers(await usersRes.json());
       if (analyticsRes.ok) setProductAnalytics(await analyticsRes.json());
     } catch (error) {
@@ -123,9 +131,43 @@ export default function AdminDashboardScreen({ navigation }) {
     ]);
   };
 
-  const openOrderDetails = (order) => {
+  const loadMoreOrders = async () => {
+    if (!ordersCursor || loadingMoreOrders) return;
+    setLoadingMoreOrders(true);
+    try {
+      const token = await AsyncStorage.getItem('access_token');
+      const response = await fetch(`${API_URL}/api/admin/orders?cursor=${encodeURIComponent(ordersCursor)}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (response.ok) {
+        const ordersPage = await response.json();
+        setOrders(prevOrders => [...prevOrders, ...ordersPage.orders]);
+        setOrdersCursor(ordersPage.next_cursor);
+      }
+    } catch (error) {
+      console.error('Error loading more orders:', error);
+    } finally {
+      setLoadingMoreOrders(false);
+    }
+  };
+
+  const openOrderDetails = async (order) => {
     setSelectedOrder(order);
     setOrderModalVisible(true);
+
+    // The list only carries a preview; fetch the full item list on open
+    try {
+      const token = await AsyncStorage.getItem('access_token');
+      const response = await fetch(`${API_URL}/api/admin/orders/${order.id}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      if (response.ok) {
+        const details = await response.json();
+        setSelectedOrder(current => (current && current.id === order.id ? { ...current, order_items: details.order_items } : current));
+      }
+    } catch (error) {
+      console.error('Error loading order details:', error);
+    }
   };
 
   // Create Admin Function
@@ -420,7 +462,7 @@ export default function AdminDashboardScreen({ navigation }) {
               </View>
               {orders.slice(0, 3).map((order) => {
                 const orderUser = getOrderUser(order.user_id);
-                const firstItem = order.order_items?.[0];
+                const firstItem = order.first_item;
                 const productImage = firstItem?.product_image;
                 return (
                   <TouchableOpacity
@@ -443,8 +485,8 @@ export default function AdminDashboardScreen({ navigation }) {
                         <Text style={styles.orderProductName} numberOfLines={1}>
                           {firstItem?.product_name || firstItem?.product?.name || 'Product'}
                         </Text>
-                        {order.order_items?.length > 1 && (
-                          <Text style={styles.orderMoreItems}>+{order.order_items.length - 1} more items</Text>
+                        {order.item_count > 1 && (
+                          <Text style={styles.orderMoreItems}>+{order.item_count - 1} more items</Text>
                         )}
                         <Text style={styles.orderUser}>By: {orderUser?.full_name || orderUser?.email || 'Unknown'}</Text>
                       </View>
@@ -489,13 +531,13 @@ export default function AdminDashboardScreen({ navigation }) {
 
         {activeTab === 'orders' && (
           <View style={styles.section}>
-            <Text style={styles.sectionTitle}>All Orders ({orders.length})</Text>
+            <Text style={styles.sectionTitle}>All Orders ({ordersTotal || orders.length})</Text>
             {orders.length === 0 ? (
               <Text style={styles.emptyText}>No orders yet</Text>
             ) : (
               orders.map((order) => {
                 const orderUser = getOrderUser(order.user_id);
-                const firstItem = order.order_items?.[0];
+                const firstItem = order.first_item;
                 const productImage = firstItem?.product_image;
                 return (
                   <TouchableOpacity
@@ -518,8 +560,8 @@ export default function AdminDashboardScreen({ navigation }) {
                         <Text style={styles.orderProductName} numberOfLines={1}>
                           {firstItem?.product_name || firstItem?.product?.name || 'Product'}
                         </Text>
-                        {order.order_items?.length > 1 && (
-                          <Text style={styles.orderMoreItems}>+{order.order_items.length - 1} more items</Text>
+                        {order.item_count > 1 && (
+                          <Text style={styles.orderMoreItems}>+{order.item_count - 1} more items</Text>
                         )}
                         <Text style={styles.orderUser}>By: {orderUser?.full_name || orderUser?.email || 'Unknown'}</Text>
                         <Text style={styles.orderDate}>{new Date(order.created_at).toLocaleDateString()}</Text>
@@ -532,6 +574,11 @@ export default function AdminDashboardScreen({ navigation }) {
                 );
               })
             )}
+            {ordersCursor && (
+              <TouchableOpacity onPress={loadMoreOrders} disabled={loadingMoreOrders} style={{ alignItems: 'center', paddingVertical: 12 }}>
+                <Text style={styles.viewAllText}>{loadingMoreOrders ? 'Loading...' : 'Load More Orders'}</Text>
+              </TouchableOpacity>
+            )}
           </View>
         )}
 
@@ -631,7 +678,7 @@ export default function AdminDashboardScreen({ navigation }) {
           <View style={styles.modalContent}>
             <View style={styles.modalHeader}>
               <Text style={styles.modalTitle} numberOfLines={1}>
-                {selectedOrder?.order_items?.[0]?.product_name || selectedOrder?.order_items?.[0]?.product?.name || 'Order Details'}
+                {selectedOrder?.first_item?.product_name || selectedOrder?.order_items?.[0]?.product_name || 'Order Details'}
               </Text>
               <TouchableOpacity onPress={() => setOrderModalVisible(false)}>
                 <Text style={styles.modalClose}>✕</Text>
@@ -1,15 +1,31 @@
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import { API_URL } from '../config/api';
 
+// With database replicas, the server marks each write with a signed X-Last-Write
+// header; sending it back keeps this user's reads up to date on every server worker
+const LAST_WRITE_KEY = 'last_write';
+
 async function getAuthHeaders() {
   const token = await AsyncStorage.getItem('access_token');
   if (!token) {
     throw new Error('Not authenticated');
   }
-  return {
+  const headers = {
     'Authorization': `Bearer ${token}`,
     'Content-Type': 'application/json',
   };
+  const lastWrite = await AsyncStorage.getItem(LAST_WRITE_KEY);
+  if (lastWrite) {
+    headers['X-Last-Write'] = lastWrite;
+  }
+  return headers;
+}
+
+async function rememberWrite(response) {
+  const marker = response.headers.get('X-Last-Write');
+  if (marker) {
+    await AsyncStorage.setItem(LAST_WRITE_KEY, marker);
+  }
 }
 
 export const fetchCart = async () => {
@@ -36,6 +52,20 @@ export const fetchCart = async () => {
   }
 };
 
+// Priced cart: per-line offer prices, totals, savings, points preview and stock warnings
+export const fetchCartSummary = async () => {
+  const headers = await getAuthHeaders();
+  const response = await fetch(`${API_URL}/api/cart/summary`, {
+    method: 'GET',
+    headers,
+  });
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({ detail: 'Failed to fetch cart summary' }));
+    throw new Error(errorData.detail);
+  }
+  return response.json();
+};
+
 export const addToCart = async (productId, quantity, selectedSize = null) => {
   const headers = await getAuthHeaders();
   const body = { product_id: productId, quantity };
@@ -47,6 +77,7 @@ export const addToCart = async (productId, quantity, selectedSize = null) => {
     headers,
     body: JSON.stringify(body),
   });
+  await rememberWrite(response);
   if (!response.ok) {
     const errorData = await response.json().catch(() => ({ detail: 'Failed to add item to cart' }));
     throw new Error(errorData.detail);
@@ -61,6 +92,7 @@ export const updateCartItemQuantity = async (cartItemId, quantity) => {
     headers,
     body: JSON.stringify({ quantity }),
   });
+  await rememberWrite(response);
   if (!response.ok) {
     const errorData = await response.json().catch(() => ({ detail: 'Failed to update cart item' }));
     throw new Error(errorData.detail);
@@ -74,6 +106,7 @@ export const removeFromCart = async (cartItemId) => {
     method: 'DELETE',
     headers,
   });
+  await rememberWrite(response);
   if (!response.ok) {
     const errorData = await response.json().catch(() => ({ detail: 'Failed to remove item from cart' }));
     throw new Error(errorData.detail);
@@ -81,12 +114,62 @@ export const removeFromCart = async (cartItemId) => {
   return response.json();
 };
 
+// Apply several cart operations in one request and get the whole cart back.
+// operations: [{ op: 'add', product_id, quantity, selected_size },
+//              { op: 'update', cart_item_id, quantity }, { op: 'remove', cart_item_id }]
+export const batchUpdateCart = async (operations) => {
+  const headers = await getAuthHeaders();
+  const response = await fetch(`${API_URL}/api/cart/batch`, {
+    method: 'POST',
+    headers,
+    body: JSON.stringify({ operations }),
+  });
+  await rememberWrite(response);
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({ detail: 'Failed to update cart' }));
+    const detail = errorData.detail;
+    throw new Error(typeof detail === 'string' ? detail : detail?.message || 'Failed to update cart');
+  }
+  return response.json();
+};
+
+// Buy again: copy a past order's lines into the cart and get the whole cart back.
+// Fails without changing the cart if any product is unavailable or short on stock.
+export const reorder = async (orderId) => {
+  const headers = await getAuthHeaders();
+  const response = await fetch(`${API_URL}/api/orders/${orderId}/reorder`, {
+    method: 'POST',
+    headers,
+  });
+  await rememberWrite(response);
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({ detail: 'Failed to reorder' }));
+    const detail = errorData.detail;
+    throw new Error(typeof detail === 'string' ? detail : detail?.message || 'Failed to reorder');
+  }
+  return response.json();
+};
+
+// The user's most frequently ordered products, with size and last quantity
+export const fetchFrequentItems = async (limit = 20) => {
+  const headers = await getAuthHeaders();
+  const response = await fetch(`${API_URL}/api/user/frequent-items?limit=${limit}`, {
+    method: 'GET',
+    headers,
+  });
+  if (!response.ok) {
+    throw new Error('Failed to fetch frequent items');
+  }
+  return response.json();
+};
+
 export const clearCart = async () => {
   const headers = await getAuthHeaders();
   const response = await fetch(`${API_URL}/api/cart`, {
     method: 'DELETE',
     headers,
   });
+  await rememberWrite(response);
   if (!response.ok) {
     const errorData = await response.json().catch(() => ({ detail: 'Failed to clear cart' }));
     throw new Error(errorData.detail);